@@ -1,41 +1,31 @@
 import frappe
 import json
 from frappe import _
-from frappe.utils import now, get_url
+from frappe.utils import now, get_url, cint, escape_html
 import io
 import base64
+from urllib.parse import urlencode
+from barcode.barcode.label_cache import get_cached_label, get_cached_source_label, get_doc_version, set_cached_source_label
+from barcode.barcode.label_fetch import ITEM_LINK_FIELDS, fetch_label_sources, get_fetch_plan, get_label_company
+from barcode.barcode.label_program import compile_label_program, get_label_program, get_template_program, render_program_template
+from barcode.barcode.print_log import build_print_log_row, queue_print_logs
+from barcode.barcode.settings_cache import get_default_template_name, get_settings
+from barcode.barcode.symbology import get_barcode_svg
+from barcode.barcode.template_cache import get_cached_css, get_template_version, render_cached_template
 
 @frappe.whitelist()
 def print_barcode_label(doctype, docname, template=None, copies=1, barcode_type=None):
 	"""Main API to print barcode labels"""
+	doc = template_doc = None
 	try:
-		# Get document
-		doc = frappe.get_doc(doctype, docname)
-		
-		# Get settings
-		settings = get_barcode_settings()
-		
 		# Get template
 		if not template:
 			template = get_default_template(doctype)
 		
 		template_doc = frappe.get_doc("Barcode Label Template", template)
 		
-		# Generate label data
-		label_data = prepare_label_data(doc, doctype, template_doc)
-		
-		# Generate barcode
-		barcode_html = generate_barcode(
-			label_data.get('barcode_value', ''),
-			barcode_type or template_doc.barcode_type,
-			template_doc.barcode_width,
-			template_doc.barcode_height
-		)
-		
-		label_data['barcode_html'] = barcode_html
-		
-		# Generate HTML
-		html_content = render_label_html(template_doc, label_data)
+		# Render (or reuse) the label of the document
+		html_content, doc = render_document_label(template_doc, doctype, docname, barcode_type or template_doc.barcode_type)
 		
 		# Log the print
 		log_print_activity(doc, template_doc, copies, barcode_type or template_doc.barcode_type)
@@ -49,114 +39,135 @@ def print_barcode_label(doctype, docname, template=None, copies=1, barcode_type=
 		
 	except Exception as e:
 		frappe.log_error(f"Barcode printing error: {str(e)}")
+		queue_print_logs([build_print_log_row(
+			doctype, doc or {'name': docname}, template, cint(copies) or 1,
+			barcode_type or (template_doc.barcode_type if template_doc else None), 'Failed', str(e)
+		)])
 		return {
 			'success': False,
 			'error': str(e)
 		}
 
-def get_barcode_settings():
-	"""Get barcode label settings"""
-	if not frappe.db.exists("Barcode Label Settings", "Barcode Label Settings"):
-		# Create default settings
-		settings = frappe.new_doc("Barcode Label Settings")
-		settings.save(ignore_permissions=True)
-		frappe.db.commit()
-	
-	return frappe.get_single("Barcode Label Settings")
-
-def get_default_template(doctype):
-	"""Get default template for doctype"""
-	template_type_map = {
-		'Item': 'Item',
-		'Batch': 'Batch',
-		'Serial No': 'Serial No',
-		'Delivery Note': 'General'
-	}
+def render_document_label(template_doc, doctype, docname, barcode_type):
+	"""Label HTML of one document and the fields its print log row needs
 	
-	template_type = template_type_map.get(doctype, 'General')
-	
-	template = frappe.db.get_value(
-		"Barcode Label Template",
-		{"template_type": template_type, "is_default": 1},
-		"name"
+	Reprints are served from the label cache until the document (or the Item
+	it links to) or the template changes. Otherwise only the columns the
+	template uses are read, with one query.
+	"""
+	# checked before the cache too, so a cached label is only served to users who may read it
+	frappe.has_permission(doctype, "read", throw=True)
+	plan = get_fetch_plan(template_doc, doctype)
+	company = get_label_company(template_doc)
+	cache_key = (
+		'document', template_doc.name, get_template_version(template_doc), doctype, docname, barcode_type, company
 	)
+	cached = get_cached_source_label(cache_key)
+	if cached:
+		return cached
 	
-	if not template:
-		template = frappe.db.get_value(
-			"Barcode Label Template",
-			{"template_type": template_type},
-			"name"
-		)
+	# versions are read before the documents, so a concurrent change is never cached as seen
+	versions = {(doctype, docname): get_doc_version(doctype, docname)}
+	doc = fetch_label_sources(doctype, [docname], plan).get(docname)
+	if not doc:
+		frappe.throw(_("{0} {1} not found").format(_(doctype), docname), frappe.DoesNotExistError)
+	doc.doctype = doctype
+	item_code = doc.get(ITEM_LINK_FIELDS[doctype]) if doctype in ITEM_LINK_FIELDS else None
+	if item_code:
+		versions[('Item', item_code)] = get_doc_version('Item', item_code)
 	
-	if not template:
-		frappe.throw(_("No template found for {0}").format(template_type))
+	label_data = prepare_label_data(doc, doctype, template_doc, company=company, item_name=doc.get('item_name') or '')
+	label_data['barcode_html'] = generate_barcode(
+		label_data.get('barcode_value', ''),
+		barcode_type,
+		template_doc.barcode_width,
+		template_doc.barcode_height
+	)
 	
-	return template
+	label = (
+		render_label_html(template_doc, label_data),
+		frappe._dict({field: doc.get(field) for field in ('doctype', 'name', 'item_code', 'item_name', 'item')})
+	)
+	set_cached_source_label(cache_key, label, versions)
+	return label
+
+def get_barcode_settings():
+	"""Get barcode label settings (cached read-only snapshot)"""
+	return get_settings()
+
+def get_default_template(doctype):
+	"""Get default template for doctype"""
+	return get_default_template_name(doctype)
 
-def prepare_label_data(doc, doctype, template_doc=None):
-	"""Prepare data for label rendering"""
+def prepare_label_data(doc, doctype, template_doc=None, company=None, item_name=None):
+	"""Prepare data for label rendering
+	
+	Bulk callers pass `company` and `item_name` they have already fetched so that
+	no per-label queries are made.
+	"""
 	data = {}
 	
+	if company is None:
+		company = frappe.defaults.get_user_default("Company")
+	
 	if doctype == "Item":
 		data.update({
 			'item_code': doc.item_code,
 			'item_name': doc.item_name,
 			'barcode_value': doc.item_code,
-			'company': frappe.defaults.get_user_default("Company")
+			'company': company
 		})
 	
 	elif doctype == "Batch":
-		item = frappe.get_doc("Item", doc.item)
 		data.update({
 			'item_code': doc.item,
-			'item_name': item.item_name,
+			'item_name': item_name if item_name is not None else frappe.db.get_value("Item", doc.item, "item_name"),
 			'batch_no': doc.name,
 			'mfg_date': doc.manufacturing_date,
 			'exp_date': doc.expiry_date,
 			'barcode_value': doc.name,
-			'company': frappe.defaults.get_user_default("Company")
+			'company': company
 		})
 	
 	elif doctype == "Serial No":
-		item = frappe.get_doc("Item", doc.item_code)
 		data.update({
 			'item_code': doc.item_code,
-			'item_name': item.item_name,
+			'item_name': item_name if item_name is not None else frappe.db.get_value("Item", doc.item_code, "item_name"),
 			'serial_no': doc.name,
 			'barcode_value': doc.name,
-			'company': frappe.defaults.get_user_default("Company")
+			'company': company
 		})
 	
 	# Add custom field data if template supports it
 	if template_doc:
 		if template_doc.show_custom_field_1:
 			data['custom_field_1_label'] = template_doc.custom_field_1_label or 'Custom Field 1'
-			data['custom_field_1_value'] = getattr(doc, 'custom_field_1', '300 GSM')  # Default value
+			data['custom_field_1_value'] = doc.get('custom_field_1') or '300 GSM'  # Default value
 		if template_doc.show_custom_field_2:
 			data['custom_field_2_label'] = template_doc.custom_field_2_label or 'Custom Field 2'
-			data['custom_field_2_value'] = getattr(doc, 'custom_field_2', data.get('item_name', 'Research Board'))  # Default to item name
+			data['custom_field_2_value'] = doc.get('custom_field_2') or data.get('item_name', 'Research Board')  # Default to item name
 	
 	return data
 
 def generate_barcode(value, barcode_type, width=200, height=100):
-	"""Generate barcode HTML using ERPNext's built-in barcode functionality"""
+	"""Generate barcode HTML as inline SVG (no extra HTTP request per label)"""
 	if not value:
 		return ""
 	
-	# Use ERPNext's barcode route
-	barcode_url = f"/barcode?type={barcode_type}&value={value}&width={width}&height={height}"
+	svg = get_barcode_svg(barcode_type, value, width, height)
+	if svg:
+		return svg
 	
-	return f'<img src="{barcode_url}" alt="{value}" class="barcode-image" />'
+	# Symbologies without a native encoder use ERPNext's barcode route
+	query = urlencode({'type': barcode_type, 'value': value, 'width': width, 'height': height})
+	return f'<img src="/barcode?{query}" alt="{escape_html(str(value))}" class="barcode-image" />'
 
 def render_label_html(template_doc, data):
 	"""Render label HTML using template"""
-	if template_doc.html_template:
-		html = frappe.render_template(template_doc.html_template, data)
-	else:
-		html = frappe.render_template(template_doc.get_default_html_template(), data)
+	html = render_label_body(template_doc, data)
 	
 	# Add CSS
-	css = template_doc.css_styles or get_default_css(template_doc)
+	css = get_cached_css(template_doc)
 	
 	full_html = f"""
 	<style>
@@ -167,8 +178,17 @@ def render_label_html(template_doc, data):
 	
 	return full_html
 
+def render_label_body(template_doc, data):
+	"""Render label HTML without the CSS block"""
+	# Compiled template is cached per template version
+	return render_cached_template(template_doc, data)
+
 def get_default_css(template_doc):
 	"""Get default CSS for label"""
+	if not template_doc.html_template:
+		# the default markup is generated from the template's label program
+		return render_program_template(get_template_program(template_doc))[1]
+	
 	return f"""
 	.barcode-label {{
 		width: {template_doc.label_width}mm;
@@ -187,31 +207,12 @@ def get_default_css(template_doc):
 	.barcode-image {{ max-width: 100%; height: auto; }}
 	"""
 
-def log_print_activity(doc, template_doc, copies, barcode_type):
-	"""Log print activity"""
-	log = frappe.new_doc("Barcode Print Log")
-	log.update({
-		'user': frappe.session.user,
-		'reference_doctype': doc.doctype,
-		'reference_name': doc.name,
-		'template_used': template_doc.name,
-		'copies_printed': copies,
-		'barcode_type': barcode_type,
-		'print_status': 'Success'
-	})
-	
-	if doc.doctype == "Item":
-		log.item_code = doc.item_code
-		log.item_name = doc.item_name
-	elif doc.doctype == "Batch":
-		log.item_code = doc.item
-		log.batch_no = doc.name
-	elif doc.doctype == "Serial No":
-		log.item_code = doc.item_code
-		log.serial_no = doc.name
-	
-	log.save(ignore_permissions=True)
-	frappe.db.commit()
+def log_print_activity(doc, template_doc, copies, barcode_type, print_status='Success', error_message=None):
+	"""Log print activity (buffered, written in bulk by `print_log`)"""
+	queue_print_logs([build_print_log_row(
+		doc.doctype, doc, template_doc.name if template_doc else None, cint(copies) or 1,
+		barcode_type, print_status, error_message
+	)])
 
 @frappe.whitelist()
 def get_templates(template_type=None):
@@ -230,19 +231,109 @@ def get_templates(template_type=None):
 
 @frappe.whitelist()
 def bulk_print_labels(doctype, docnames, template=None, copies=1):
-	"""Bulk print labels for multiple documents"""
-	results = []
+	"""Bulk print labels for multiple documents
+	
+	All source rows are prefetched with set-based queries, the template is
+	resolved once, every label is rendered into one printable HTML document and
+	all print logs are buffered for a multi-row insert. Runs above the
+	background threshold in Barcode Label Settings are queued as a label job.
+	"""
 	docnames = json.loads(docnames) if isinstance(docnames, str) else docnames
+	copies = cint(copies) or 1
+	
+	if not template:
+		template = get_default_template(doctype)
+	
+	from barcode.barcode.label_jobs import enqueue_label_job, should_run_in_background
+	if should_run_in_background(len(docnames) * copies):
+		return enqueue_label_job(
+			'bulk_print', template, docnames, {'doctype': doctype, 'copies': copies}
+		)
+	
+	template_doc = frappe.get_doc("Barcode Label Template", template)
+	label_bodies, results, log_rows = render_bulk_labels(doctype, docnames, template_doc, copies)
+	queue_print_logs(log_rows)
+	
+	return {
+		'success': any(result['success'] for result in results),
+		'html': wrap_label_document(template_doc, label_bodies) if label_bodies else "",
+		'template': template_doc.name,
+		'copies': copies,
+		'results': results
+	}
+
+def render_bulk_labels(doctype, docnames, template_doc, copies=1):
+	"""Render label bodies for many documents of one doctype
+	
+	Returns the rendered bodies (repeated per copy), per-document results and
+	the print log rows to hand to `queue_print_logs`.
+	"""
+	barcode_type = template_doc.barcode_type
+	plan = get_fetch_plan(template_doc, doctype)
+	company = get_label_company(template_doc)
+	sources = fetch_label_sources(doctype, docnames, plan)
+	
+	results = []
+	label_bodies = []
+	log_rows = []
 	
 	for docname in docnames:
-		result = print_barcode_label(doctype, docname, template, copies)
-		results.append({
-			'docname': docname,
-			'success': result.get('success', False),
-			'error': result.get('error')
-		})
+		source = sources.get(docname)
+		if not source:
+			results.append({
+				'docname': docname,
+				'success': False,
+				'error': _("{0} {1} not found").format(_(doctype), docname)
+			})
+			continue
+		
+		try:
+			body = render_source_label(template_doc, doctype, source, company, source.get('item_name') or '')
+			label_bodies.extend([body] * copies)
+			log_rows.append(build_print_log_row(doctype, source, template_doc.name, copies, barcode_type))
+			results.append({'docname': docname, 'success': True, 'error': None})
+			
+		except Exception as e:
+			frappe.log_error(f"Barcode printing error: {str(e)}")
+			log_rows.append(build_print_log_row(
+				doctype, source, template_doc.name, copies, barcode_type, 'Failed', str(e)
+			))
+			results.append({'docname': docname, 'success': False, 'error': str(e)})
 	
-	return results
+	return label_bodies, results, log_rows
+
+def render_source_label(template_doc, doctype, source, company=None, item_name=None):
+	"""Render the label body of one prefetched source row (Item, Batch or Serial No)"""
+	label_data = prepare_label_data(source, doctype, template_doc, company=company, item_name=item_name)
+	
+	def render():
+		label_data['barcode_html'] = generate_barcode(
+			label_data.get('barcode_value', ''),
+			template_doc.barcode_type,
+			template_doc.barcode_width,
+			template_doc.barcode_height
+		)
+		return render_label_body(template_doc, label_data)
+	
+	# keyed by the resolved data, so a changed source renders again
+	return get_cached_label('html', template_doc, label_data, render)
+
+def render_bulk_print_chunk(template_doc, docnames, options):
+	"""Label job runner for `bulk_print_labels`: render one chunk and log it"""
+	label_bodies, results, log_rows = render_bulk_labels(
+		options['doctype'], docnames, template_doc, cint(options.get('copies')) or 1
+	)
+	queue_print_logs(log_rows)
+	return label_bodies, results
+
+def wrap_label_document(template_doc, label_bodies):
+	"""Combine rendered label bodies into one printable HTML block with a single style block"""
+	return f"""
+	<style>
+	{get_cached_css(template_doc)}
+	</style>
+	{''.join(label_bodies)}
+	"""
 
 @frappe.whitelist()
 def template_pdf_preview(template_name):
@@ -254,7 +345,7 @@ def template_pdf_preview(template_name):
 			'name': template.template_name,
 			'width': template.label_width,
 			'height': template.label_height,
-			'elements': parse_template_elements(template),
+			'program': get_template_program(template),
 			'liveData': {
 				'item_code': 'SAMPLE001',
 				'item_name': 'Sample Product',
@@ -282,7 +373,7 @@ def print_template_direct(template_name, print_settings, sample_data=None):
 			'name': template.template_name,
 			'width': template.label_width,
 			'height': template.label_height,
-			'elements': parse_template_elements(template),
+			'program': get_template_program(template),
 			'liveData': prepare_sample_data(sample_data)
 		}
 		
@@ -300,39 +391,6 @@ def print_template_direct(template_name, print_settings, sample_data=None):
 		frappe.log_error(f"Template print error: {str(e)}")
 		return {'success': False, 'error': str(e)}
 
-def parse_template_elements(template):
-	"""Parse template to extract elements"""
-	elements = []
-	
-	if template.show_item_code:
-		elements.append({
-			'type': 'item_code',
-			'x': 10, 'y': 10, 'width': 80, 'height': 20,
-			'fontSize': 12, 'content': 'item_code'
-		})
-		
-	if template.show_item_name:
-		elements.append({
-			'type': 'item_name',
-			'x': 10, 'y': 35, 'width': 120, 'height': 20,
-			'fontSize': 10, 'content': 'item_name'
-		})
-		
-	if template.show_batch_no:
-		elements.append({
-			'type': 'batch_no',
-			'x': 10, 'y': 60, 'width': 80, 'height': 15,
-			'fontSize': 9, 'content': 'batch_no'
-		})
-		
-	elements.append({
-		'type': 'barcode',
-		'x': 10, 'y': 80, 'width': 120, 'height': 40,
-		'fontSize': 12, 'content': 'barcode'
-	})
-	
-	return elements
-
 def prepare_sample_data(sample_data):
 	"""Prepare sample data for printing"""
 	default_data = {
@@ -364,8 +422,9 @@ def save_visual_template(template_data):
 	try:
 		template_data = json.loads(template_data) if isinstance(template_data, str) else template_data
 		
-		# Generate HTML and CSS from visual elements
-		html_template, css_styles = generate_template_from_elements(template_data['elements'])
+		# Compile the visual elements once; HTML and CSS are generated from the program
+		program = compile_label_program(template_data)
+		html_template, css_styles = render_program_template(program)
 		
 		# Create or update template
 		if frappe.db.exists("Barcode Label Template", template_data['name']):
@@ -382,7 +441,8 @@ def save_visual_template(template_data):
 			'barcode_width': template_data['barcode_width'],
 			'barcode_height': template_data['barcode_height'],
 			'html_template': html_template,
-			'css_styles': css_styles
+			'css_styles': css_styles,
+			'label_program': json.dumps(program)
 		})
 		
 		template.save()
@@ -401,7 +461,7 @@ def preview_visual_template(template_data):
 		template_data = json.loads(template_data) if isinstance(template_data, str) else template_data
 		
 		# Generate HTML and CSS
-		html_template, css_styles = generate_template_from_elements(template_data['elements'])
+		html_template, css_styles = render_program_template(get_label_program(template_data))
 		
 		# Sample data for preview
 		sample_data = {
@@ -413,7 +473,7 @@ def preview_visual_template(template_data):
 			'exp_date': '01/01/2025',
 			'quantity': '10',
 			'company': 'Sample Company',
-			'barcode_html': '<img src="/barcode?type=Code128&value=SAMPLE001&width=200&height=100" alt="SAMPLE001" />'
+			'barcode_html': generate_barcode('SAMPLE001', 'Code128', 200, 100)
 		}
 		
 		# Render template
@@ -439,53 +499,14 @@ def preview_visual_template(template_data):
 	except Exception as e:
 		return {'success': False, 'error': str(e)}
 
-def generate_template_from_elements(elements):
+def generate_template_from_elements(elements, label_width=None, label_height=None):
 	"""Generate HTML and CSS from visual elements"""
-	html_parts = ['<div class="barcode-label">']
-	css_parts = []
-	
-	for i, element in enumerate(elements):
-		class_name = f"element-{i}"
-		field = element['field']
-		
-		if field == 'barcode':
-			html_parts.append(f'<div class="{class_name}">{{{{ barcode_html }}}}</div>')
-		else:
-			html_parts.append(f'<div class="{class_name}">{{{{ {field} }}}}</div>')
-		
-		# Generate CSS for positioning and styling
-		css_parts.append(f"""
-.{class_name} {{
-	position: absolute;
-	left: {element['x']}px;
-	top: {element['y']}px;
-	width: {element['width']}px;
-	height: {element['height']}px;
-	font-size: {element['fontSize']};
-	font-weight: {element['fontWeight']};
-	text-align: {element['textAlign']};
-}}""")
-	
-	html_parts.append('</div>')
-	
-	# Base CSS
-	base_css = """
-.barcode-label {
-	position: relative;
-	border: 1px solid #000;
-	background: white;
-	font-family: Arial, sans-serif;
-}
-.barcode-label img {
-	max-width: 100%;
-	height: auto;
-}
-"""
-	
-	html_template = '\n'.join(html_parts)
-	css_styles = base_css + '\n'.join(css_parts)
-	
-	return html_template, css_styles
+	program = get_label_program({
+		'elements': elements,
+		'label_width': label_width,
+		'label_height': label_height
+	})
+	return render_program_template(program)
 
 @frappe.whitelist()
 def render_outer_box_label(item_code=None, custom_data=None):
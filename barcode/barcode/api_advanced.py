@@ -1,6 +1,17 @@
 import frappe
 import json
 from frappe import _
+from frappe.utils import cint, escape_html
+from urllib.parse import urlencode
+from barcode.barcode.label_cache import get_cached_label
+from barcode.barcode.label_program import get_label_program, render_program_template
+from barcode.barcode.parallel_render import render_parallel
+from barcode.barcode.symbology import get_barcode_svg
+# served from this module as well, where clients have always called them
+from barcode.barcode.template_package import export_template_package, import_template_package
+from barcode.barcode.template_cache import render_cached_template
+
+BATCH_RENDERER = "barcode.barcode.api_advanced.render_batch_labels"
 
 @frappe.whitelist()
 def save_advanced_template(template_data):
@@ -23,7 +34,8 @@ def save_advanced_template(template_data):
 			'label_width': template_data['label_width'],
 			'label_height': template_data['label_height'],
 			'html_template': html_template,
-			'css_styles': css_styles
+			'css_styles': css_styles,
+			'label_program': json.dumps(get_label_program(template_data))
 		})
 		
 		template.save()
@@ -64,56 +76,6 @@ def get_template_library():
 		]
 	}
 
-@frappe.whitelist()
-def export_template_package(template_names):
-	"""Export multiple templates as a package"""
-	template_names = json.loads(template_names) if isinstance(template_names, str) else template_names
-	
-	package = {
-		'version': '1.0',
-		'created': frappe.utils.now(),
-		'templates': []
-	}
-	
-	for name in template_names:
-		template = frappe.get_doc("Barcode Label Template", name)
-		package['templates'].append({
-			'name': template.template_name,
-			'type': template.template_type,
-			'width': template.label_width,
-			'height': template.label_height,
-			'html': template.html_template,
-			'css': template.css_styles
-		})
-	
-	return {'success': True, 'package': package}
-
-@frappe.whitelist()
-def import_template_package(package_data):
-	"""Import template package"""
-	try:
-		package = json.loads(package_data) if isinstance(package_data, str) else package_data
-		imported = []
-		
-		for template_data in package['templates']:
-			template = frappe.new_doc("Barcode Label Template")
-			template.update({
-				'template_name': template_data['name'],
-				'template_type': template_data['type'],
-				'label_width': template_data['width'],
-				'label_height': template_data['height'],
-				'html_template': template_data['html'],
-				'css_styles': template_data['css']
-			})
-			template.save()
-			imported.append(template.name)
-		
-		frappe.db.commit()
-		return {'success': True, 'imported': imported}
-		
-	except Exception as e:
-		return {'success': False, 'error': str(e)}
-
 @frappe.whitelist()
 def generate_batch_labels(items_data, template_name, options=None):
 	"""Generate labels for multiple items in batch"""
@@ -121,98 +83,64 @@ def generate_batch_labels(items_data, template_name, options=None):
 		items_data = json.loads(items_data) if isinstance(items_data, str) else items_data
 		options = json.loads(options) if isinstance(options, str) else (options or {})
 		
-		template = frappe.get_doc("Barcode Label Template", template_name)
-		labels = []
+		# Large runs are rendered in chunks by a background label job
+		from barcode.barcode.label_jobs import enqueue_label_job, should_run_in_background
+		if should_run_in_background(len(items_data)):
+			return enqueue_label_job('batch_labels', template_name, items_data, options)
 		
-		for item_data in items_data:
-			# Generate barcode
-			barcode_html = generate_barcode(
-				item_data.get('barcode_value', ''),
-				template.barcode_type,
-				template.barcode_width,
-				template.barcode_height
-			)
-			
-			item_data['barcode_html'] = barcode_html
-			
-			# Render template
-			html = frappe.render_template(template.html_template, item_data)
-			labels.append({
-				'html': html,
-				'css': template.css_styles,
-				'item': item_data.get('item_code', ''),
-				'copies': item_data.get('copies', 1)
-			})
+		template = frappe.get_doc("Barcode Label Template", template_name)
+		labels = render_parallel(BATCH_RENDERER, template, items_data)
 		
-		return {'success': True, 'labels': labels}
+		# the stylesheet is the same for every label, so it is sent once
+		return {'success': True, 'labels': labels, 'css': template.css_styles}
 		
 	except Exception as e:
 		return {'success': False, 'error': str(e)}
 
+def render_batch_labels(template, items_data):
+	"""Render one label dict per item"""
+	labels = []
+	
+	for item_data in items_data:
+		labels.append({
+			'html': get_cached_label('html', template, item_data, lambda: render_batch_label(template, item_data)),
+			'item': item_data.get('item_code', ''),
+			'copies': item_data.get('copies', 1)
+		})
+	
+	return labels
+
+def render_batch_label(template, item_data):
+	item_data = dict(item_data, barcode_html=generate_barcode(
+		item_data.get('barcode_value', ''),
+		template.barcode_type,
+		template.barcode_width,
+		template.barcode_height
+	))
+	return render_cached_template(template, item_data)
+
+def render_batch_labels_chunk(template, items_data, options):
+	"""Label job runner for `generate_batch_labels`: render one chunk of items"""
+	label_bodies = []
+	results = []
+	
+	for label in render_parallel(BATCH_RENDERER, template, items_data):
+		label_bodies.extend([label['html']] * (cint(label['copies']) or 1))
+		results.append({'docname': label['item'], 'success': True, 'error': None})
+	
+	return label_bodies, results
+
 def generate_advanced_template(template_data):
 	"""Generate HTML and CSS for advanced templates"""
-	elements = template_data.get('elements', [])
+	html_template, css_styles = render_program_template(get_label_program(template_data))
 	
-	# Base styles
-	css_parts = [f"""
+	css_styles += f"""
 .barcode-label {{
-	position: relative;
-	width: {template_data['label_width']}mm;
-	height: {template_data['label_height']}mm;
 	background: {template_data.get('background_color', '#ffffff')};
 	border: 1px {template_data.get('border_style', 'solid')} #000;
-	font-family: Arial, sans-serif;
-	overflow: hidden;
-}}
-"""]
-	
-	html_parts = ['<div class="barcode-label">']
+}}"""
 	
-	for i, element in enumerate(elements):
-		class_name = f"element-{i}"
-		element_type = element.get('type', 'field')
-		
-		# Generate element HTML
-		if element_type == 'text':
-			config = element.get('config', {})
-			html_parts.append(f'<div class="{class_name}">{config.get("content", "")}</div>')
-		elif element_type == 'qr':
-			html_parts.append(f'<div class="{class_name}">{{{{ qr_code_html }}}}</div>')
-		elif element_type == 'table':
-			config = element.get('config', {})
-			table_html = generate_table_html(config)
-			html_parts.append(f'<div class="{class_name}">{table_html}</div>')
-		else:
-			field = element.get('field', '')
-			html_parts.append(f'<div class="{class_name}">{{{{ {field} }}}}</div>')
-		
-		# Generate element CSS
-		css_parts.append(f"""
-.{class_name} {{
-	position: absolute;
-	left: {element['x']}px;
-	top: {element['y']}px;
-	width: {element['width']}px;
-	height: {element['height']}px;
-	z-index: {element.get('zIndex', 1)};
-}}""")
-		
-		# Add type-specific styles
-		if element_type == 'text':
-			config = element.get('config', {})
-			css_parts.append(f"""
-.{class_name} {{
-	font-size: {config.get('fontSize', '12px')};
-	font-weight: {config.get('fontWeight', 'normal')};
-	color: {config.get('color', '#000000')};
-	display: flex;
-	align-items: center;
-	justify-content: center;
-}}""")
-	
-	html_parts.append('</div>')
-	
-	return '\n'.join(html_parts), '\n'.join(css_parts)
+	return html_template, css_styles
 
 def generate_table_html(config):
 	"""Generate HTML for table element"""
@@ -230,9 +158,13 @@ def generate_table_html(config):
 	return html
 
 def generate_barcode(value, barcode_type, width=200, height=100):
-	"""Generate barcode HTML"""
+	"""Generate barcode HTML as inline SVG, falling back to the /barcode route"""
 	if not value:
 		return ""
 	
-	barcode_url = f"/barcode?type={barcode_type}&value={value}&width={width}&height={height}"
-	return f'<img src="{barcode_url}" alt="{value}" style="max-width: 100%; height: auto;" />'
\ No newline at end of file
+	svg = get_barcode_svg(barcode_type, value, width, height)
+	if svg:
+		return svg
+	
+	query = urlencode({'type': barcode_type, 'value': value, 'width': width, 'height': height})
+	return f'<img src="/barcode?{query}" alt="{escape_html(str(value))}" style="max-width: 100%; height: auto;" />'
\ No newline at end of file
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from urllib.parse import urlencode
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from barcode import __version__
+from barcode.barcode.settings_cache import get_setting
+
+ARTIFACT_DIR = "barcode_artifacts"
+DEFAULT_TTL_HOURS = 24
+DEFAULT_STORE_SIZE_MB = 512
+# Partial files left behind by a worker that died while writing
+STALE_TEMP_SECONDS = 60 * 60
+
+_artifact_name = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def get_artifact_key(*parts):
+	"""Content address of an artifact: a hash of everything its bytes depend on
+
+	Callers pass the template version, label data and output options; the app
+	version is mixed in so a release that changes rendering does not serve old files.
+	"""
+	payload = json.dumps([__version__, *parts], sort_keys=True, separators=(",", ":"), default=str)
+	return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_artifact_dir():
+	return frappe.get_site_path("private", ARTIFACT_DIR)
+
+
+def get_artifact_path(name):
+	if not _artifact_name.match(name or ""):
+		frappe.throw(_("Invalid file name {0}").format(name))
+	return os.path.join(get_artifact_dir(), name)
+
+
+def ensure_artifact(key, extension, write):
+	"""Name of the stored artifact `key`, calling `write(output)` to create it when missing
+
+	The file is written to a temporary name and renamed into place, so
+	concurrent requests for the same artifact never see a partial file.
+	"""
+	name = f"{key}.{extension}"
+	path = get_artifact_path(name)
+	if os.path.exists(path):
+		touch(path)
+		return name
+
+	os.makedirs(get_artifact_dir(), exist_ok=True)
+	temp_file = tempfile.NamedTemporaryFile(dir=get_artifact_dir(), suffix=".tmp", delete=False)
+	try:
+		with temp_file:
+			write(temp_file)
+		os.replace(temp_file.name, path)
+	except BaseException:
+		os.unlink(temp_file.name)
+		raise
+	return name
+
+
+def get_artifact_url(name, filename=None):
+	params = {"name": name, "filename": filename} if filename else {"name": name}
+	return f"/api/method/barcode.barcode.artifact_store.download_artifact?{urlencode(params)}"
+
+
+@frappe.whitelist()
+def download_artifact(name, filename=None):
+	"""Stream a stored artifact, with Range and conditional request support"""
+	from werkzeug.utils import send_file
+
+	path = get_artifact_path(name)
+	if not os.path.exists(path):
+		frappe.throw(_("This file has expired, please generate it again"), frappe.DoesNotExistError)
+
+	touch(path)
+	return send_file(
+		path,
+		frappe.local.request.environ,
+		mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream",
+		as_attachment=True,
+		download_name=filename or f"labels{os.path.splitext(name)[1]}",
+		conditional=True,
+		etag=name.split(".")[0],
+	)
+
+
+def touch(path):
+	"""Mark an artifact as used now; pruning evicts by modification time"""
+	try:
+		os.utime(path)
+	except FileNotFoundError:
+		pass
+
+
+def prune_artifacts():
+	"""Scheduler: remove artifacts unused for `artifact_ttl_hours`, then the least
+	recently used ones until the store fits in `artifact_store_size` MB"""
+	artifact_dir = get_artifact_dir()
+	if not os.path.isdir(artifact_dir):
+		return
+
+	ttl = (cint(get_setting("artifact_ttl_hours")) or DEFAULT_TTL_HOURS) * 60 * 60
+	max_bytes = (cint(get_setting("artifact_store_size")) or DEFAULT_STORE_SIZE_MB) * 1024 * 1024
+	now = time.time()
+
+	artifacts = []
+	for entry in os.scandir(artifact_dir):
+		if not entry.is_file():
+			continue
+		stat = entry.stat()
+		if entry.name.endswith(".tmp"):
+			if now - stat.st_mtime > STALE_TEMP_SECONDS:
+				remove(entry.path)
+		elif now - stat.st_mtime > ttl:
+			remove(entry.path)
+		else:
+			artifacts.append((stat.st_mtime, stat.st_size, entry.path))
+
+	total = sum(size for _mtime, size, _path in artifacts)
+	for _mtime, size, path in sorted(artifacts):
+		if total <= max_bytes:
+			break
+		remove(path)
+		total -= size
+
+
+def remove(path):
+	try:
+		os.unlink(path)
+	except FileNotFoundError:
+		pass
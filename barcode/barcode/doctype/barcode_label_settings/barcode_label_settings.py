@@ -1,7 +1,11 @@
 import frappe
 from frappe.model.document import Document
+from barcode.barcode.settings_cache import clear_settings_cache
 
 class BarcodeLabelSettings(Document):
 	def validate(self):
 		if self.enable_direct_printing and not self.printer_ip:
-			frappe.throw("Printer IP Address is required when Direct Printing is enabled")
\ No newline at end of file
+			frappe.throw("Printer IP Address is required when Direct Printing is enabled")
+	
+	def on_update(self):
+		clear_settings_cache()
@@ -1,8 +1,14 @@
 import frappe
+import json
 from frappe.model.document import Document
+from barcode.barcode.label_program import build_template_program, get_template_program, render_program_template
+from barcode.barcode.settings_cache import clear_settings_cache
+from barcode.barcode.template_cache import clear_template_cache
 
 class BarcodeLabelTemplate(Document):
 	def validate(self):
+		self.update_label_program()
+		
 		if self.is_default:
 			# Ensure only one default template per type
 			existing_default = frappe.db.get_value(
@@ -13,32 +19,25 @@ class BarcodeLabelTemplate(Document):
 			if existing_default:
 				frappe.throw(f"Default template already exists for {self.template_type}: {existing_default}")
 	
+	def on_update(self):
+		clear_template_cache(self.name)
+		# the default template of a type may have changed
+		clear_settings_cache()
+	
+	def on_trash(self):
+		clear_template_cache(self.name)
+		clear_settings_cache()
+	
+	def after_rename(self, old, new, merge=False):
+		clear_template_cache(old)
+		clear_settings_cache()
+	
 	def get_default_html_template(self):
-		"""Generate default HTML template based on field selections"""
-		html = '<div class="barcode-label">'
-		
-		if self.show_item_code:
-			html += '<div class="item-code">{{ item_code }}</div>'
-		if self.show_item_name:
-			html += '<div class="item-name">{{ item_name }}</div>'
-		if self.show_batch_no:
-			html += '<div class="batch-no">Batch: {{ batch_no }}</div>'
-		if self.show_serial_no:
-			html += '<div class="serial-no">Serial: {{ serial_no }}</div>'
-		if self.show_mfg_date:
-			html += '<div class="mfg-date">MFG: {{ mfg_date }}</div>'
-		if self.show_exp_date:
-			html += '<div class="exp-date">EXP: {{ exp_date }}</div>'
-		if self.show_quantity:
-			html += '<div class="quantity">Qty: {{ quantity }}</div>'
-		if self.show_company:
-			html += '<div class="company">{{ company }}</div>'
-		if self.show_custom_field_1 and self.custom_field_1_label:
-			html += f'<div class="custom-field-1">{self.custom_field_1_label}: {{{{ custom_field_1_value }}}}</div>'
-		if self.show_custom_field_2 and self.custom_field_2_label:
-			html += f'<div class="custom-field-2">{self.custom_field_2_label}: {{{{ custom_field_2_value }}}}</div>'
-		
-		html += '<div class="barcode">{{ barcode_html }}</div>'
-		html += '</div>'
-		
-		return html
\ No newline at end of file
+		"""Generate default HTML template from the label program of the field selections"""
+		return render_program_template(get_template_program(self))[0]
+	
+	def update_label_program(self):
+		"""Compile the label layout and store it with its content hash"""
+		program = build_template_program(self)
+		self.label_program = json.dumps(program, indent=1)
+		self.label_program_hash = program['hash']
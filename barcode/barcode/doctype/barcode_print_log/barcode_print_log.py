@@ -1,4 +1,12 @@
+import frappe
 from frappe.model.document import Document
 
 class BarcodePrintLog(Document):
-	pass
\ No newline at end of file
+	pass
+
+def on_doctype_update():
+	# report and audit filters; print_datetime also drives rollups and archival
+	frappe.db.add_index("Barcode Print Log", ["print_datetime"])
+	frappe.db.add_index("Barcode Print Log", ["item_code", "print_datetime"])
+	frappe.db.add_index("Barcode Print Log", ["reference_name", "print_datetime"])
+	frappe.db.add_index("Barcode Print Log", ["user", "print_datetime"])
\ No newline at end of file
@@ -0,0 +1,11 @@
+import frappe
+from frappe.model.document import Document
+
+
+class BarcodePrintSummary(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Barcode Print Summary", ["summary_date"])
+	frappe.db.add_index("Barcode Print Summary", ["item_code", "summary_date"])
@@ -0,0 +1,368 @@
+import csv
+import datetime
+import hashlib
+import json
+import os
+import time
+from itertools import repeat
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now
+
+from barcode.barcode.label_jobs import enqueue_job_runner, publish_job_progress, save_job_state
+
+OUTPUTS = ("pdf", "zpl", "html")
+OUTPUT_EXTENSIONS = {"pdf": "pdf", "zpl": "zpl", "html": "html"}
+FILE_EXTENSIONS = (".csv", ".xlsx")
+# Progress is saved and published every this many rows
+PROGRESS_INTERVAL = 1000
+# Rendered HTML labels are written out in batches of this many
+WRITE_BATCH_SIZE = 500
+
+
+@frappe.whitelist()
+def enqueue_file_labels(file_url, template, output="pdf", mapping=None, options=None):
+	"""Queue a label job printing one label per row of an uploaded CSV or XLSX File
+
+	`mapping` maps label fields (item_code, item_name, barcode_value,
+	copies, ...) to column headers; columns named like a label field are used
+	without a mapping. `options` may hold `dpi`, `raster` and `compression`
+	for ZPL and `sheet_profile` for PDF. The rows are streamed from the file
+	and the labels to the output, so the job's memory use does not grow with
+	the number of rows.
+	"""
+	mapping = json.loads(mapping) if isinstance(mapping, str) else (mapping or {})
+	options = json.loads(options) if isinstance(options, str) else (options or {})
+	if output not in OUTPUTS:
+		frappe.throw(_("Unknown label output {0}").format(output))
+
+	frappe.has_permission("Barcode Label Template", "read", template, throw=True)
+	path = get_file_path(file_url)
+
+	job_id = frappe.generate_hash(length=16)
+	state = {
+		"job_id": job_id,
+		"kind": "file_labels",
+		"template": template,
+		"owner": frappe.session.user,
+		"status": "Queued",
+		"total_items": count_file_rows(path),
+		"completed_chunks": 0,
+		"processed_items": 0,
+		"labels": 0,
+		"failures": [],
+		"failed_count": 0,
+		"error": None,
+		"created": now(),
+		"heartbeat": now(),
+		"file_url": file_url,
+		"output": output,
+		"mapping": mapping,
+		"options": options,
+	}
+	save_job_state(state)
+	enqueue_job_runner(job_id)
+
+	return {
+		"success": True,
+		"queued": True,
+		"job_id": job_id,
+		"total": state["total_items"],
+		"message": _("Label job queued with {0} rows").format(state["total_items"]),
+	}
+
+
+def run_file_label_job(state):
+	"""Label job runner for `enqueue_file_labels`: stream the file into a stored artifact
+
+	The artifact is keyed by the file's content, the template version, the
+	mapping and the options, so a job run again over the same file reuses it.
+	A resumed job starts over; the partial output of the stopped run is discarded.
+	"""
+	from barcode.barcode.artifact_store import ensure_artifact, get_artifact_key, get_artifact_url
+
+	path = get_file_path(state["file_url"])
+	template_doc = frappe.get_doc("Barcode Label Template", state["template"])
+	output = state["output"]
+	key = get_artifact_key(
+		"file-labels",
+		get_file_hash(path),
+		template_doc.name,
+		template_doc.modified,
+		output,
+		state["mapping"],
+		state["options"],
+	)
+
+	state.update({"status": "Running", "error": None, "processed_items": 0, "labels": 0, "heartbeat": now()})
+	save_job_state(state)
+	publish_job_progress(state)
+
+	def progress(stats):
+		state.update({"processed_items": stats["rows"], "labels": stats["labels"], "heartbeat": now()})
+		save_job_state(state)
+		publish_job_progress(state)
+
+	stats = None
+
+	def write(file):
+		nonlocal stats
+		stats = write_file_labels(
+			path, template_doc, output, file, state["mapping"], state["options"], progress
+		)
+
+	try:
+		name = ensure_artifact(key, OUTPUT_EXTENSIONS[output], write)
+		if stats:
+			state.update(
+				{
+					"processed_items": stats["rows"],
+					"labels": stats["labels"],
+					"seconds": stats["seconds"],
+					"labels_per_second": stats["labels_per_second"],
+				}
+			)
+		state.update(
+			{
+				"status": "Completed",
+				"output_url": get_artifact_url(name, f"labels.{OUTPUT_EXTENSIONS[output]}"),
+				"heartbeat": now(),
+			}
+		)
+	except Exception as e:
+		frappe.log_error(f"Barcode file label job {state['job_id']} failed: {e!s}")
+		state.update({"status": "Failed", "error": str(e), "heartbeat": now()})
+
+	save_job_state(state)
+	publish_job_progress(state)
+
+
+def write_file_labels(path, template_doc, output, file, mapping=None, options=None, progress=None):
+	"""Write one label per row of a CSV or XLSX file to the binary file object `file`
+
+	Rows are read one at a time and each label is written as soon as it is
+	rendered, so memory stays bounded whatever the number of rows. `progress`
+	is called with the running stats every PROGRESS_INTERVAL rows. Returns the
+	stats: rows, labels, seconds and labels per second.
+	"""
+	options = options or {}
+	stats = {"rows": 0, "labels": 0, "seconds": 0, "labels_per_second": 0}
+	started = time.monotonic()
+
+	def iter_labels():
+		for data in iter_label_data(path, mapping or {}):
+			stats["rows"] += 1
+			stats["labels"] += data["copies"]
+			if progress and stats["rows"] % PROGRESS_INTERVAL == 0:
+				progress(stats)
+			yield data
+
+	def write(writer):
+		stats.update({"rows": 0, "labels": 0})
+		writer(template_doc, iter_labels(), file, options)
+
+	if output == "pdf":
+		from barcode.barcode.label_program import uses_label_program
+		from barcode.barcode.pdf_writer import UnsupportedLabelError
+
+		try:
+			write(write_pdf_labels if uses_label_program(template_doc) else write_html_pdf_labels)
+		except UnsupportedLabelError:
+			# a label the PDF writer cannot draw (e.g. text outside Latin-1): start over through wkhtmltopdf
+			file.seek(0)
+			file.truncate()
+			write(write_html_pdf_labels)
+	else:
+		write({"zpl": write_zpl_labels, "html": write_html_labels}[output])
+
+	stats["seconds"] = round(time.monotonic() - started, 3)
+	stats["labels_per_second"] = round(stats["labels"] / stats["seconds"], 1) if stats["seconds"] else 0
+	if progress:
+		progress(stats)
+	return stats
+
+
+def write_pdf_labels(template_doc, labels, file, options):
+	from barcode.barcode.imposition import get_sheet_layout
+	from barcode.barcode.label_program import get_template_program
+	from barcode.barcode.pdf_writer import write_program_pdf
+
+	layout = get_sheet_layout(
+		template_doc.label_width, template_doc.label_height, options.get("sheet_profile")
+	)
+	labels_data = (data for data in labels for _copy in range(data["copies"]))
+	write_program_pdf(get_template_program(template_doc), labels_data, file, layout)
+
+
+def write_html_pdf_labels(template_doc, labels, file, options):
+	"""PDF of the rendered template HTML, for labels the PDF writer cannot draw"""
+	from barcode.barcode.api_advanced import render_batch_label
+	from barcode.barcode.imposition import get_sheet_layout
+	from barcode.barcode.print_api import write_label_bodies_pdf
+
+	layout = get_sheet_layout(
+		template_doc.label_width, template_doc.label_height, options.get("sheet_profile")
+	)
+	label_bodies = (
+		body for data in labels for body in repeat(render_batch_label(template_doc, data), data["copies"])
+	)
+	write_label_bodies_pdf(template_doc, label_bodies, file, layout)
+
+
+def write_zpl_labels(template_doc, labels, file, options):
+	from barcode.barcode.label_program import get_template_program, uses_label_program
+	from barcode.barcode.zpl import DEFAULT_DPI, compile_zpl_format, get_zpl_program, needs_raster
+
+	program = get_template_program(template_doc)
+	dpi = cint(options.get("dpi")) or DEFAULT_DPI
+
+	if not uses_label_program(template_doc):
+		# the template's own markup is printed as rendered graphics
+		from barcode.barcode.api_advanced import render_batch_label
+		from barcode.barcode.raster import iter_template_raster_zpl
+
+		label_bodies = (
+			body for data in labels for body in repeat(render_batch_label(template_doc, data), data["copies"])
+		)
+		commands = iter_template_raster_zpl(template_doc, label_bodies, 1, dpi, options.get("compression"))
+	elif options.get("raster") or needs_raster(program):
+		from barcode.barcode.raster import iter_raster_zpl
+
+		template_data = {
+			"program": program,
+			"width": template_doc.label_width,
+			"height": template_doc.label_height,
+		}
+		labels_data = (data for data in labels for _copy in range(data["copies"]))
+		commands = iter_raster_zpl(template_data, labels_data, 1, dpi, options.get("compression"))
+	else:
+		graphic_commands, parts = get_zpl_program(program, dpi)
+		commands = (compile_zpl_format(parts, data, data["copies"]) for data in labels)
+		file.write("".join(graphic_commands).encode())
+
+	for command in commands:
+		file.write(command.encode())
+
+
+def write_html_labels(template_doc, labels, file, options):
+	"""Printable HTML document: the template's stylesheet once, then the rendered label bodies"""
+	from barcode.barcode.api_advanced import render_batch_label
+	from barcode.barcode.template_cache import get_cached_css
+
+	file.write(f"<style>\n{get_cached_css(template_doc)}\n</style>\n".encode())
+	batch = []
+	for data in labels:
+		batch.extend([render_batch_label(template_doc, data)] * data["copies"])
+		if len(batch) >= WRITE_BATCH_SIZE:
+			file.write("".join(batch).encode())
+			batch = []
+	file.write("".join(batch).encode())
+
+
+def iter_label_data(path, mapping):
+	"""Label data of every row of the file, with `barcode_value` and `copies` filled in"""
+	rows = iter_file_rows(path)
+	header = next(rows, None)
+	if header is None:
+		return
+
+	columns = get_column_map(header, mapping)
+	for values in rows:
+		data = {
+			field: get_cell_value(values[index]) for field, index in columns.items() if index < len(values)
+		}
+		if not any(data.values()):
+			continue
+		data.setdefault("barcode_value", data.get("item_code") or "")
+		data["copies"] = max(1, cint(data.get("copies") or 1))
+		yield data
+
+
+def get_column_map(header, mapping):
+	"""{label field: column index}: the mapped columns, then every other column under its normalized header"""
+	indexes = {
+		normalize_header(column): index for index, column in enumerate(header) if column not in (None, "")
+	}
+
+	columns = {}
+	for field, column in mapping.items():
+		if not column:
+			continue
+		if normalize_header(column) not in indexes:
+			frappe.throw(_("Column {0} mapped to {1} is not in the file").format(column, field))
+		columns[field] = indexes[normalize_header(column)]
+
+	mapped = set(columns.values())
+	for name, index in indexes.items():
+		if index not in mapped:
+			columns.setdefault(name, index)
+	return columns
+
+
+def normalize_header(column):
+	return str(column).strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def get_cell_value(value):
+	if value is None:
+		return ""
+	if isinstance(value, float) and value.is_integer():
+		# spreadsheets store codes such as 100234 as numbers
+		return str(int(value))
+	if isinstance(value, int | float):
+		return str(value)
+	if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+		return value.date()
+	return value
+
+
+def iter_file_rows(path):
+	"""Rows (lists of cell values, the header first) of a CSV or XLSX file, read one at a time"""
+	if path.lower().endswith(".xlsx"):
+		from openpyxl import load_workbook
+
+		workbook = load_workbook(path, read_only=True, data_only=True)
+		try:
+			for row in workbook.active.iter_rows(values_only=True):
+				yield list(row)
+		finally:
+			workbook.close()
+		return
+
+	with open(path, newline="", encoding="utf-8-sig") as f:
+		yield from csv.reader(f)
+
+
+def count_file_rows(path):
+	"""Number of data rows of the file, for progress reporting"""
+	if path.lower().endswith(".xlsx"):
+		from openpyxl import load_workbook
+
+		workbook = load_workbook(path, read_only=True)
+		try:
+			max_row = workbook.active.max_row
+		finally:
+			workbook.close()
+		if max_row:
+			return max(0, max_row - 1)
+
+	return max(0, sum(1 for _row in iter_file_rows(path)) - 1)
+
+
+def get_file_path(file_url):
+	"""Path of an uploaded CSV or XLSX File the user can read"""
+	file_doc = frappe.get_doc("File", {"file_url": file_url})
+	file_doc.check_permission("read")
+	path = file_doc.get_full_path()
+	if not path.lower().endswith(FILE_EXTENSIONS) or not os.path.isfile(path):
+		frappe.throw(_("Labels can only be printed from a CSV or XLSX file"))
+	return path
+
+
+def get_file_hash(path):
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		for block in iter(lambda: f.read(1024 * 1024), b""):
+			digest.update(block)
+	return digest.hexdigest()
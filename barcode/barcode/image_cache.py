@@ -0,0 +1,89 @@
+import hashlib
+
+import frappe
+from frappe.utils import cint
+
+from barcode.barcode.lru_cache import BoundedLRUCache
+from barcode.barcode.settings_cache import get_setting
+
+DEFAULT_IMAGE_CACHE_MB = 32
+SHARED_CACHE_PREFIX = "barcode_image"
+SHARED_CACHE_TTL = 24 * 60 * 60
+
+_image_cache = BoundedLRUCache(DEFAULT_IMAGE_CACHE_MB * 1024 * 1024)
+_config = {"shared": False}
+_shared_stats = {"hits": 0, "misses": 0}
+
+
+def get_cached_image(symbology, value, module_size, output_format, generator):
+	"""Return a generated barcode/QR image, calling `generator` only on a cache miss.
+
+	Lookups go to the per-worker LRU first and then, when enabled in Barcode Label
+	Settings, to the shared Redis tier.
+	"""
+	sync_image_cache_settings()
+
+	if not _image_cache.max_bytes and not _config["shared"]:
+		return generator()
+
+	key = (symbology, str(value), module_size, output_format)
+	image = _image_cache.get(key)
+	if image is not None:
+		return image
+
+	shared_key = get_shared_cache_key(key) if _config["shared"] else None
+	if shared_key:
+		image = frappe.cache().get_value(shared_key)
+		if image is not None:
+			_shared_stats["hits"] += 1
+			_image_cache.set(key, image)
+			return image
+		_shared_stats["misses"] += 1
+
+	image = generator()
+	_image_cache.set(key, image)
+	if shared_key:
+		frappe.cache().set_value(shared_key, image, expires_in_sec=SHARED_CACHE_TTL)
+
+	return image
+
+
+def get_shared_cache_key(key):
+	digest = hashlib.sha1(repr(key).encode()).hexdigest()
+	return f"{SHARED_CACHE_PREFIX}:{digest}"
+
+
+def sync_image_cache_settings():
+	"""Apply size limit and shared-tier flag from Barcode Label Settings (once per request/job)"""
+	if getattr(frappe.local, "barcode_image_cache_synced", False):
+		return
+
+	frappe.local.barcode_image_cache_synced = True
+	size_mb = cint(get_setting("image_cache_size", DEFAULT_IMAGE_CACHE_MB))
+
+	max_bytes = max(0, size_mb) * 1024 * 1024
+	if max_bytes != _image_cache.max_bytes:
+		_image_cache.resize(max_bytes)
+
+	_config["shared"] = bool(cint(get_setting("enable_shared_image_cache")))
+
+
+def clear_image_cache():
+	"""Clear the image cache of this worker"""
+	_image_cache.clear()
+
+
+@frappe.whitelist()
+def get_image_cache_stats():
+	"""Counters for the generated image cache of this worker"""
+	frappe.only_for("System Manager")
+
+	stats = _image_cache.stats()
+	stats.update(
+		{
+			"shared_enabled": _config["shared"],
+			"shared_hits": _shared_stats["hits"],
+			"shared_misses": _shared_stats["misses"],
+		}
+	)
+	return stats
@@ -0,0 +1,251 @@
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from barcode.barcode.settings_cache import get_setting
+
+ROLL_PROFILE = "Label Roll"
+DEFAULT_SHEET_PROFILE = ROLL_PROFILE
+DEFAULT_SHEET_MARGIN = 5
+DEFAULT_SHEET_GUTTER = 2
+
+# Sheet sizes and label stock layouts, all dimensions in mm. Profiles without
+# columns/rows are auto-fit: the grid is computed from the label size.
+SHEET_PROFILES = {
+	ROLL_PROFILE: {},
+	"A4 (Auto Fit)": {"page_width": 210, "page_height": 297},
+	"Letter (Auto Fit)": {"page_width": 215.9, "page_height": 279.4},
+	"Avery L7160 (A4, 21 labels)": {
+		"page_width": 210,
+		"page_height": 297,
+		"columns": 3,
+		"rows": 7,
+		"label_width": 63.5,
+		"label_height": 38.1,
+		"margin_top": 15.1,
+		"margin_left": 7.2,
+		"column_gap": 2.5,
+		"row_gap": 0,
+	},
+	"Avery L7163 (A4, 14 labels)": {
+		"page_width": 210,
+		"page_height": 297,
+		"columns": 2,
+		"rows": 7,
+		"label_width": 99.1,
+		"label_height": 38.1,
+		"margin_top": 15.1,
+		"margin_left": 4.6,
+		"column_gap": 2.5,
+		"row_gap": 0,
+	},
+	"Avery L7173 (A4, 10 labels)": {
+		"page_width": 210,
+		"page_height": 297,
+		"columns": 2,
+		"rows": 5,
+		"label_width": 99.1,
+		"label_height": 57,
+		"margin_top": 6,
+		"margin_left": 4.7,
+		"column_gap": 2.5,
+		"row_gap": 0,
+	},
+	"Avery L7651 (A4, 65 labels)": {
+		"page_width": 210,
+		"page_height": 297,
+		"columns": 5,
+		"rows": 13,
+		"label_width": 38.1,
+		"label_height": 21.2,
+		"margin_top": 10.7,
+		"margin_left": 4.7,
+		"column_gap": 2.5,
+		"row_gap": 0,
+	},
+	"Avery 5160 (Letter, 30 labels)": {
+		"page_width": 215.9,
+		"page_height": 279.4,
+		"columns": 3,
+		"rows": 10,
+		"label_width": 66.675,
+		"label_height": 25.4,
+		"margin_top": 12.7,
+		"margin_left": 4.7625,
+		"column_gap": 3.175,
+		"row_gap": 0,
+	},
+	"Avery 5163 (Letter, 10 labels)": {
+		"page_width": 215.9,
+		"page_height": 279.4,
+		"columns": 2,
+		"rows": 5,
+		"label_width": 101.6,
+		"label_height": 50.8,
+		"margin_top": 12.7,
+		"margin_left": 3.96875,
+		"column_gap": 4.7625,
+		"row_gap": 0,
+	},
+	"Avery 5167 (Letter, 80 labels)": {
+		"page_width": 215.9,
+		"page_height": 279.4,
+		"columns": 4,
+		"rows": 20,
+		"label_width": 44.45,
+		"label_height": 12.7,
+		"margin_top": 12.7,
+		"margin_left": 7.62,
+		"column_gap": 7.62,
+		"row_gap": 0,
+	},
+}
+
+
+def get_sheet_layout(label_width, label_height, profile=None):
+	"""Grid of labels on one sheet for `profile`, or None to print one label per page.
+
+	The profile defaults to the Sheet Profile of Barcode Label Settings. Labels
+	larger than the cells of a fixed stock layout are scaled down to fit.
+	"""
+	profile = profile or get_default_sheet_profile()
+	if profile not in SHEET_PROFILES:
+		frappe.throw(_("Unknown sheet profile {0}").format(profile))
+
+	spec = SHEET_PROFILES[profile]
+	if not spec:
+		return None
+
+	label_width, label_height = flt(label_width) or 50, flt(label_height) or 30
+	if spec.get("columns"):
+		layout = frappe._dict(spec, profile=profile)
+	else:
+		layout = get_auto_fit_layout(spec, label_width, label_height)
+		if not layout:
+			return None
+		layout.profile = profile
+
+	layout.scale = min(1, layout.label_width / label_width, layout.label_height / label_height)
+	layout.per_page = layout.columns * layout.rows
+	return layout
+
+
+def get_auto_fit_layout(spec, label_width, label_height):
+	"""Fit as many labels as possible inside the sheet margins, centred on the page"""
+	margin = get_sheet_setting("sheet_margin", DEFAULT_SHEET_MARGIN)
+	gutter = get_sheet_setting("sheet_gutter", DEFAULT_SHEET_GUTTER)
+	page_width, page_height = spec["page_width"], spec["page_height"]
+
+	columns = int((page_width - 2 * margin + gutter) // (label_width + gutter))
+	rows = int((page_height - 2 * margin + gutter) // (label_height + gutter))
+	if columns < 1 or rows < 1:
+		return None
+
+	grid_width = columns * label_width + (columns - 1) * gutter
+	grid_height = rows * label_height + (rows - 1) * gutter
+	return frappe._dict(
+		page_width=page_width,
+		page_height=page_height,
+		columns=columns,
+		rows=rows,
+		label_width=label_width,
+		label_height=label_height,
+		margin_left=(page_width - grid_width) / 2,
+		margin_top=(page_height - grid_height) / 2,
+		column_gap=gutter,
+		row_gap=gutter,
+	)
+
+
+def get_default_sheet_profile():
+	profile = get_setting("sheet_profile")
+	return profile if profile in SHEET_PROFILES else DEFAULT_SHEET_PROFILE
+
+
+def get_sheet_setting(fieldname, default):
+	return flt(get_setting(fieldname, default))
+
+
+def get_cell_positions(layout, count=None):
+	"""(left, top) in mm of the first `count` cells, filled row by row"""
+	count = layout.per_page if count is None else count
+	for index in range(count):
+		row, column = divmod(index, layout.columns)
+		yield (
+			layout.margin_left + column * (layout.label_width + layout.column_gap),
+			layout.margin_top + row * (layout.label_height + layout.row_gap),
+		)
+
+
+def render_sheet(label_html, layout, count=None):
+	"""HTML of one sheet holding `count` copies of `label_html` (a full sheet by default)"""
+	return render_label_sheet([label_html] * (layout.per_page if count is None else count), layout)
+
+
+def render_label_sheet(labels_html, layout):
+	"""HTML of one sheet holding the labels of `labels_html` (at most a sheet's worth), filled row by row"""
+	transform = f"transform: scale({layout.scale:g}); transform-origin: 0 0;" if layout.scale < 1 else ""
+	parts = ['<div class="sheet">']
+	for (left, top), label_html in zip(
+		get_cell_positions(layout, len(labels_html)), labels_html, strict=True
+	):
+		parts.append(
+			f'<div class="sheet-cell" style="left: {left:.3f}mm; top: {top:.3f}mm; {transform}">{label_html}</div>'
+		)
+	parts.append("</div>")
+	return "".join(parts)
+
+
+def get_sheet_css(layout):
+	return f"""
+		@page {{
+			size: {layout.page_width}mm {layout.page_height}mm;
+			margin: 0;
+		}}
+		.sheet {{
+			width: {layout.page_width}mm;
+			height: {layout.page_height}mm;
+			position: relative;
+			overflow: hidden;
+			page-break-after: always;
+		}}
+		.sheet:last-child {{
+			page-break-after: avoid;
+		}}
+		.sheet-cell {{
+			position: absolute;
+		}}
+		.sheet .label {{
+			border: none;
+			page-break-after: auto;
+		}}
+	"""
+
+
+def get_sheet_counts(copies, layout):
+	"""Number of full sheets and labels on the trailing partial sheet"""
+	return divmod(max(0, copies), layout.per_page)
+
+
+def get_pdf_options(layout, label_width, label_height):
+	"""wkhtmltopdf page size for a sheet layout, or for a single label when `layout` is None"""
+	page_width = layout.page_width if layout else flt(label_width) or 50
+	page_height = layout.page_height if layout else flt(label_height) or 30
+	return {
+		"page-width": f"{page_width}mm",
+		"page-height": f"{page_height}mm",
+		"margin-top": "0mm",
+		"margin-bottom": "0mm",
+		"margin-left": "0mm",
+		"margin-right": "0mm",
+	}
+
+
+@frappe.whitelist()
+def get_sheet_profiles(label_width=None, label_height=None):
+	"""Sheet profiles with the labels per page each would give for a label size"""
+	profiles = []
+	for name in SHEET_PROFILES:
+		layout = get_sheet_layout(label_width, label_height, name)
+		profiles.append({"name": name, "per_page": layout.per_page if layout else 1})
+	return profiles
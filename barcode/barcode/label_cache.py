@@ -0,0 +1,176 @@
+import hashlib
+import json
+import time
+
+import frappe
+from frappe.utils import cint
+
+from barcode.barcode.lru_cache import BoundedLRUCache, default_sizeof
+from barcode.barcode.settings_cache import get_setting, get_site
+from barcode.barcode.template_cache import get_template_version
+
+DEFAULT_LABEL_CACHE_MB = 32
+SHARED_CACHE_PREFIX = "barcode_label"
+# Entries older than this are treated as missing in both tiers
+CACHE_TTL = 24 * 60 * 60
+# Per-document version tokens, bumped whenever a label source changes. They
+# outlive every entry rendered under the previous token, so an expired token
+# can never make a stale entry valid again.
+DOC_VERSION_PREFIX = "barcode_label_doc_version"
+DOC_VERSION_TTL = 2 * CACHE_TTL
+ENTRY_OVERHEAD = 200
+
+
+def get_entry_size(entry):
+	value = entry[0]
+	if isinstance(value, tuple):
+		return sum(default_sizeof(part) for part in value) + ENTRY_OVERHEAD
+	return default_sizeof(value) + ENTRY_OVERHEAD
+
+
+# Keyed by site, then the key of the caller
+_label_cache = BoundedLRUCache(DEFAULT_LABEL_CACHE_MB * 1024 * 1024, sizeof=get_entry_size)
+_config = {"shared": False}
+_stats = {"shared_hits": 0, "shared_misses": 0, "stale": 0}
+
+
+def get_cached_label(kind, template_doc, label_data, render):
+	"""Rendered output (`kind` being 'html', 'raster', ...) of a label, calling `render()` only on a miss
+
+	The key is the template version and a hash of the resolved label data, so
+	any change to either renders again and no invalidation is needed.
+	"""
+	key = (kind, template_doc.name, get_template_version(template_doc), get_data_hash(label_data))
+	return get_cached_output(key, render)
+
+
+def get_cached_output(key, render):
+	"""Cached value of `key` (a tuple of plain values) on this site, calling `render()` only on a miss"""
+	sync_label_cache_settings()
+	if not _label_cache.max_bytes:
+		return render()
+
+	key = (get_site(), *key)
+	entry = lookup(key)
+	if entry is not None:
+		return entry[0]
+
+	value = render()
+	store(key, (value, None, time.time()))
+	return value
+
+
+def get_cached_source_label(key):
+	"""Cached label of a document, None when missing or when a document it was
+	rendered from has changed since"""
+	sync_label_cache_settings()
+	if not _label_cache.max_bytes:
+		return None
+
+	key = (get_site(), *key)
+	entry = lookup(key)
+	if entry is None:
+		return None
+
+	value, versions, _created = entry
+	if any(get_doc_version(doctype, name) != version for (doctype, name), version in versions.items()):
+		_stats["stale"] += 1
+		_label_cache.pop(key)
+		return None
+	return value
+
+
+def set_cached_source_label(key, value, versions):
+	"""Cache the label of a document rendered under `versions` ({(doctype, name): version}).
+
+	Read the versions with `get_doc_version` before reading the documents, so a
+	concurrent change is never recorded as seen.
+	"""
+	if _label_cache.max_bytes:
+		store((get_site(), *key), (value, versions, time.time()))
+
+
+def lookup(key):
+	entry = _label_cache.get(key)
+	if entry is not None and time.time() - entry[2] < CACHE_TTL:
+		return entry
+
+	if not _config["shared"]:
+		return None
+
+	entry = frappe.cache().get_value(get_shared_cache_key(key))
+	if entry is None:
+		_stats["shared_misses"] += 1
+		return None
+
+	_stats["shared_hits"] += 1
+	_label_cache.set(key, entry)
+	return entry
+
+
+def store(key, entry):
+	_label_cache.set(key, entry)
+	if _config["shared"]:
+		frappe.cache().set_value(get_shared_cache_key(key), entry, expires_in_sec=CACHE_TTL)
+
+
+def get_shared_cache_key(key):
+	digest = hashlib.sha1(repr(key).encode()).hexdigest()
+	return f"{SHARED_CACHE_PREFIX}:{digest}"
+
+
+def get_data_hash(label_data):
+	payload = json.dumps(label_data, sort_keys=True, separators=(",", ":"), default=str)
+	return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def get_doc_version(doctype, name):
+	return frappe.cache().get_value(f"{DOC_VERSION_PREFIX}:{doctype}:{name}")
+
+
+def invalidate_label_cache(doc, method=None, old_name=None, *args):
+	"""doc_events hook: drop the cached labels of an Item, Batch or Serial No once the change is committed"""
+	names = [doc.name, old_name] if old_name else [doc.name]
+
+	def bump_versions():
+		for name in names:
+			frappe.cache().set_value(
+				f"{DOC_VERSION_PREFIX}:{doc.doctype}:{name}",
+				frappe.generate_hash(length=12),
+				expires_in_sec=DOC_VERSION_TTL,
+			)
+
+	frappe.db.after_commit.add(bump_versions)
+
+
+def sync_label_cache_settings():
+	"""Apply size limit and shared-tier flag from Barcode Label Settings (once per request/job)"""
+	if getattr(frappe.local, "barcode_label_cache_synced", False):
+		return
+
+	frappe.local.barcode_label_cache_synced = True
+	max_bytes = max(0, cint(get_setting("label_cache_size", DEFAULT_LABEL_CACHE_MB))) * 1024 * 1024
+	if max_bytes != _label_cache.max_bytes:
+		_label_cache.resize(max_bytes)
+
+	_config["shared"] = bool(cint(get_setting("enable_shared_label_cache")))
+
+
+def clear_label_cache():
+	"""Clear the rendered label cache of this worker"""
+	_label_cache.clear()
+
+
+@frappe.whitelist()
+def get_label_cache_stats():
+	"""Counters for the rendered label cache of this worker"""
+	frappe.only_for("System Manager")
+
+	stats = _label_cache.stats()
+	stats.update(
+		{
+			"shared_enabled": _config["shared"],
+			**_stats,
+		}
+	)
+	return stats
@@ -0,0 +1,146 @@
+import frappe
+from frappe.utils.jinja import get_jenv
+from jinja2 import TemplateSyntaxError, meta
+
+from barcode.barcode.label_program import get_template_program
+from barcode.barcode.settings_cache import get_site
+from barcode.barcode.template_cache import get_template_source, get_template_version
+
+# Columns of the source doctypes that are always read, the print log records them
+LOG_COLUMNS = {
+	"Item": ["name", "item_code", "item_name"],
+	"Batch": ["name", "item"],
+	"Serial No": ["name", "item_code"],
+}
+
+# Label data keys read from another column of the source document, per doctype
+SOURCE_COLUMNS = {
+	"Batch": {"mfg_date": "manufacturing_date", "exp_date": "expiry_date"},
+}
+
+# Field on the source doctype that links to Item
+ITEM_LINK_FIELDS = {"Batch": "item", "Serial No": "item_code"}
+
+FETCH_CHUNK_SIZE = 1000
+MAX_CACHED_PLANS = 256
+
+# Keyed by site, template and template version
+_label_keys = {}
+_plans = {}
+
+
+def get_fetch_plan(template_doc, doctype):
+	"""What the labels of `template_doc` read from `doctype`, worked out once per template version
+
+	The plan holds the source columns to read (None for all of them), whether
+	the linked item's name is needed and the query reading them, joined
+	with Item when needed.
+	"""
+	key = (get_site(), template_doc.name, get_template_version(template_doc), doctype)
+	plan = _plans.get(key)
+	if plan is None:
+		plan = build_fetch_plan(template_doc, doctype)
+		_store(_plans, key, plan)
+	return plan
+
+
+def build_fetch_plan(template_doc, doctype):
+	uses = get_key_filter(template_doc)
+	plan = frappe._dict(columns=None, item_name=False, query=None)
+	if doctype not in LOG_COLUMNS:
+		return plan
+
+	link_field = ITEM_LINK_FIELDS.get(doctype)
+	columns = LOG_COLUMNS[doctype] + [
+		column for key, column in SOURCE_COLUMNS.get(doctype, {}).items() if uses(key)
+	]
+
+	custom_fields = [
+		f"custom_field_{index}"
+		for index in (1, 2)
+		if template_doc.get(f"show_custom_field_{index}") and uses(f"custom_field_{index}_value")
+	]
+	if custom_fields:
+		meta_doc = frappe.get_meta(doctype)
+		columns += [field for field in custom_fields if meta_doc.has_field(field)]
+
+	plan.columns = columns
+	# the second custom field falls back to the item name
+	plan.item_name = bool(link_field) and (uses("item_name") or "custom_field_2" in custom_fields)
+	plan.query = build_fetch_query(doctype, columns, plan.item_name)
+	return plan
+
+
+def get_key_filter(template_doc):
+	"""Predicate telling whether the template reads a label data key"""
+	keys = get_label_keys(template_doc)
+	return (lambda key: True) if keys is None else keys.__contains__
+
+
+def get_label_keys(template_doc):
+	"""Label data keys the template's Jinja source and label program read, None when unknown"""
+	key = (get_site(), template_doc.name, get_template_version(template_doc))
+	if key in _label_keys:
+		return _label_keys[key]
+
+	keys = {
+		element["field"] for element in get_template_program(template_doc)["elements"] if element["field"]
+	}
+	try:
+		keys.update(meta.find_undeclared_variables(get_jenv().parse(get_template_source(template_doc))))
+	except TemplateSyntaxError:
+		keys = None
+	_store(_label_keys, key, keys)
+	return keys
+
+
+def build_fetch_query(doctype, columns, item_name):
+	fields = [f"src.`{column}`" for column in columns]
+	join = ""
+	if item_name:
+		fields.append("item.item_name")
+		join = f"left join `tabItem` item on item.name = src.`{ITEM_LINK_FIELDS[doctype]}`"
+
+	return f"""
+		select {", ".join(fields)}
+		from `tab{doctype}` src
+		{join}
+		where src.name in %(names)s
+	"""
+
+
+def fetch_label_sources(doctype, docnames, plan):
+	"""`{docname: row}` of the documents, with the columns of `plan` (and `item_name` of the linked item)
+
+	Documents are read with one query per FETCH_CHUNK_SIZE names, once the
+	user is known to have read access to `doctype`.
+	"""
+	frappe.has_permission(doctype, "read", throw=True)
+
+	sources = {}
+	for chunk in get_chunks(list(dict.fromkeys(docnames)), FETCH_CHUNK_SIZE):
+		if plan.query:
+			rows = frappe.db.sql(plan.query, {"names": tuple(chunk)}, as_dict=True)
+		else:
+			rows = frappe.get_all(doctype, filters={"name": ["in", chunk]}, fields=["*"])
+		for row in rows:
+			sources[row.name] = row
+	return sources
+
+
+def get_label_company(template_doc):
+	"""Company for the labels of a job: the user's default company, looked up only when the template shows it"""
+	return frappe.defaults.get_user_default("Company") if get_key_filter(template_doc)("company") else ""
+
+
+def get_chunks(values, size):
+	"""Split a list into consecutive chunks of at most `size` values"""
+	for i in range(0, len(values), size):
+		yield values[i : i + size]
+
+
+def _store(cache, key, value):
+	if len(cache) >= MAX_CACHED_PLANS:
+		# dicts keep insertion order, so this drops the oldest entry
+		cache.pop(next(iter(cache)))
+	cache[key] = value
@@ -0,0 +1,292 @@
+import json
+import os
+import shutil
+
+import frappe
+from frappe import _
+from frappe.utils import cint, get_datetime, now, now_datetime
+
+from barcode.barcode.print_log import flush_print_logs
+from barcode.barcode.settings_cache import get_setting
+
+# Redis hash holding the state (checkpoint) of every label job, keyed by job id
+JOBS_KEY = "barcode_label_jobs"
+PROGRESS_EVENT = "barcode_label_job_progress"
+
+DEFAULT_JOB_THRESHOLD = 500
+DEFAULT_CHUNK_SIZE = 200
+STALE_JOB_SECONDS = 10 * 60
+FINISHED_JOB_TTL = 24 * 60 * 60
+MAX_REPORTED_FAILURES = 100
+
+# Chunk renderers per job kind. Each takes (template_doc, items, options) and
+# returns (label_bodies, results) for the chunk.
+JOB_RUNNERS = {
+	"bulk_print": "barcode.barcode.api.render_bulk_print_chunk",
+	"batch_labels": "barcode.barcode.api_advanced.render_batch_labels_chunk",
+	"transaction_labels": "barcode.barcode.transaction_labels.render_transaction_labels_chunk",
+}
+
+# Jobs that stream their input to a stored artifact instead of rendering
+# chunks of a payload. Each takes the job state and runs the whole job.
+STREAM_JOB_RUNNERS = {
+	"file_labels": "barcode.barcode.file_labels.run_file_label_job",
+}
+
+
+def should_run_in_background(label_count):
+	"""Whether a run of `label_count` labels should be rendered by a background job"""
+	threshold = cint(get_setting("background_job_threshold", DEFAULT_JOB_THRESHOLD))
+	return bool(threshold) and label_count > threshold
+
+
+def get_chunk_size():
+	return cint(get_setting("job_chunk_size")) or DEFAULT_CHUNK_SIZE
+
+
+def enqueue_label_job(kind, template, items, options=None):
+	"""Queue a chunked label job and return its initial status"""
+	if kind not in JOB_RUNNERS:
+		frappe.throw(_("Unknown label job type {0}").format(kind))
+
+	job_id = frappe.generate_hash(length=16)
+	chunk_size = get_chunk_size()
+	job_dir = get_job_dir(job_id)
+	os.makedirs(job_dir, exist_ok=True)
+
+	# The payload can be large, so it lives on disk next to the chunk outputs
+	with open(os.path.join(job_dir, "payload.json"), "w") as f:
+		json.dump({"items": items, "options": options or {}}, f, default=str)
+
+	state = {
+		"job_id": job_id,
+		"kind": kind,
+		"template": template,
+		"owner": frappe.session.user,
+		"status": "Queued",
+		"total_items": len(items),
+		"chunk_size": chunk_size,
+		"total_chunks": (len(items) + chunk_size - 1) // chunk_size,
+		"completed_chunks": 0,
+		"processed_items": 0,
+		"labels": 0,
+		"failures": [],
+		"failed_count": 0,
+		"error": None,
+		"created": now(),
+		"heartbeat": now(),
+	}
+	save_job_state(state)
+	enqueue_job_runner(job_id)
+
+	return {
+		"success": True,
+		"queued": True,
+		"job_id": job_id,
+		"total": len(items),
+		"message": _("Label job queued with {0} records").format(len(items)),
+	}
+
+
+def enqueue_job_runner(job_id):
+	frappe.enqueue(
+		"barcode.barcode.label_jobs.run_label_job",
+		queue="long",
+		timeout=60 * 60,
+		job_id=f"barcode_label_job::{job_id}",
+		deduplicate=True,
+		label_job_id=job_id,
+	)
+
+
+def run_label_job(label_job_id):
+	"""Render a label job chunk by chunk, checkpointing after each chunk.
+
+	Chunks completed by an earlier (crashed or failed) run are skipped, so a
+	resumed job continues where it stopped instead of reprinting.
+	"""
+	job_id = label_job_id
+	state = get_job_state(job_id)
+	if not state or state["status"] == "Completed":
+		return
+
+	# a job re-queued by the scheduler would otherwise run (and log) as Administrator
+	frappe.set_user(state["owner"])
+
+	if state["kind"] in STREAM_JOB_RUNNERS:
+		frappe.get_attr(STREAM_JOB_RUNNERS[state["kind"]])(state)
+		return
+
+	job_dir = get_job_dir(job_id)
+	with open(os.path.join(job_dir, "payload.json")) as f:
+		payload = json.load(f)
+
+	items = payload["items"]
+	options = payload["options"]
+	runner = frappe.get_attr(JOB_RUNNERS[state["kind"]])
+	chunk_size = state["chunk_size"]
+
+	state.update({"status": "Running", "error": None, "heartbeat": now()})
+	save_job_state(state)
+	publish_job_progress(state)
+
+	try:
+		template_doc = frappe.get_doc("Barcode Label Template", state["template"])
+
+		for chunk_index in range(state["completed_chunks"], state["total_chunks"]):
+			chunk = items[chunk_index * chunk_size : (chunk_index + 1) * chunk_size]
+			label_bodies, results = runner(template_doc, chunk, options)
+
+			with open(get_chunk_path(job_dir, chunk_index), "w") as f:
+				f.write("".join(label_bodies))
+
+			# write the chunk's print logs before checkpointing it
+			flush_print_logs()
+
+			failures = [result for result in results if not result["success"]]
+			state["failures"] = (state["failures"] + failures)[:MAX_REPORTED_FAILURES]
+			state["failed_count"] += len(failures)
+			state["labels"] += len(label_bodies)
+			state["processed_items"] += len(chunk)
+			state["completed_chunks"] = chunk_index + 1
+			state["heartbeat"] = now()
+			save_job_state(state)
+			publish_job_progress(state)
+
+		write_job_output(state, template_doc)
+		state.update({"status": "Completed", "heartbeat": now()})
+
+	except Exception as e:
+		frappe.log_error(f"Barcode label job {job_id} failed: {e!s}")
+		state.update({"status": "Failed", "error": str(e), "heartbeat": now()})
+
+	save_job_state(state)
+	publish_job_progress(state)
+
+
+def write_job_output(state, template_doc):
+	"""Stream the chunk outputs into one printable HTML document"""
+	from barcode.barcode.template_cache import get_cached_css
+
+	job_dir = get_job_dir(state["job_id"])
+	with open(get_output_path(job_dir), "w") as output:
+		output.write(f"<style>\n{get_cached_css(template_doc)}\n</style>\n")
+		for chunk_index in range(state["total_chunks"]):
+			with open(get_chunk_path(job_dir, chunk_index)) as chunk_file:
+				shutil.copyfileobj(chunk_file, output)
+
+
+def publish_job_progress(state):
+	frappe.publish_realtime(PROGRESS_EVENT, get_public_state(state), user=state["owner"])
+
+
+def get_public_state(state):
+	total = state["total_items"] or 1
+	return {
+		"job_id": state["job_id"],
+		"kind": state["kind"],
+		"template": state["template"],
+		"status": state["status"],
+		"total": state["total_items"],
+		"processed": state["processed_items"],
+		"progress": round(state["processed_items"] * 100 / total, 1),
+		"labels": state["labels"],
+		"failed_count": state["failed_count"],
+		"failures": state["failures"],
+		"error": state["error"],
+		"created": state["created"],
+		"output_url": state.get("output_url"),
+		"labels_per_second": state.get("labels_per_second"),
+	}
+
+
+def get_job_dir(job_id):
+	return frappe.get_site_path("private", "barcode_label_jobs", job_id)
+
+
+def get_chunk_path(job_dir, chunk_index):
+	return os.path.join(job_dir, f"chunk-{chunk_index:06d}.html")
+
+
+def get_output_path(job_dir):
+	return os.path.join(job_dir, "labels.html")
+
+
+def get_job_state(job_id):
+	return frappe.cache().hget(JOBS_KEY, job_id)
+
+
+def save_job_state(state):
+	frappe.cache().hset(JOBS_KEY, state["job_id"], state)
+
+
+def get_permitted_job_state(job_id):
+	state = get_job_state(job_id)
+	if not state:
+		frappe.throw(_("Label job {0} not found").format(job_id), frappe.DoesNotExistError)
+
+	if state["owner"] != frappe.session.user and "System Manager" not in frappe.get_roles():
+		frappe.throw(_("Not permitted to access this label job"), frappe.PermissionError)
+
+	return state
+
+
+@frappe.whitelist()
+def get_label_job_status(job_id):
+	"""Poll the status and progress of a label job"""
+	return get_public_state(get_permitted_job_state(job_id))
+
+
+@frappe.whitelist()
+def resume_label_job(job_id):
+	"""Re-queue a failed or interrupted label job from its last checkpoint"""
+	state = get_permitted_job_state(job_id)
+	if state["status"] == "Completed":
+		return get_public_state(state)
+
+	state.update({"status": "Queued", "heartbeat": now()})
+	save_job_state(state)
+	enqueue_job_runner(job_id)
+	return get_public_state(state)
+
+
+@frappe.whitelist()
+def download_label_job_output(job_id):
+	"""Download the printable HTML document of a completed label job"""
+	state = get_permitted_job_state(job_id)
+	if state["status"] != "Completed":
+		frappe.throw(_("Label job {0} is not completed yet").format(job_id))
+
+	if state.get("output_url"):
+		# streamed jobs write to the artifact store
+		frappe.local.response["type"] = "redirect"
+		frappe.local.response["location"] = state["output_url"]
+		return
+
+	from werkzeug.utils import send_file
+
+	# streamed from disk: the document of a large job does not fit in a request's memory
+	return send_file(
+		get_output_path(get_job_dir(job_id)),
+		frappe.local.request.environ,
+		mimetype="text/html",
+		as_attachment=True,
+		download_name=f"labels-{job_id}.html",
+		conditional=True,
+	)
+
+
+def resume_stale_label_jobs():
+	"""Scheduler: re-queue jobs whose worker stopped sending heartbeats, drop old finished jobs"""
+	for job_id, state in (frappe.cache().hgetall(JOBS_KEY) or {}).items():
+		job_id = frappe.safe_decode(job_id)
+		age = (now_datetime() - get_datetime(state["heartbeat"])).total_seconds()
+
+		if state["status"] in ("Queued", "Running") and age > STALE_JOB_SECONDS:
+			state.update({"status": "Queued", "heartbeat": now()})
+			save_job_state(state)
+			enqueue_job_runner(job_id)
+
+		elif state["status"] in ("Completed", "Failed") and age > FINISHED_JOB_TTL:
+			shutil.rmtree(get_job_dir(job_id), ignore_errors=True)
+			frappe.cache().hdel(JOBS_KEY, job_id)
@@ -0,0 +1,466 @@
+import hashlib
+import json
+import keyword
+from html import escape
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+# Bump when the compiled format changes so stored programs are rebuilt
+PROGRAM_VERSION = 1
+DESIGNER_PX_PER_MM = 3.78  # the visual designers lay out labels at 96 dpi
+PT_PER_PX = 0.75
+PT_PER_MM = 72 / 25.4
+MAX_CACHED_PROGRAMS = 256
+
+# Designer element type -> live data key holding its value
+ELEMENT_DATA_FIELDS = {
+	"barcode": "item_code",
+	"batch_barcode": "batch_no",
+	"serial_barcode": "serial_no",
+}
+
+GRAPHIC_TYPES = ("logo", "image")
+
+# Layout of templates configured with the "Show ..." checkboxes, top to bottom:
+# (checkbox, bound field, prefix, font size in pt, bold)
+FIELD_LAYOUT = (
+	("show_item_code", "item_code", "", 10, True),
+	("show_item_name", "item_name", "", 9, False),
+	("show_batch_no", "batch_no", "Batch: ", 8, False),
+	("show_serial_no", "serial_no", "Serial: ", 8, False),
+	("show_mfg_date", "mfg_date", "MFG: ", 7, False),
+	("show_exp_date", "exp_date", "EXP: ", 7, False),
+	("show_quantity", "quantity", "Qty: ", 8, False),
+	("show_company", "company", "", 8, False),
+)
+FIELD_LAYOUT_PADDING = 2  # mm
+MIN_BARCODE_HEIGHT = 6  # mm
+LINE_HEIGHT = 1.25
+
+# Compiled programs keyed by content hash
+_programs = {}
+
+
+def get_label_program(template_data, source="designer"):
+	"""Compiled program for designer template data (elements + label size), compiled once per content
+
+	Template data that already carries a compiled `program` (see
+	`get_template_program`) is used as is.
+	"""
+	if template_data.get("program"):
+		return template_data["program"]
+
+	key = get_content_hash(get_program_source(template_data))
+	program = _programs.get(key)
+	if program is None:
+		program = compile_label_program(template_data, source)
+		_store(key, program)
+	return program
+
+
+def get_template_program(template_doc):
+	"""Compiled program of a Barcode Label Template, as stored with the template when available"""
+	stored_hash = template_doc.get("label_program_hash")
+	if stored_hash and template_doc.get("label_program"):
+		program = _programs.get(stored_hash)
+		if program is None:
+			program = json.loads(template_doc.label_program)
+			if program.get("version") != PROGRAM_VERSION:
+				program = build_template_program(template_doc)
+			_store(stored_hash, program)
+		return program
+
+	# templates saved before programs were stored
+	return get_label_program(get_template_source_data(template_doc), source="fields")
+
+
+def uses_label_program(template_doc):
+	"""Whether a Barcode Label Template prints its label program
+
+	True without markup of its own or with the markup generated from the
+	program; templates with custom HTML or CSS are rendered from that instead.
+	"""
+	if not template_doc.get("html_template"):
+		return True
+
+	html, css = render_program_template(get_template_program(template_doc))
+	return template_doc.html_template.strip() == html.strip() and (
+		template_doc.get("css_styles") or ""
+	).strip() in ("", css.strip())
+
+
+def compile_label_program(template_data, source="designer"):
+	"""Compile designer template data into a label program.
+
+	A program is a JSON-serializable dict: the label size in mm, the default
+	symbology and positioned elements with all units resolved (mm, font sizes
+	in pt) and their data bindings. It carries a content hash so backends and
+	caches can key on it.
+	"""
+	data = get_program_source(template_data)
+	return finalize_program(
+		{
+			"version": PROGRAM_VERSION,
+			"source": source,
+			"width": data["width"],
+			"height": data["height"],
+			"barcode_type": data["barcode_type"],
+			"elements": [compile_element(element) for element in data["elements"]],
+		}
+	)
+
+
+def finalize_program(program):
+	"""Set the content hash of a program"""
+	program["hash"] = get_content_hash({key: value for key, value in program.items() if key != "hash"})
+	return program
+
+
+def get_program_source(template_data):
+	return {
+		"width": flt(template_data.get("width") or template_data.get("label_width") or 50),
+		"height": flt(template_data.get("height") or template_data.get("label_height") or 30),
+		"barcode_type": template_data.get("barcode_type") or "Code128",
+		"elements": template_data.get("elements") or [],
+	}
+
+
+def get_content_hash(data):
+	payload = json.dumps([PROGRAM_VERSION, data], sort_keys=True, separators=(",", ":"), default=str)
+	return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def compile_element(element):
+	"""Resolve one designer element (any of the designers' schemas) to a program element"""
+	element_type = element.get("type") or element.get("field") or "text"
+	config = element.get("config") or {}
+	font_size = element.get("fontSize", config.get("fontSize", 12))
+
+	compiled = {
+		"kind": "text",
+		"x": px_to_mm(element.get("x")),
+		"y": px_to_mm(element.get("y")),
+		"width": px_to_mm(element.get("width")),
+		"height": px_to_mm(element.get("height")),
+		"field": None,
+		"prefix": element.get("prefix") or "",
+		"content": element.get("content") or "",
+		"font_size": round(parse_px(font_size) * PT_PER_PX, 2),
+		"font_weight": element.get("fontWeight") or config.get("fontWeight") or "normal",
+		"color": element.get("color") or config.get("color") or "#000",
+		"align": element.get("textAlign") or "left",
+		"z_index": cint(element.get("zIndex")) or None,
+	}
+
+	if element_type in ELEMENT_DATA_FIELDS or element.get("field") == "barcode":
+		compiled.update(
+			{
+				"kind": "barcode",
+				"field": ELEMENT_DATA_FIELDS.get(element_type, "item_code"),
+				"symbology": element.get("barcodeType"),
+				"show_text": bool(element.get("showText", True)),
+			}
+		)
+	elif element_type == "qr":
+		qr_content = element.get("qrContent") or config.get("content")
+		compiled.update(
+			{
+				"kind": "qr",
+				"field": None if qr_content else "item_code",
+				"content": qr_content or compiled["content"],
+				"symbology": element.get("barcodeType") or "QR Code",
+			}
+		)
+	elif element_type in ("line", "box"):
+		compiled.update({"kind": element_type, "border": px_to_mm(element.get("borderWidth", 2))})
+	elif element_type in GRAPHIC_TYPES:
+		compiled.update({"kind": "image", "image_url": element.get("imageUrl") or ""})
+	elif element_type == "table":
+		from barcode.barcode.api_advanced import generate_table_html
+
+		compiled.update({"kind": "html", "content": generate_table_html(config)})
+	elif element_type == "text" and config:
+		# static text of the advanced designer
+		compiled.update({"content": config.get("content", ""), "align": "center"})
+	else:
+		compiled["field"] = element.get("field") or element_type
+
+	if compiled["field"] and not is_field_name(compiled["field"]):
+		frappe.throw(_("Invalid label field {0}").format(compiled["field"]))
+	return compiled
+
+
+def is_field_name(field):
+	"""Whether `field` is a plain identifier, safe to use as a Jinja variable"""
+	return isinstance(field, str) and field.isidentifier() and not keyword.iskeyword(field)
+
+
+def build_template_program(template_doc):
+	"""Program for a Barcode Label Template: its designer layout, else the "Show ..." field layout"""
+	stored = json.loads(template_doc.label_program) if template_doc.get("label_program") else None
+	if stored and stored.get("source") == "designer" and stored.get("version") == PROGRAM_VERSION:
+		# keep the designed elements, follow the template's label size and symbology
+		size = get_template_size(template_doc)
+		stored.update(
+			{
+				"width": size["label_width"],
+				"height": size["label_height"],
+				"barcode_type": size["barcode_type"],
+			}
+		)
+		return finalize_program(stored)
+
+	return compile_label_program(get_template_source_data(template_doc), source="fields")
+
+
+def get_template_source_data(template_doc):
+	"""Designer style template data for a template laid out through its "Show ..." checkboxes"""
+	data = get_template_size(template_doc)
+	width, height = data["label_width"], data["label_height"]
+	inner_width = max(width - 2 * FIELD_LAYOUT_PADDING, 1)
+
+	rows = [row for row in FIELD_LAYOUT if template_doc.get(row[0])]
+	for index, label_field in ((1, "custom_field_1_label"), (2, "custom_field_2_label")):
+		if template_doc.get(f"show_custom_field_{index}") and template_doc.get(label_field):
+			rows.append((None, f"custom_field_{index}_value", f"{template_doc.get(label_field)}: ", 8, False))
+
+	elements = []
+	y = FIELD_LAYOUT_PADDING
+	for _checkbox, field, prefix, font_size, bold in rows:
+		row_height = font_size / PT_PER_MM * LINE_HEIGHT
+		elements.append(
+			{
+				"type": field,
+				"x": mm_to_px(FIELD_LAYOUT_PADDING),
+				"y": mm_to_px(y),
+				"width": mm_to_px(inner_width),
+				"height": mm_to_px(row_height),
+				"fontSize": round(font_size / PT_PER_PX, 2),
+				"fontWeight": "bold" if bold else "normal",
+				"textAlign": "center",
+				"prefix": prefix,
+			}
+		)
+		y += row_height
+
+	barcode_height = max(height - y - FIELD_LAYOUT_PADDING, MIN_BARCODE_HEIGHT)
+	elements.append(
+		{
+			"type": "barcode",
+			"x": mm_to_px(FIELD_LAYOUT_PADDING),
+			"y": mm_to_px(min(y, max(height - FIELD_LAYOUT_PADDING - barcode_height, 0))),
+			"width": mm_to_px(inner_width),
+			"height": mm_to_px(barcode_height),
+			"showText": bool(template_doc.get("show_barcode_text", 1)),
+		}
+	)
+
+	data["elements"] = elements
+	return data
+
+
+def get_template_size(template_doc):
+	return {
+		"label_width": flt(template_doc.label_width) or 50,
+		"label_height": flt(template_doc.label_height) or 30,
+		"barcode_type": template_doc.barcode_type or "Code128",
+	}
+
+
+def get_bound_value(element, live_data):
+	"""Value of a program element for one label: its bound live data field, else its static content"""
+	if element["field"] and live_data:
+		value = live_data.get(element["field"])
+		if value not in (None, ""):
+			return element.get("prefix", "") + str(value)
+	return element["content"]
+
+
+def render_program_html(program, live_data=None):
+	"""HTML backend: one absolutely positioned label"""
+	parts = ['<div class="label">']
+	for element, style in get_html_styles(program):
+		content = get_html_content(element, program, get_bound_value(element, live_data))
+		parts.append(f'<div class="element" style="{style}">{content}</div>')
+	parts.append("</div>")
+	return "".join(parts)
+
+
+def get_html_styles(program):
+	"""(element, inline style) pairs, built once per program"""
+	return get_program_artifact(
+		program,
+		"html_styles",
+		lambda: [(element, get_element_css(element)) for element in program["elements"]],
+	)
+
+
+def get_element_css(element):
+	css = (
+		f"left: {element['x']}mm; top: {element['y']}mm; "
+		f"width: {element['width']}mm; height: {element['height']}mm; "
+		f"font-size: {element['font_size']}pt; font-weight: {element['font_weight']}; "
+		f"color: {element['color']}; text-align: {element['align']};"
+	)
+	if element.get("z_index"):
+		css += f" z-index: {element['z_index']};"
+	return css
+
+
+def get_html_content(element, program, value):
+	kind = element["kind"]
+
+	if kind in ("barcode", "qr"):
+		if not value:
+			return ""
+		symbology = element.get("symbology") or program["barcode_type"]
+		return render_barcode_html(symbology, value, element)
+
+	if kind == "image":
+		if element["image_url"]:
+			return f'<img src="{escape(element["image_url"])}" style="width: 100%; height: 100%; object-fit: contain;" />'
+		return escape(str(value))
+
+	if kind == "line":
+		return f'<hr style="margin: 0; border: 0; border-top: {element["border"]}mm solid currentColor; width: 100%;" />'
+
+	if kind == "box":
+		return f'<div style="width: 100%; height: 100%; box-sizing: border-box; border: {element["border"]}mm solid currentColor;"></div>'
+
+	if kind == "html":
+		return value
+
+	return escape(str(value)).replace("\n", "<br>") if value else ""
+
+
+def render_barcode_html(symbology, value, element):
+	"""Inline SVG for natively encoded symbologies, the cached PNG renderers otherwise"""
+	from barcode.barcode.symbology import get_barcode_svg
+
+	width, height = mm_to_px(element["width"]), mm_to_px(element["height"])
+	svg = get_barcode_svg(symbology, value, width, height, element.get("show_text", False))
+	if svg:
+		return svg
+
+	from barcode.barcode.print_api import generate_barcode_base64, generate_qr_base64
+
+	if element["kind"] == "qr":
+		return f'<img src="data:image/png;base64,{generate_qr_base64(value)}" style="width: 100%; height: 100%; object-fit: contain;" />'
+	return f'<img src="data:image/png;base64,{generate_barcode_base64(value)}" style="max-width: 100%; height: auto;" />'
+
+
+def render_program_template(program):
+	"""Jinja backend: (html, css) of a Barcode Label Template rendering this program
+
+	Bound fields become template variables; barcodes use the `barcode_html`
+	(and `qr_code_html`) variables the label data provides.
+	"""
+	return get_program_artifact(program, "jinja", lambda: build_program_template(program))
+
+
+def build_program_template(program):
+	html_parts = ['<div class="barcode-label">']
+	css_parts = [
+		f"""
+.barcode-label {{
+	position: relative;
+	box-sizing: border-box;
+	width: {program["width"]}mm;
+	height: {program["height"]}mm;
+	overflow: hidden;
+	background: white;
+	border: 1px solid #000;
+	font-family: Arial, sans-serif;
+}}
+.barcode-label .element {{
+	position: absolute;
+	overflow: hidden;
+}}
+.barcode-label .element svg {{
+	width: 100%;
+	height: 100%;
+}}
+.barcode-label .element img {{
+	max-width: 100%;
+	max-height: 100%;
+}}"""
+	]
+
+	for index, element in enumerate(program["elements"]):
+		class_name = f"element-{index}"
+		html_parts.append(f'<div class="element {class_name}">{get_template_content(element)}</div>')
+		css_parts.append(f"\n.{class_name} {{ {get_element_css(element)} }}")
+
+	html_parts.append("</div>")
+	return "\n".join(html_parts), "".join(css_parts)
+
+
+def get_template_content(element):
+	kind = element["kind"]
+
+	if kind == "barcode":
+		return "{{ barcode_html }}"
+
+	if kind == "qr":
+		return "{{ qr_code_html }}"
+
+	if kind in ("image", "line", "box", "html"):
+		return get_jinja_literal(get_html_content(element, None, element["content"]))
+
+	static = get_jinja_literal(escape(str(element["content"])).replace("\n", "<br>"))
+	if not element["field"]:
+		return static
+
+	prefix = get_jinja_literal(escape(element.get("prefix", "")))
+	if not static:
+		return f"{{% if {element['field']} %}}{prefix}{{{{ {element['field']} }}}}{{% endif %}}"
+	return (
+		f"{{% if {element['field']} %}}{prefix}{{{{ {element['field']} }}}}{{% else %}}{static}{{% endif %}}"
+	)
+
+
+def get_jinja_literal(text):
+	"""Jinja source rendering `text` as is: static content prints the same in every backend"""
+	# every Jinja delimiter starts with "{", so printing it from an expression keeps the rest literal
+	return text.replace("{", "{{ '{' }}")
+
+
+def get_program_artifact(program, backend, builder):
+	"""Backend specific data derived from a program, built once per program hash
+
+	Builders may return None for results that must not be cached.
+	"""
+	key = (backend, program["hash"])
+	artifact = _programs.get(key)
+	if artifact is None:
+		artifact = builder()
+		if artifact is not None:
+			_store(key, artifact)
+	return artifact
+
+
+def px_to_mm(value):
+	return round(flt(value) / DESIGNER_PX_PER_MM, 3)
+
+
+def mm_to_px(value):
+	return round(flt(value) * DESIGNER_PX_PER_MM, 2)
+
+
+def parse_px(value):
+	"""Font size in px from a number or a CSS length such as "12px" or "9pt\""""
+	if isinstance(value, str):
+		value = value.strip().lower()
+		if value.endswith("pt"):
+			return flt(value[:-2]) / PT_PER_PX
+		value = value.rstrip("px")
+	return flt(value) or 12
+
+
+def _store(key, value):
+	if len(_programs) >= MAX_CACHED_PROGRAMS:
+		# dicts keep insertion order, so this drops the oldest entry
+		_programs.pop(next(iter(_programs)))
+	_programs[key] = value
@@ -0,0 +1,102 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+class BoundedLRUCache:
+	"""Thread-safe LRU cache bounded by the total size of its values in bytes"""
+
+	def __init__(self, max_bytes, sizeof=None):
+		self.max_bytes = max(0, int(max_bytes or 0))
+		self.sizeof = sizeof or default_sizeof
+		self._data = OrderedDict()
+		self._lock = threading.Lock()
+		self.current_bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def get(self, key, default=None):
+		with self._lock:
+			entry = self._data.get(key)
+			if entry is None:
+				self.misses += 1
+				return default
+
+			self._data.move_to_end(key)
+			self.hits += 1
+			return entry[0]
+
+	def set(self, key, value):
+		size = self.sizeof(value)
+		if size > self.max_bytes:
+			# Never let a single oversized value flush the whole cache
+			return False
+
+		with self._lock:
+			old = self._data.pop(key, None)
+			if old is not None:
+				self.current_bytes -= old[1]
+
+			self._data[key] = (value, size)
+			self.current_bytes += size
+
+			while self.current_bytes > self.max_bytes and self._data:
+				_key, (_value, evicted_size) = self._data.popitem(last=False)
+				self.current_bytes -= evicted_size
+				self.evictions += 1
+
+		return True
+
+	def pop(self, key):
+		with self._lock:
+			entry = self._data.pop(key, None)
+			if entry is None:
+				return None
+
+			self.current_bytes -= entry[1]
+			return entry[0]
+
+	def clear(self):
+		with self._lock:
+			self._data.clear()
+			self.current_bytes = 0
+
+	def resize(self, max_bytes):
+		with self._lock:
+			self.max_bytes = max(0, int(max_bytes or 0))
+			while self.current_bytes > self.max_bytes and self._data:
+				_key, (_value, evicted_size) = self._data.popitem(last=False)
+				self.current_bytes -= evicted_size
+				self.evictions += 1
+
+	def keys(self):
+		with self._lock:
+			return list(self._data)
+
+	def __contains__(self, key):
+		return key in self._data
+
+	def __len__(self):
+		return len(self._data)
+
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {
+			"entries": len(self._data),
+			"bytes": self.current_bytes,
+			"max_bytes": self.max_bytes,
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions,
+			"hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+		}
+
+
+def default_sizeof(value):
+	"""Approximate payload size of a cached value in bytes"""
+	if isinstance(value, bytes | bytearray):
+		return len(value)
+	if isinstance(value, str):
+		return len(value.encode())
+	return sys.getsizeof(value)
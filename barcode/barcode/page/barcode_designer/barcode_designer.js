@@ -6,7 +6,8 @@ frappe.pages['barcode-designer'].on_page_load = function(wrapper) {
 	});
 
 	frappe.require([
-		'https://unpkg.com/vue@3/dist/vue.global.js'
+		'https://unpkg.com/vue@3/dist/vue.global.js',
+		'/assets/barcode/js/label_preview_session.js'
 	], function() {
 		new VueBarcodeDesigner(wrapper);
 	});
@@ -90,6 +91,7 @@ class VueBarcodeDesigner {
 					<div class="section">
 						<h4>Actions</h4>
 						<button @click="saveTemplate()" class="btn btn-success btn-block">💾 Save</button>
+						<button @click="previewLabel()" class="btn btn-info btn-block">👁️ Preview</button>
 						<button @click="previewPDF()" class="btn btn-info btn-block">📄 PDF Preview</button>
 						<button @click="printDirect()" class="btn btn-warning btn-block">🖨️ Print Direct</button>
 						<button @click="clearCanvas()" class="btn btn-danger btn-block">🗑️ Clear</button>
@@ -112,6 +114,18 @@ class VueBarcodeDesigner {
 						<div v-if="printSettings.mode === 'thermal'" class="form-group">
 							<label>Printer IP</label>
 							<input v-model="printSettings.printerIP" class="form-control" placeholder="192.168.1.100">
+							<label class="checkbox-inline">
+								<input v-model="printSettings.raster" type="checkbox"> Print as graphic
+							</label>
+						</div>
+						<div v-else class="form-group">
+							<label>Sheet</label>
+							<select v-model="printSettings.sheetProfile" class="form-control">
+								<option value="">Default</option>
+								<option v-for="profile in sheetProfiles" :key="profile.name" :value="profile.name">
+									{{ profile.name }} ({{ profile.per_page }} per page)
+								</option>
+							</select>
 						</div>
 					</div>
 				</div>
@@ -184,6 +198,13 @@ class VueBarcodeDesigner {
 							<label>Text</label>
 							<input v-model="selectedElement.content" class="form-control form-control-sm">
 						</div>
+						<div v-if="selectedElement.type === 'qr'" class="form-group">
+							<label>Symbology</label>
+							<select v-model="selectedElement.barcodeType" class="form-control form-control-sm">
+								<option value="QR Code">QR Code</option>
+								<option value="Data Matrix">Data Matrix</option>
+							</select>
+						</div>
 						<div class="form-group">
 							<label>Font Size</label>
 							<input v-model.number="selectedElement.fontSize" type="number" class="form-control form-control-sm">
@@ -253,8 +274,11 @@ class VueBarcodeDesigner {
 					printSettings: {
 						copies: 1,
 						mode: 'pdf',
-						printerIP: ''
-					}
+						printerIP: '',
+						raster: false,
+						sheetProfile: ''
+					},
+					sheetProfiles: []
 				}
 			},
 			computed: {
@@ -366,6 +390,7 @@ class VueBarcodeDesigner {
 						width: 40,
 						height: 40,
 						qrContent: 'Sample QR',
+						barcodeType: 'QR Code',
 						content: 'QR',
 						selected: false
 					};
@@ -481,7 +506,7 @@ class VueBarcodeDesigner {
 							if (element.qrContent) {
 								return `<img src="/qrcode?data=${encodeURIComponent(element.qrContent)}&size=100" style="width: 100%; height: 100%; object-fit: contain;" />`;
 							}
-							return '<div style="background: #000; color: #fff; width: 100%; height: 100%; display: flex; align-items: center; justify-content: center; font-size: 8px;">QR</div>';
+							return `<div style="background: #000; color: #fff; width: 100%; height: 100%; display: flex; align-items: center; justify-content: center; font-size: 8px;">${element.barcodeType === 'Data Matrix' ? 'DM' : 'QR'}</div>`;
 						case 'custom_text':
 							return content.replace(/\n/g, '<br>');
 						default:
@@ -674,7 +699,8 @@ class VueBarcodeDesigner {
 							height: el.height,
 							fontSize: el.fontSize + 'px',
 							color: el.color,
-							content: el.content
+							content: el.content,
+							barcodeType: el.barcodeType
 						}))
 					};
 
@@ -716,7 +742,8 @@ class VueBarcodeDesigner {
 						method: 'barcode.barcode.api.generate_pdf_preview',
 						args: {
 							template_data: templateData,
-							copies: this.printSettings.copies
+							copies: this.printSettings.copies,
+							sheet_profile: this.printSettings.sheetProfile
 						},
 						callback: (r) => {
 							if (r.message && r.message.success) {
@@ -749,12 +776,26 @@ class VueBarcodeDesigner {
 					});
 				},
 
+				loadSheetProfiles() {
+					frappe.call({
+						method: 'barcode.barcode.imposition.get_sheet_profiles',
+						args: {
+							label_width: this.template.width,
+							label_height: this.template.height
+						},
+						callback: (r) => {
+							this.sheetProfiles = r.message || [];
+						}
+					});
+				},
+
 				generatePrintData() {
 					return {
 						name: this.template.name || 'Untitled',
 						width: this.template.width,
 						height: this.template.height,
 						elements: this.elements.map(el => ({
+							id: el.id,
 							type: el.type,
 							x: el.x,
 							y: el.y,
@@ -765,34 +806,38 @@ class VueBarcodeDesigner {
 							fontWeight: el.fontWeight,
 							color: el.color,
 							imageUrl: el.imageUrl,
-							qrContent: el.qrContent
+							qrContent: el.qrContent,
+							barcodeType: el.barcodeType
 						})),
 						liveData: this.previewMode ? this.liveData : null
 					};
 				},
 
 				previewLabel() {
-					let html = `<div style="width: ${this.template.width}mm; height: ${this.template.height}mm; border: 1px solid #000; position: relative; background: white; font-family: Arial;">`;
-					
-					this.elements.forEach(el => {
-						const content = this.renderElement(el);
-						html += `<div style="position: absolute; left: ${el.x}px; top: ${el.y}px; width: ${el.width}px; height: ${el.height}px; font-size: ${el.fontSize}px; font-weight: ${el.fontWeight || 'normal'}; color: ${el.color};">${content}</div>`;
-					});
-					
-					html += '</div>';
-
-					const preview = window.open('', '_blank');
-					preview.document.write(`
-						<html>
-						<head><title>Label Preview</title></head>
-						<body style="padding: 20px; background: #f5f5f5;">${html}</body>
-						</html>
-					`);
+					// rendered on the server; later edits only send and patch the changed elements
+					if (!this.previewSession) {
+						this.previewSession = new barcode.LabelPreviewSession(() => this.generatePrintData());
+					}
+					this.previewSession.open();
+				},
+
+				syncPreview() {
+					if (this.previewSession) {
+						this.previewSession.sync();
+					}
 				}
 			},
 
+			watch: {
+				elements: { handler() { this.syncPreview(); }, deep: true },
+				template: { handler() { this.syncPreview(); }, deep: true },
+				liveData: { handler() { this.syncPreview(); }, deep: true },
+				previewMode() { this.syncPreview(); }
+			},
+
 			mounted() {
 				this.saveState();
+				this.loadSheetProfiles();
 			}
 		});
 
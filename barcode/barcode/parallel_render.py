@@ -0,0 +1,118 @@
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+import frappe
+from frappe.utils import cint
+
+from barcode.barcode.settings_cache import get_setting
+
+# Batches render in the calling process unless more workers are configured
+DEFAULT_WORKERS = 1
+DEFAULT_MIN_ITEMS = 200
+# Items are split into this many chunks per worker, so a slow chunk does not
+# leave the other workers idle at the end of a run
+CHUNKS_PER_WORKER = 4
+MIN_CHUNK_SIZE = 25
+
+# One pool per process, kept alive between runs so its workers stay warm
+_pool = {"executor": None, "workers": 0}
+_pool_lock = threading.Lock()
+
+# Template docs held by a pool worker, keyed by site and name (refetched when modified)
+_worker_templates = {}
+
+
+def render_parallel(renderer, template_doc, items):
+	"""Render `items` with `renderer` on a pool of worker processes
+
+	`renderer` is the dotted path of a function taking (template_doc, items)
+	and returning one result per item. Items are split into chunks that
+	workers render in parallel; results come back in item order. The pool is
+	only used in background jobs: web requests, runs below
+	`parallel_render_min_items`, a `render_workers` setting of 1 (the default)
+	and a broken pool render in this process.
+	"""
+	workers = get_worker_count()
+	min_items = cint(get_setting("parallel_render_min_items", DEFAULT_MIN_ITEMS))
+	if workers < 2 or len(items) < max(min_items, 2) or in_web_request():
+		return frappe.get_attr(renderer)(template_doc, items)
+
+	chunk_size = max(MIN_CHUNK_SIZE, math.ceil(len(items) / (workers * CHUNKS_PER_WORKER)))
+	chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+	context = {
+		"site": frappe.local.site,
+		"sites_path": getattr(frappe.local, "sites_path", "."),
+		"user": frappe.session.user,
+		"template": template_doc.name,
+		"modified": str(template_doc.modified),
+	}
+
+	try:
+		executor = get_executor(workers)
+		results = executor.map(render_chunk, repeat(renderer), repeat(context), chunks)
+		return [result for chunk_results in results for result in chunk_results]
+	except (BrokenProcessPool, OSError) as e:
+		shutdown_executor()
+		frappe.log_error(f"Barcode render pool failed, rendering serially: {e!s}")
+		return frappe.get_attr(renderer)(template_doc, items)
+
+
+def get_worker_count():
+	"""Worker processes per pool: `render_workers`, or one per CPU core when 0"""
+	workers = cint(get_setting("render_workers", DEFAULT_WORKERS))
+	return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def in_web_request():
+	# a pool per gunicorn worker would multiply the site's processes
+	return getattr(frappe.local, "request", None) is not None
+
+
+def get_executor(workers):
+	with _pool_lock:
+		if _pool["executor"] is None or _pool["workers"] != workers:
+			if _pool["executor"] is not None:
+				_pool["executor"].shutdown(wait=False)
+
+			# never fork a process holding database and Redis connections
+			methods = multiprocessing.get_all_start_methods()
+			context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+			_pool["executor"] = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+			_pool["workers"] = workers
+		return _pool["executor"]
+
+
+def shutdown_executor():
+	with _pool_lock:
+		if _pool["executor"] is not None:
+			_pool["executor"].shutdown(wait=False, cancel_futures=True)
+		_pool.update(executor=None, workers=0)
+
+
+def render_chunk(renderer, context, items):
+	"""Pool task: render one chunk of items for the calling site and user.
+
+	Each task gets a fresh site context, like a background job, while the
+	compiled templates, encoders and image caches of the process stay warm.
+	"""
+	frappe.init(site=context["site"], sites_path=context["sites_path"])
+	try:
+		frappe.connect()
+		frappe.set_user(context["user"])
+		return frappe.get_attr(renderer)(get_worker_template(context), items)
+	finally:
+		frappe.destroy()
+
+
+def get_worker_template(context):
+	key = (context["site"], context["template"])
+	template_doc = _worker_templates.get(key)
+	if template_doc is None or str(template_doc.modified) != context["modified"]:
+		template_doc = frappe.get_doc("Barcode Label Template", context["template"])
+		_worker_templates[key] = template_doc
+	return template_doc
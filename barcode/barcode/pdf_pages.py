@@ -0,0 +1,102 @@
+import io
+from array import array
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject
+
+KIDS_BATCH_SIZE = 1000
+
+
+def write_repeated_pages(unit_pdf, page_sequence, output):
+	"""Write a PDF whose pages are pages of `unit_pdf` repeated in `page_sequence` order.
+
+	`unit_pdf` holds the few distinct pages of a job (e.g. one rendered label)
+	and `page_sequence` is an iterable of page indexes into it. The unit document
+	is written once; every emitted page is then appended as a small page
+	dictionary that shares the unit's content streams and resources, in one
+	incremental update. Pages are streamed to `output` (a binary file object) one
+	at a time, so memory stays flat however many pages are emitted.
+
+	Returns the number of pages written.
+	"""
+	base = normalize_pdf(unit_pdf)
+	reader = PdfReader(io.BytesIO(base))
+	root = reader.trailer.raw_get("/Root")
+	pages_id = reader.trailer["/Root"].raw_get("/Pages").idnum
+	page_templates = [get_page_template(page, pages_id) for page in reader.pages]
+	info = reader.trailer.raw_get("/Info") if "/Info" in reader.trailer else None
+
+	first_id = int(reader.trailer["/Size"])
+	prev_xref = int(base[base.rindex(b"startxref") + len(b"startxref") :].split()[0])
+
+	output.write(base)
+	position = len(base)
+	offsets = array("Q")
+
+	for page_index in page_sequence:
+		obj = b"%d 0 obj\n%s\nendobj\n" % (first_id + len(offsets), page_templates[page_index])
+		offsets.append(position)
+		output.write(obj)
+		position += len(obj)
+
+	page_count = len(offsets)
+
+	# Replace the page tree root with one listing every emitted page
+	pages_offset = position
+	position += write_chunk(output, b"%d 0 obj\n<</Type /Pages /Count %d /Kids [" % (pages_id, page_count))
+	for start in range(0, page_count, KIDS_BATCH_SIZE):
+		stop = min(start + KIDS_BATCH_SIZE, page_count)
+		kids = b" ".join(b"%d 0 R" % (first_id + i) for i in range(start, stop))
+		position += write_chunk(output, kids + b"\n")
+	position += write_chunk(output, b"]>>\nendobj\n")
+
+	xref_offset = position
+	output.write(b"xref\n%d 1\n%010d 00000 n \n" % (pages_id, pages_offset))
+	output.write(b"%d %d\n" % (first_id, page_count))
+	for start in range(0, page_count, KIDS_BATCH_SIZE):
+		output.write(
+			b"".join(b"%010d 00000 n \n" % offset for offset in offsets[start : start + KIDS_BATCH_SIZE])
+		)
+
+	trailer = b"/Size %d /Root %d 0 R /Prev %d" % (first_id + page_count, root.idnum, prev_xref)
+	if info is not None and hasattr(info, "idnum"):
+		trailer += b" /Info %d 0 R" % info.idnum
+	output.write(b"trailer\n<<%s>>\nstartxref\n%d\n%%%%EOF\n" % (trailer, xref_offset))
+
+	return page_count
+
+
+def count_pages(pdf):
+	return len(PdfReader(io.BytesIO(pdf)).pages)
+
+
+def normalize_pdf(pdf):
+	"""Rewrite a PDF with pypdf so it has a classic xref table we can append to"""
+	reader = PdfReader(io.BytesIO(pdf))
+	writer = PdfWriter()
+	for page in reader.pages:
+		writer.add_page(page)
+
+	buffer = io.BytesIO()
+	writer.write(buffer)
+	return buffer.getvalue()
+
+
+def get_page_template(page, pages_id):
+	"""Serialize a page dictionary, pointing it at the page tree root `pages_id`"""
+	stream = io.BytesIO()
+	stream.write(b"<<")
+	for key, value in page.items():
+		if key == "/Parent":
+			continue
+		NameObject(key).write_to_stream(stream)
+		stream.write(b" ")
+		value.write_to_stream(stream)
+		stream.write(b"\n")
+	stream.write(b"/Parent %d 0 R>>" % pages_id)
+	return stream.getvalue()
+
+
+def write_chunk(output, data):
+	output.write(data)
+	return len(data)
@@ -0,0 +1,738 @@
+import io
+import zlib
+from array import array
+
+from frappe.utils import flt
+
+from barcode.barcode.imposition import get_cell_positions
+from barcode.barcode.label_program import get_bound_value
+from barcode.barcode.symbology import (
+	LINEAR_ENCODERS,
+	MATRIX_ENCODERS,
+	MATRIX_QUIET_ZONES,
+	get_human_readable,
+	get_matrix,
+)
+from barcode.barcode.symbology.svg import (
+	LINEAR_QUIET_ZONE,
+	MAX_FONT_SIZE,
+	TEXT_HEIGHT_RATIO,
+	iter_runs,
+)
+
+PT_PER_MM = 72 / 25.4
+PT_PER_PX = 0.75
+LINE_HEIGHT = 1.15
+# xref entries and page references are written this many at a time
+WRITE_BATCH_SIZE = 1000
+# Streams shorter than this are not worth compressing
+COMPRESS_MIN_BYTES = 256
+# Images are downsampled to this resolution for their printed size
+IMAGE_DPI = 300
+MAX_CACHED_SHEETS = 16
+MAX_CACHED_LABELS = 1024
+
+DRAWABLE_KINDS = ("text", "barcode", "qr", "line", "box", "image")
+BOLD_WEIGHTS = ("bold", "bolder", "600", "700", "800", "900")
+
+# The standard 14 fonts are built into every PDF reader, so nothing is embedded
+# and every document only references the fonts its labels use. Widths are in
+# 1/1000 em for ASCII 32-126, from the Adobe Core14 AFM files.
+FONTS = {
+	"F1": "Helvetica",
+	"F2": "Helvetica-Bold",
+	"F3": "Courier",
+}
+FONT_ASCENT = 0.718
+FONT_DESCENT = 0.207
+DEFAULT_CHAR_WIDTH = 556
+COURIER_CHAR_WIDTH = 600
+HELVETICA_WIDTHS = (
+	278,
+	278,
+	355,
+	556,
+	556,
+	889,
+	667,
+	191,
+	333,
+	333,
+	389,
+	584,
+	278,
+	333,
+	278,
+	278,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	278,
+	278,
+	584,
+	584,
+	584,
+	556,
+	1015,
+	667,
+	667,
+	722,
+	722,
+	667,
+	611,
+	778,
+	722,
+	278,
+	500,
+	667,
+	556,
+	833,
+	722,
+	778,
+	667,
+	778,
+	722,
+	667,
+	611,
+	722,
+	667,
+	944,
+	667,
+	667,
+	611,
+	278,
+	278,
+	278,
+	469,
+	556,
+	333,
+	556,
+	556,
+	500,
+	556,
+	556,
+	278,
+	556,
+	556,
+	222,
+	222,
+	500,
+	222,
+	833,
+	556,
+	556,
+	556,
+	556,
+	333,
+	500,
+	278,
+	556,
+	500,
+	722,
+	500,
+	500,
+	500,
+	334,
+	260,
+	334,
+	584,
+)
+HELVETICA_BOLD_WIDTHS = (
+	278,
+	333,
+	474,
+	556,
+	556,
+	889,
+	722,
+	238,
+	333,
+	333,
+	389,
+	584,
+	278,
+	333,
+	278,
+	278,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	556,
+	333,
+	333,
+	584,
+	584,
+	584,
+	611,
+	975,
+	722,
+	722,
+	722,
+	722,
+	667,
+	611,
+	778,
+	722,
+	278,
+	556,
+	722,
+	611,
+	833,
+	722,
+	778,
+	667,
+	778,
+	722,
+	667,
+	611,
+	722,
+	667,
+	944,
+	667,
+	667,
+	611,
+	333,
+	278,
+	333,
+	584,
+	556,
+	333,
+	556,
+	611,
+	556,
+	611,
+	556,
+	333,
+	611,
+	611,
+	278,
+	278,
+	556,
+	278,
+	889,
+	611,
+	611,
+	611,
+	611,
+	389,
+	556,
+	333,
+	611,
+	556,
+	778,
+	556,
+	556,
+	500,
+	389,
+	280,
+	389,
+	584,
+)
+FONT_WIDTHS = {"F1": HELVETICA_WIDTHS, "F2": HELVETICA_BOLD_WIDTHS}
+
+
+class UnsupportedLabelError(ValueError):
+	"""The label uses something only the HTML renderer can draw"""
+
+
+class PdfFile:
+	"""Minimal PDF object writer streaming to a binary file object, with a classic xref table"""
+
+	def __init__(self, output):
+		self.output = output
+		self.position = 0
+		self.offsets = array("Q", [0])
+		self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+	def write(self, data):
+		self.output.write(data)
+		self.position += len(data)
+
+	def reserve(self):
+		self.offsets.append(0)
+		return len(self.offsets) - 1
+
+	def add(self, body, object_id=None):
+		if object_id is None:
+			object_id = self.reserve()
+		self.offsets[object_id] = self.position
+		self.write(b"%d 0 obj\n%s\nendobj\n" % (object_id, body))
+		return object_id
+
+	def add_stream(self, data, entries=b"", object_id=None):
+		if len(data) >= COMPRESS_MIN_BYTES:
+			data = zlib.compress(data)
+			entries += b" /Filter /FlateDecode"
+		return self.add(b"<<%s /Length %d>>\nstream\n%s\nendstream" % (entries, len(data), data), object_id)
+
+	def close(self, root_id):
+		xref_offset = self.position
+		self.write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self.offsets))
+		for start in range(1, len(self.offsets), WRITE_BATCH_SIZE):
+			self.write(
+				b"".join(
+					b"%010d 00000 n \n" % offset for offset in self.offsets[start : start + WRITE_BATCH_SIZE]
+				)
+			)
+		self.write(
+			b"trailer\n<</Size %d /Root %d 0 R>>\nstartxref\n%d\n%%%%EOF\n"
+			% (len(self.offsets), root_id, xref_offset)
+		)
+
+
+class LabelPdfWriter:
+	"""Draws labels of one label program into form XObjects and places them on pages.
+
+	Static elements are drawn once into a form shared by every label, each
+	distinct label (live data) becomes one form on top of it, and pages only
+	place those forms, so repeated labels cost a few bytes each.
+	"""
+
+	def __init__(self, program, output):
+		self.program = program
+		self.pdf = PdfFile(output)
+		self.pages_id = self.pdf.reserve()
+		self.page_ids = array("Q")
+		self.font_ids = {}
+		self.image_ids = {}
+		self.label_forms = {}
+		self.width = flt(program["width"]) * PT_PER_MM
+		self.height = flt(program["height"]) * PT_PER_MM
+		self.static_form = None
+
+		static = [element for element in program["elements"] if not element["field"]]
+		self.bound = [element for element in program["elements"] if element["field"]]
+		if static:
+			self.static_form = self.add_form(static, {})
+
+	def get_label_form(self, live_data):
+		"""Form XObject id of the label for `live_data`, drawn on first use"""
+		key = tuple(get_bound_value(element, live_data) for element in self.bound)
+		form_id = self.label_forms.get(key)
+		if form_id is None:
+			if len(self.label_forms) >= MAX_CACHED_LABELS:
+				self.label_forms.clear()
+			form_id = self.add_form(self.bound, live_data or {}, self.static_form)
+			self.label_forms[key] = form_id
+		return form_id
+
+	def add_form(self, elements, live_data, base_form=None):
+		fonts, images = set(), {}
+		ops = ["q /S Do Q"] if base_form else []
+		for element in elements:
+			ops.extend(self.draw_element(element, get_bound_value(element, live_data), fonts, images))
+
+		xobjects = dict(images)
+		if base_form:
+			xobjects["S"] = base_form
+		resources = self.get_resources(fonts, xobjects)
+		return self.pdf.add_stream(
+			"\n".join(ops).encode("latin-1"),
+			b"/Type /XObject /Subtype /Form /BBox [0 0 %s %s] /Resources %s"
+			% (num(self.width).encode(), num(self.height).encode(), resources),
+		)
+
+	def get_resources(self, fonts, xobjects):
+		parts = []
+		if fonts:
+			parts.append(
+				b"/Font <<%s>>"
+				% b"".join(b"/%s %d 0 R" % (name.encode(), self.get_font_id(name)) for name in sorted(fonts))
+			)
+		if xobjects:
+			parts.append(
+				b"/XObject <<%s>>"
+				% b"".join(
+					b"/%s %d 0 R" % (name.encode(), object_id) for name, object_id in sorted(xobjects.items())
+				)
+			)
+		return b"<<%s>>" % b" ".join(parts)
+
+	def get_font_id(self, name):
+		if name not in self.font_ids:
+			self.font_ids[name] = self.pdf.add(
+				b"<</Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding>>"
+				% FONTS[name].encode()
+			)
+		return self.font_ids[name]
+
+	def draw_element(self, element, value, fonts, images):
+		kind = element["kind"]
+		x = element["x"] * PT_PER_MM
+		top = element["y"] * PT_PER_MM
+		width = element["width"] * PT_PER_MM
+		height = element["height"] * PT_PER_MM
+
+		if kind == "text":
+			return draw_text(value, element, x, top, width, height, self.height, fonts)
+
+		if kind == "barcode":
+			symbology = element.get("symbology") or self.program["barcode_type"]
+			if symbology in MATRIX_ENCODERS:
+				return draw_matrix(symbology, value, x, top, width, height, self.height)
+			return draw_linear(
+				symbology, value, element.get("show_text"), x, top, width, height, self.height, fonts
+			)
+
+		if kind == "qr":
+			return draw_matrix(
+				element.get("symbology") or "QR Code", value, x, top, width, height, self.height
+			)
+
+		color = get_color_operator(element["color"])
+		border = element.get("border", 0) * PT_PER_MM
+		if kind == "line":
+			return [f"q {color} {num(x)} {num(self.height - top - border)} {num(width)} {num(border)} re f Q"]
+
+		if kind == "box":
+			stroke = color.replace(" rg", " RG")
+			return [
+				f"q {stroke} {num(border)} w {num(x + border / 2)} {num(self.height - top - height + border / 2)} "
+				f"{num(max(width - border, 0))} {num(max(height - border, 0))} re S Q"
+			]
+
+		if kind == "image":
+			return self.draw_image(element, x, top, width, height, images)
+
+		raise UnsupportedLabelError(f"{kind} elements cannot be drawn natively")
+
+	def draw_image(self, element, x, top, width, height, images):
+		image = self.get_image(element["image_url"], width, height)
+		if not image:
+			return []
+
+		image_id, pixel_width, pixel_height = image
+		# fit inside the element box keeping the aspect ratio, like object-fit: contain
+		scale = min(width / pixel_width, height / pixel_height)
+		draw_width, draw_height = pixel_width * scale, pixel_height * scale
+		left = x + (width - draw_width) / 2
+		bottom = self.height - top - height + (height - draw_height) / 2
+
+		name = f"I{image_id}"
+		images[name] = image_id
+		return [f"q {num(draw_width)} 0 0 {num(draw_height)} {num(left)} {num(bottom)} cm /{name} Do Q"]
+
+	def get_image(self, image_url, width, height):
+		key = (image_url, round(width), round(height))
+		if key not in self.image_ids:
+			self.image_ids[key] = self.add_image(image_url, width, height)
+		return self.image_ids[key]
+
+	def add_image(self, image_url, width, height):
+		from PIL import Image
+
+		from barcode.barcode.zpl import read_image
+
+		if not image_url:
+			return None
+		content = read_image(image_url)
+		if not content:
+			return None
+
+		image = Image.open(io.BytesIO(content))
+		if image.mode in ("RGBA", "LA", "P"):
+			image = image.convert("RGBA")
+			background = Image.new("RGB", image.size, "white")
+			background.paste(image, mask=image.getchannel("A"))
+			image = background
+		else:
+			image = image.convert("RGB")
+		image.thumbnail((max(1, round(width / 72 * IMAGE_DPI)), max(1, round(height / 72 * IMAGE_DPI))))
+
+		image_id = self.pdf.add_stream(
+			image.tobytes(),
+			b"/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB /BitsPerComponent 8"
+			% (image.width, image.height),
+		)
+		return image_id, image.width, image.height
+
+	def add_pages(self, cells, page_width, page_height, scale=1):
+		"""Add one page per item of `cells`: lists of ((left, top) in mm, form id)
+
+		Pages with the same placement share one content stream.
+		"""
+		streams = {}
+		for placements in cells:
+			key = tuple(placements)
+			content = streams.get(key)
+			if content is None:
+				if len(streams) >= MAX_CACHED_SHEETS:
+					streams.clear()
+				content = streams[key] = self.add_page_content(placements, page_height, scale)
+
+			self.page_ids.append(
+				self.pdf.add(
+					b"<</Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Contents %d 0 R /Resources %d 0 R>>"
+					% (
+						self.pages_id,
+						num(page_width).encode(),
+						num(page_height).encode(),
+						content[0],
+						content[1],
+					)
+				)
+			)
+
+	def add_page_content(self, placements, page_height, scale):
+		ops = []
+		forms = {}
+		for (left, top), form_id in placements:
+			name = f"L{form_id}"
+			forms[name] = form_id
+			bottom = page_height - top * PT_PER_MM - self.height * scale
+			ops.append(
+				f"q {num(scale)} 0 0 {num(scale)} {num(left * PT_PER_MM)} {num(bottom)} cm /{name} Do Q"
+			)
+
+		resources_id = self.pdf.add(self.get_resources((), forms))
+		return self.pdf.add_stream("\n".join(ops).encode("latin-1")), resources_id
+
+	def close(self):
+		"""Write the page tree, catalog and xref; returns the number of pages"""
+		page_count = len(self.page_ids)
+		self.pdf.offsets[self.pages_id] = self.pdf.position
+		self.pdf.write(b"%d 0 obj\n<</Type /Pages /Count %d /Kids [" % (self.pages_id, page_count))
+		for start in range(0, page_count, WRITE_BATCH_SIZE):
+			self.pdf.write(
+				b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids[start : start + WRITE_BATCH_SIZE])
+				+ b"\n"
+			)
+		self.pdf.write(b"]>>\nendobj\n")
+		root_id = self.pdf.add(b"<</Type /Catalog /Pages %d 0 R>>" % self.pages_id)
+		self.pdf.close(root_id)
+		return page_count
+
+
+def write_program_pdf(program, labels_data, output, layout=None, copies=1):
+	"""Write labels drawn straight from a label program as a PDF to the binary file object `output`
+
+	Every entry of `labels_data` (live data) is printed `copies` times, one
+	label per page or imposed on the sheets of an `imposition` layout. Raises
+	UnsupportedLabelError for programs that need the HTML renderer. Returns the
+	number of pages written.
+	"""
+	check_program(program)
+	writer = LabelPdfWriter(program, output)
+	forms = (writer.get_label_form(live_data) for live_data in labels_data for _copy in range(max(1, copies)))
+
+	if layout:
+		positions = list(get_cell_positions(layout))
+		writer.add_pages(
+			(list(zip(positions, sheet, strict=False)) for sheet in iter_chunks(forms, layout.per_page)),
+			layout.page_width * PT_PER_MM,
+			layout.page_height * PT_PER_MM,
+			min(1, layout.scale),
+		)
+	else:
+		writer.add_pages(([((0, 0), form_id)] for form_id in forms), writer.width, writer.height)
+
+	return writer.close()
+
+
+def check_program(program):
+	"""Raise UnsupportedLabelError unless every element of `program` can be drawn natively"""
+	for element in program["elements"]:
+		if element["kind"] not in DRAWABLE_KINDS:
+			raise UnsupportedLabelError(f"{element['kind']} elements cannot be drawn natively")
+
+		if element["kind"] == "barcode":
+			symbology = element.get("symbology") or program["barcode_type"]
+			if symbology not in LINEAR_ENCODERS and symbology not in MATRIX_ENCODERS:
+				raise UnsupportedLabelError(f"No native encoder for {symbology}")
+		elif element["kind"] == "qr" and (element.get("symbology") or "QR Code") not in MATRIX_ENCODERS:
+			raise UnsupportedLabelError(f"No native encoder for {element.get('symbology')}")
+
+
+def can_write_natively(program, live_data=None):
+	"""Whether `program` (with `live_data`) can be written by `write_program_pdf`"""
+	try:
+		check_program(program)
+		for element in program["elements"]:
+			if element["kind"] == "text":
+				encode_text(str(get_bound_value(element, live_data) or ""))
+	except UnsupportedLabelError:
+		return False
+	return True
+
+
+def iter_chunks(iterable, size):
+	chunk = []
+	for item in iterable:
+		chunk.append(item)
+		if len(chunk) == size:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+
+def draw_text(value, element, x, top, width, height, label_height, fonts):
+	"""Text wrapped to the element width, one Tj per line, clipped to the lines that fit"""
+	text = str(value) if value not in (None, "") else ""
+	if not text:
+		return []
+
+	font = "F2" if str(element["font_weight"]).lower() in BOLD_WEIGHTS else "F1"
+	size = flt(element["font_size"]) or 9
+	line_height = size * LINE_HEIGHT
+	max_lines = max(1, int(height // line_height)) if height else 1
+	lines = wrap_text(text, font, size, width)[:max_lines]
+	fonts.add(font)
+
+	ops = [f"q {get_color_operator(element['color'])} BT /{font} {num(size)} Tf"]
+	for index, line in enumerate(lines):
+		line_width = get_text_width(line, font, size)
+		if element["align"] == "center":
+			left = x + (width - line_width) / 2
+		elif element["align"] == "right":
+			left = x + width - line_width
+		else:
+			left = x
+		baseline = (
+			top
+			+ index * line_height
+			+ (line_height - (FONT_ASCENT + FONT_DESCENT) * size) / 2
+			+ FONT_ASCENT * size
+		)
+		ops.append(f"1 0 0 1 {num(left)} {num(label_height - baseline)} Tm ({escape_text(line)}) Tj")
+	ops.append("ET Q")
+	return ops
+
+
+def wrap_text(text, font, size, width):
+	"""Break text into lines no wider than `width` at spaces (words longer than a line are kept whole)"""
+	lines = []
+	for paragraph in text.split("\n"):
+		line = ""
+		for word in paragraph.split(" "):
+			candidate = f"{line} {word}" if line else word
+			if line and width and get_text_width(candidate, font, size) > width:
+				lines.append(line)
+				line = word
+			else:
+				line = candidate
+		lines.append(line)
+	return lines
+
+
+def get_text_width(text, font, size):
+	if font == "F3":
+		return len(text) * COURIER_CHAR_WIDTH * size / 1000
+
+	widths = FONT_WIDTHS[font]
+	total = 0
+	for char in text:
+		code = ord(char) - 32
+		total += widths[code] if 0 <= code < len(widths) else DEFAULT_CHAR_WIDTH
+	return total * size / 1000
+
+
+def draw_linear(symbology, value, show_text, x, top, width, height, label_height, fonts):
+	"""Bars (and the human readable line) with the geometry of `symbology.svg.linear_svg`"""
+	if not value:
+		return []
+	try:
+		modules = LINEAR_ENCODERS[symbology](str(value))
+	except ValueError:
+		# invalid data draws nothing, like the SVG renderer
+		return []
+
+	text = get_human_readable(symbology, str(value)) if show_text else None
+	module_width = width / (len(modules) + 2 * LINEAR_QUIET_ZONE)
+	font_size = min(height * TEXT_HEIGHT_RATIO, MAX_FONT_SIZE * PT_PER_PX) if text else 0
+	bar_height = height - font_size * 1.2
+	bottom = label_height - top - bar_height
+
+	bars = []
+	position = 0
+	for run_length, dark in iter_runs(modules):
+		if dark:
+			left = x + (LINEAR_QUIET_ZONE + position) * module_width
+			bars.append(f"{num(left)} {num(bottom)} {num(run_length * module_width)} {num(bar_height)} re")
+		position += run_length
+
+	ops = ["q 0 g", *bars, "f Q"]
+	if text:
+		fonts.add("F3")
+		baseline = label_height - top - height + font_size * 0.2
+		left = x + (width - get_text_width(text, "F3", font_size)) / 2
+		ops.append(
+			f"BT /F3 {num(font_size)} Tf 1 0 0 1 {num(left)} {num(baseline)} Tm ({escape_text(text)}) Tj ET"
+		)
+	return ops
+
+
+def draw_matrix(symbology, value, x, top, width, height, label_height):
+	"""Square symbol scaled to fit and centred in the element box"""
+	if not value:
+		return []
+	try:
+		matrix = get_matrix(symbology, value)
+	except ValueError:
+		return []
+
+	quiet_zone = MATRIX_QUIET_ZONES[symbology]
+	size = len(matrix) + 2 * quiet_zone
+	module = min(width, height) / size
+	left = x + (width - size * module) / 2 + quiet_zone * module
+	upper = label_height - top - (height - size * module) / 2 - quiet_zone * module
+
+	ops = ["q 0 g"]
+	for row_index, row in enumerate(matrix):
+		position = 0
+		bottom = upper - (row_index + 1) * module
+		for run_length, dark in iter_runs(row):
+			if dark:
+				ops.append(
+					f"{num(left + position * module)} {num(bottom)} {num(run_length * module)} {num(module)} re"
+				)
+			position += run_length
+	ops.append("f Q")
+	return ops
+
+
+def get_color_operator(color):
+	"""Fill color operator for a CSS hex color (black otherwise)"""
+	color = str(color or "").strip().lstrip("#")
+	if len(color) == 3:
+		color = "".join(channel * 2 for channel in color)
+	try:
+		red, green, blue = (int(color[i : i + 2], 16) / 255 for i in (0, 2, 4))
+	except ValueError:
+		return "0 g"
+	if len(color) != 6:
+		return "0 g"
+	return f"{num(red)} {num(green)} {num(blue)} rg"
+
+
+def encode_text(text):
+	"""Text in the WinAnsi encoding of the standard fonts"""
+	try:
+		return text.encode("cp1252")
+	except UnicodeEncodeError:
+		raise UnsupportedLabelError("Text outside the Latin-1 range needs the HTML renderer")
+
+
+def escape_text(text):
+	"""Literal PDF string body; content streams are written as latin-1 so bytes map 1:1"""
+	data = encode_text(text).decode("latin-1")
+	return data.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").replace("\r", "\\r")
+
+
+def num(value):
+	"""Compact PDF number"""
+	text = f"{value:.3f}".rstrip("0").rstrip(".")
+	return text if text not in ("", "-0") else "0"
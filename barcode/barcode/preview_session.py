@@ -0,0 +1,178 @@
+import base64
+import json
+import zlib
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from barcode.barcode.label_cache import get_cached_output
+from barcode.barcode.label_program import (
+	compile_element,
+	get_bound_value,
+	get_content_hash,
+	get_element_css,
+	get_html_content,
+	get_program_source,
+)
+
+SESSION_PREFIX = "barcode_preview_session"
+SESSION_TTL = 30 * 60
+# Responses larger than this are deflated for clients that can inflate them
+COMPRESS_MIN_BYTES = 1024
+
+PREVIEW_DATA = {
+	"item_code": "SAMPLE001",
+	"item_name": "Sample Item Name",
+	"batch_no": "BATCH001",
+	"serial_no": "SN001",
+	"mfg_date": "01/01/2024",
+	"exp_date": "01/01/2025",
+	"quantity": "10",
+	"company": "Sample Company",
+}
+
+# Element properties that only move an element; changing them never re-renders its content
+POSITION_KEYS = ("x", "y", "z_index")
+
+
+@frappe.whitelist()
+def start_preview_session(template_data, compress=0):
+	"""Open a designer preview session and render every element once
+
+	`template_data` is the designer data with a stable `id` on every element
+	(and optionally `liveData`). The session keeps the compiled state on the
+	server, so later edits are sent as diffs to `update_preview_session`.
+	"""
+	template_data = json.loads(template_data) if isinstance(template_data, str) else template_data
+	session = {"owner": frappe.session.user, "elements": {}, "order": []}
+	elements = template_data.get("elements") or []
+	response = apply_changes(
+		session,
+		{
+			"label": template_data,
+			"data": template_data.get("liveData"),
+			"upsert": {element["id"]: element for element in elements},
+			"order": [element["id"] for element in elements],
+		},
+	)
+
+	session_id = frappe.generate_hash(length=16)
+	save_session(session_id, session)
+
+	from barcode.barcode.print_api import get_label_document_head
+
+	response.update(
+		{
+			"session_id": session_id,
+			"head": get_label_document_head(session["label"]),
+		}
+	)
+	return encode_response(response, compress)
+
+
+@frappe.whitelist()
+def update_preview_session(session_id, changes, compress=0):
+	"""Apply designer edits to a preview session and return only what changed
+
+	`changes` may hold `upsert` ({id: element}), `remove` ([id]), `order`
+	([id]), `label` (size and default symbology) and `data` (live data, None
+	for the sample data). An element comes back with its `style` when it
+	moved or was resized and with its `html` only when its content changed.
+	"""
+	changes = json.loads(changes) if isinstance(changes, str) else changes
+	session = get_session(session_id)
+	response = apply_changes(session, changes)
+	save_session(session_id, session)
+	return encode_response(response, compress)
+
+
+def apply_changes(session, changes):
+	response = {"elements": {}, "removed": []}
+	# a new symbology or new live data can change any element's content
+	refresh_all = False
+	if changes.get("label"):
+		label = get_label_settings(changes["label"])
+		refresh_all = label["barcode_type"] != session.get("label", {}).get("barcode_type")
+		session["label"] = response["label"] = label
+	if "data" in changes:
+		session["data"] = changes["data"] or PREVIEW_DATA
+		refresh_all = True
+
+	for element_id in changes.get("remove") or []:
+		if session["elements"].pop(element_id, None) is not None:
+			response["removed"].append(element_id)
+
+	upserts = changes.get("upsert") or {}
+	for element_id, element in upserts.items():
+		session["elements"].setdefault(element_id, {"style": None, "content_key": None})["source"] = element
+
+	for element_id in session["elements"] if refresh_all else upserts:
+		state = session["elements"][element_id]
+		compiled = compile_element(state["source"])
+		value = get_bound_value(compiled, session["data"])
+		rendered = {}
+
+		style = get_element_css(compiled)
+		if style != state["style"]:
+			rendered["style"] = state["style"] = style
+
+		content_key = get_element_content_key(compiled, session["label"], value)
+		if content_key != state["content_key"]:
+			rendered["html"] = render_element_content(compiled, session["label"], value, content_key)
+			state["content_key"] = content_key
+
+		if rendered:
+			response["elements"][element_id] = rendered
+
+	order = [
+		element_id
+		for element_id in changes.get("order") or session["order"]
+		if element_id in session["elements"]
+	]
+	order += [element_id for element_id in session["elements"] if element_id not in order]
+	if order != session["order"]:
+		session["order"] = response["order"] = order
+
+	return response
+
+
+def get_element_content_key(compiled, label, value):
+	"""Hash of everything an element's markup depends on, leaving out its position"""
+	content = {key: item for key, item in compiled.items() if key not in POSITION_KEYS}
+	content["value"] = value
+	if compiled["kind"] in ("barcode", "qr") and not compiled.get("symbology"):
+		content["symbology"] = label["barcode_type"]
+	return get_content_hash(content)
+
+
+def render_element_content(compiled, label, value, content_key):
+	"""Element markup, shared by every session through the label cache"""
+	return get_cached_output(("preview", content_key), lambda: get_html_content(compiled, label, value))
+
+
+def get_label_settings(template_data):
+	source = get_program_source(dict(template_data, elements=[]))
+	return {"width": source["width"], "height": source["height"], "barcode_type": source["barcode_type"]}
+
+
+def get_session(session_id):
+	session = frappe.cache().get_value(f"{SESSION_PREFIX}:{session_id}")
+	if not session or session["owner"] != frappe.session.user:
+		frappe.throw(_("Preview session expired, please open the preview again"), frappe.DoesNotExistError)
+	return session
+
+
+def save_session(session_id, session):
+	frappe.cache().set_value(f"{SESSION_PREFIX}:{session_id}", session, expires_in_sec=SESSION_TTL)
+
+
+def encode_response(response, compress):
+	"""Deflate large responses (zlib, base64) for clients that sent `compress`"""
+	if not cint(compress):
+		return response
+
+	payload = json.dumps(response, separators=(",", ":")).encode()
+	if len(payload) < COMPRESS_MIN_BYTES:
+		return response
+	return {"encoding": "deflate", "data": base64.b64encode(zlib.compress(payload)).decode()}
@@ -5,47 +5,42 @@ import base64
 from frappe import _
 from frappe.utils import get_site_path
 import os
+from itertools import chain, repeat
 from PIL import Image, ImageDraw, ImageFont
+from barcode.barcode.image_cache import get_cached_image
+from barcode.barcode.label_program import get_template_program
 try:
 	from barcode import Code128
 	from barcode.writer import ImageWriter
 except ImportError:
 	Code128 = None
-	try:
-		import qrcode
-	except ImportError:
-		qrcode = None
+
+# Labels converted per wkhtmltopdf run when a label PDF falls back to HTML
+HTML_PDF_CHUNK_SIZE = 200
 
 @frappe.whitelist()
-def generate_pdf_preview(template_data, copies=1):
-	"""Generate PDF preview of the label"""
+def generate_pdf_preview(template_data, copies=1, sheet_profile=None):
+	"""Generate PDF preview of the label, imposed on sheets of `sheet_profile`"""
 	try:
 		template_data = json.loads(template_data) if isinstance(template_data, str) else template_data
 		copies = int(copies)
 		
-		# Generate HTML for PDF
-		html_content = generate_label_html(template_data, copies)
-		
-		# Create PDF using frappe's PDF generator
+		# Identical requests share one stored PDF
+		from barcode.barcode.artifact_store import ensure_artifact, get_artifact_key, get_artifact_url
+		from barcode.barcode.imposition import get_sheet_layout
+		layout = get_sheet_layout(template_data.get('width', 50), template_data.get('height', 30), sheet_profile)
+		key = get_artifact_key('label-pdf', template_data, copies, layout)
 		try:
-			from frappe.utils.pdf import get_pdf
-			pdf_content = get_pdf(html_content, {'page-size': 'A4', 'margin-top': '0mm', 'margin-bottom': '0mm', 'margin-left': '0mm', 'margin-right': '0mm'})
+			name = ensure_artifact(key, 'pdf', lambda output: write_label_pdf(template_data, copies, output, sheet_profile))
 		except Exception as pdf_error:
 			# Fallback: return HTML for browser printing
 			return {
 				'success': True,
-				'html_content': html_content,
+				'html_content': generate_label_html(template_data, copies, sheet_profile),
 				'message': f'PDF generation failed, using HTML preview. Error: {str(pdf_error)}'
 			}
 		
-		# Save PDF to temp file
-		import tempfile
-		temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-		temp_file.write(pdf_content)
-		temp_file.close()
-		
-		# Create downloadable URL
-		file_url = f"/api/method/barcode.barcode.print_api.download_pdf?file={temp_file.name}"
+		file_url = get_artifact_url(name, "label_preview.pdf")
 		
 		return {
 			'success': True,
@@ -57,6 +52,81 @@ def generate_pdf_preview(template_data, copies=1):
 		frappe.log_error(f"PDF generation error: {str(e)}")
 		return {'success': False, 'error': str(e)}
 
+def write_label_pdf(template_data, copies, output, sheet_profile=None):
+	"""Write a PDF with `copies` labels to the binary file object `output`
+	
+	Labels are imposed N-up on the sheets of `sheet_profile`. Labels whose
+	elements can all be drawn natively are written by `pdf_writer` without a
+	browser. Otherwise only one full sheet and the trailing partial sheet go
+	through wkhtmltopdf; the remaining sheets are written as repeated page
+	references streamed to `output`, so time and memory do not grow with the
+	number of copies.
+	"""
+	from barcode.barcode.imposition import get_sheet_layout
+	from barcode.barcode.label_program import get_label_program
+	from barcode.barcode.pdf_writer import can_write_natively, write_program_pdf
+	
+	width, height = template_data.get('width', 50), template_data.get('height', 30)
+	layout = get_sheet_layout(width, height, sheet_profile)
+	
+	if template_data.get('program') or template_data.get('elements'):
+		program = get_label_program(template_data)
+		live_data = template_data.get('liveData')
+		if can_write_natively(program, live_data):
+			return write_program_pdf(program, [live_data], output, layout, copies)
+	
+	from frappe.utils.pdf import get_pdf
+	from barcode.barcode.imposition import get_pdf_options, get_sheet_counts
+	from barcode.barcode.pdf_pages import count_pages, write_repeated_pages
+	
+	if layout:
+		full_sheets, remainder = get_sheet_counts(copies, layout)
+		sheet_sizes = ([layout.per_page] if full_sheets else []) + ([remainder] if remainder else [])
+		sheet_repeats = ([full_sheets] if full_sheets else []) + ([1] if remainder else [])
+	else:
+		sheet_sizes, sheet_repeats = [1], [copies]
+	
+	unit_html = ''.join(iter_sheet_html(template_data, sheet_sizes, layout))
+	unit_pdf = get_pdf(unit_html, get_pdf_options(layout, width, height))
+	pages_per_sheet = max(1, count_pages(unit_pdf) // len(sheet_sizes))
+	
+	page_sequence = (
+		sheet_index * pages_per_sheet + page
+		for sheet_index, repeats in enumerate(sheet_repeats)
+		for repeat in range(repeats)
+		for page in range(pages_per_sheet)
+	)
+	return write_repeated_pages(unit_pdf, page_sequence, output)
+
+def write_label_bodies_pdf(template_doc, label_bodies, output, layout=None):
+	"""Write rendered label bodies of `template_doc` as a PDF through wkhtmltopdf
+	
+	This is the fallback for labels `pdf_writer` cannot draw, such as text
+	outside Latin-1 or templates with their own markup. The bodies (any
+	iterable) are converted HTML_PDF_CHUNK_SIZE labels at a time and the
+	resulting documents merged. Returns the number of pages written.
+	"""
+	from frappe.utils.pdf import get_pdf
+	from pypdf import PdfReader, PdfWriter
+	from barcode.barcode.imposition import get_pdf_options, render_label_sheet
+	from barcode.barcode.pdf_writer import iter_chunks
+	
+	width, height = template_doc.label_width, template_doc.label_height
+	head = get_template_document_head(template_doc, layout)
+	chunk_size = max(1, HTML_PDF_CHUNK_SIZE // layout.per_page) * layout.per_page if layout else HTML_PDF_CHUNK_SIZE
+	
+	writer = PdfWriter()
+	for chunk in iter_chunks((f'<div class="label">{body}</div>' for body in label_bodies), chunk_size):
+		if layout:
+			pages = [render_label_sheet(sheet, layout) for sheet in iter_chunks(chunk, layout.per_page)]
+		else:
+			pages = chunk
+		pdf = get_pdf(head + ''.join(pages) + '</body></html>', get_pdf_options(layout, width, height))
+		writer.append(PdfReader(io.BytesIO(pdf)))
+	
+	writer.write(output)
+	return len(writer.pages)
+
 @frappe.whitelist()
 def send_print_command(template_data, print_settings):
 	"""Send direct print command to printer"""
@@ -87,15 +157,16 @@ def send_thermal_print(template_data, print_settings, copies):
 			return {'success': False, 'error': 'Printer IP required for thermal printing'}
 		
 		# Generate ZPL commands
-		zpl_commands = generate_zpl_commands(template_data, copies)
+		zpl_commands = generate_zpl_commands(
+			template_data, copies, print_settings.get('dpi'),
+			print_settings.get('raster'), print_settings.get('compression')
+		)
 		
-		# Send to printer via socket
-		import socket
-		sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		sock.settimeout(5)
-		sock.connect((printer_ip, 9100))
-		sock.send(zpl_commands.encode())
-		sock.close()
+		# Send over the pooled printer connection
+		from barcode.barcode.printer_transport import send_to_printer
+		from barcode.barcode.settings_cache import get_setting
+		printer_port = print_settings.get('printerPort') or get_setting('printer_port')
+		send_to_printer(printer_ip, printer_port, zpl_commands)
 		
 		return {
 			'success': True,
@@ -108,16 +179,13 @@ def send_thermal_print(template_data, print_settings, copies):
 def send_laser_print(template_data, print_settings, copies):
 	"""Send to system default printer"""
 	try:
-		# Generate HTML and convert to PDF
-		html_content = generate_label_html(template_data, copies)
-		
 		# Use system print command (Linux/Windows compatible)
 		import subprocess
 		import tempfile
 		
-		# Create temp HTML file
+		# Stream label HTML into a temp file
 		temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False)
-		temp_file.write(html_content)
+		temp_file.writelines(iter_label_html(template_data, copies, print_settings.get('sheetProfile')))
 		temp_file.close()
 		
 		# Print using system command
@@ -134,15 +202,64 @@ def send_laser_print(template_data, print_settings, copies):
 	except Exception as e:
 		return {'success': False, 'error': f'Laser print error: {str(e)}'}
 
-def generate_label_html(template_data, copies=1):
+def generate_label_html(template_data, copies=1, sheet_profile=None):
 	"""Generate HTML content for label printing"""
+	return ''.join(iter_label_html(template_data, copies, sheet_profile))
+
+def iter_label_html(template_data, copies=1, sheet_profile=None):
+	"""Yield the label document piece by piece
+	
+	The label body is rendered once and yielded lazily for every copy (or every
+	sheet of copies), so callers can stream any number of copies to a file or
+	response.
+	"""
+	from barcode.barcode.imposition import get_sheet_counts, get_sheet_layout
+	
+	layout = get_sheet_layout(template_data.get('width', 50), template_data.get('height', 30), sheet_profile)
+	if not layout:
+		yield from iter_sheet_html(template_data, repeat(1, copies))
+		return
+	
+	full_sheets, remainder = get_sheet_counts(copies, layout)
+	sheet_sizes = chain(repeat(layout.per_page, full_sheets), [remainder] if remainder else [])
+	yield from iter_sheet_html(template_data, sheet_sizes, layout)
+
+def iter_sheet_html(template_data, sheet_sizes, layout=None):
+	"""Yield a label document with one sheet per entry of `sheet_sizes` (labels on that sheet)
+	
+	Without a sheet layout every label is its own page.
+	"""
+	from barcode.barcode.imposition import render_sheet
+	
+	yield get_label_document_head(template_data, layout)
+	
+	label_html = render_label(template_data)
+	full_sheet = render_sheet(label_html, layout) if layout else label_html
+	for count in sheet_sizes:
+		if not layout:
+			yield label_html
+		elif count == layout.per_page:
+			yield full_sheet
+		else:
+			yield render_sheet(label_html, layout, count)
+	
+	yield """
+	</body>
+	</html>
+	"""
+
+def get_label_document_head(template_data, layout=None):
+	"""HTML document head with print CSS for the label size (and sheet layout, if any)"""
+	from barcode.barcode.imposition import get_sheet_css
+	
 	width = template_data.get('width', 50)
 	height = template_data.get('height', 30)
-	elements = template_data.get('elements', [])
-	live_data = template_data.get('liveData')
 	
-	# CSS for print
-	css = f"""
+	return f"""
+	<!DOCTYPE html>
+	<html>
+	<head>
+		<title>Label Print</title>
 	<style>
 		@page {{
 			size: {width}mm {height}mm;
@@ -172,102 +289,41 @@ def generate_label_html(template_data, copies=1):
 				border: none;
 			}}
 		}}
+		{get_sheet_css(layout) if layout else ''}
 	</style>
-	"""
-	
-	# Generate labels
-	labels_html = ""
-	for copy_num in range(copies):
-		labels_html += f'<div class="label">'
-		
-		for element in elements:
-			content = get_element_content(element, live_data)
-			style = f"""
-				left: {element['x']}px;
-				top: {element['y']}px;
-				width: {element['width']}px;
-				height: {element['height']}px;
-				font-size: {element.get('fontSize', 12)}px;
-				font-weight: {element.get('fontWeight', 'normal')};
-				color: {element.get('color', '#000')};
-			"""
-			
-			labels_html += f'<div class="element" style="{style}">{content}</div>'
-		
-		labels_html += '</div>'
-	
-	return f"""
-	<!DOCTYPE html>
-	<html>
-	<head>
-		<title>Label Print</title>
-		{css}
 	</head>
 	<body>
-		{labels_html}
-	</body>
-	</html>
 	"""
 
-def get_element_content(element, live_data=None):
-	"""Get content for element based on type"""
-	element_type = element.get('type')
-	content = element.get('content', '')
-	
-	# Use live data if available
-	if live_data and element_type in live_data:
-		content = live_data[element_type]
+def get_template_document_head(template_doc, layout=None):
+	"""Label document head with the stylesheet of a Barcode Label Template, for its rendered label bodies"""
+	from barcode.barcode.template_cache import get_cached_css
 	
-	if element_type == 'barcode':
-		barcode_value = live_data.get('item_code') if live_data else content
-		barcode_img = generate_barcode_base64(barcode_value)
-		return f'<img src="data:image/png;base64,{barcode_img}" style="max-width: 100%; height: auto;" />'
-	elif element_type == 'batch_barcode':
-		barcode_value = live_data.get('batch_no') if live_data else content
-		barcode_img = generate_barcode_base64(barcode_value)
-		return f'<img src="data:image/png;base64,{barcode_img}" style="max-width: 100%; height: auto;" />'
-	elif element_type == 'serial_barcode':
-		barcode_value = live_data.get('serial_no') if live_data else content
-		barcode_img = generate_barcode_base64(barcode_value)
-		return f'<img src="data:image/png;base64,{barcode_img}" style="max-width: 100%; height: auto;" />'
-	elif element_type == 'qr':
-		qr_content = element.get('qrContent', content)
-		qr_img = generate_qr_base64(qr_content)
-		return f'<img src="data:image/png;base64,{qr_img}" style="width: 100%; height: 100%; object-fit: contain;" />'
-	elif element_type in ['logo', 'image']:
-		image_url = element.get('imageUrl', '')
-		if image_url:
-			return f'<img src="{image_url}" style="width: 100%; height: 100%; object-fit: contain;" />'
-		return f'<div style="background: #f0f0f0; width: 100%; height: 100%; display: flex; align-items: center; justify-content: center; font-size: 10px;">{content}</div>'
-	elif element_type == 'line':
-		return '<hr style="margin: 0; border-top: 2px solid currentColor; width: 100%;" />'
-	elif element_type == 'box':
-		return '<div style="width: 100%; height: 100%; border: 2px solid currentColor;"></div>'
-	else:
-		return content.replace('\n', '<br>') if content else ''
+	head = get_label_document_head({'width': template_doc.label_width, 'height': template_doc.label_height}, layout)
+	return head.replace('</head>', f'<style>{get_cached_css(template_doc)}</style></head>', 1)
 
-def generate_zpl_commands(template_data, copies=1):
-	"""Generate ZPL commands for thermal printer"""
-	width = int(template_data.get('width', 50) * 8)  # Convert mm to dots (203 DPI)
-	height = int(template_data.get('height', 30) * 8)
-	elements = template_data.get('elements', [])
+def render_label(template_data):
+	"""Render the HTML of a single label from the compiled label program"""
+	from barcode.barcode.label_program import get_label_program, render_program_html
 	
-	zpl = f"^XA^LH0,0^FS"  # Start ZPL, set label home
-	zpl += f"^PW{width}^FS"  # Set print width
+	return render_program_html(get_label_program(template_data), template_data.get('liveData'))
+
+def generate_zpl_commands(template_data, copies=1, dpi=None, raster=False, compression=None):
+	"""Generate ZPL commands for thermal printer
 	
-	for element in elements:
-		x = int(element['x'] * 8 / 3.78)  # Convert px to dots
-		y = int(element['y'] * 8 / 3.78)
-		
-		if element['type'] == 'barcode':
-			zpl += f"^FO{x},{y}^BY2,3,50^BCN,,Y,N^FD{element.get('content', '')}^FS"
-		elif element['type'] in ['text', 'custom_text']:
-			font_size = max(1, int(element.get('fontSize', 12) / 4))
-			zpl += f"^FO{x},{y}^A0N,{font_size},{font_size}^FD{element.get('content', '')}^FS"
+	Labels with markup that has no ZPL equivalent (or any label when `raster`
+	is set) are rendered and sent as 1-bit graphics.
+	"""
+	from barcode.barcode.label_program import get_label_program
+	from barcode.barcode.zpl import DEFAULT_DPI, compile_zpl, needs_raster
 	
-	zpl += f"^PQ{copies}^XZ"  # Print quantity and end ZPL
+	if raster or needs_raster(get_label_program(template_data)):
+		from barcode.barcode.raster import compile_raster_zpl
+		return compile_raster_zpl(
+			template_data, [template_data.get('liveData')], copies, dpi or DEFAULT_DPI, compression
+		)
 	
-	return zpl
+	return compile_zpl(template_data, copies, dpi or DEFAULT_DPI)
 
 @frappe.whitelist()
 def print_template_direct(template_name, print_settings, sample_data=None):
@@ -282,7 +338,7 @@ def print_template_direct(template_name, print_settings, sample_data=None):
 			'name': template.template_name,
 			'width': template.label_width,
 			'height': template.label_height,
-			'elements': parse_template_elements(template),
+			'program': get_template_program(template),
 			'liveData': prepare_sample_data(sample_data)
 		}
 		
@@ -308,7 +364,7 @@ def template_pdf_preview(template_name):
 			'name': template.template_name,
 			'width': template.label_width,
 			'height': template.label_height,
-			'elements': parse_template_elements(template),
+			'program': get_template_program(template),
 			'liveData': {
 				'item_code': 'SAMPLE001',
 				'item_name': 'Sample Product',
@@ -323,47 +379,6 @@ def template_pdf_preview(template_name):
 	except Exception as e:
 		return {'success': False, 'error': str(e)}
 
-def parse_template_elements(template):
-	"""Parse template HTML to extract elements"""
-	try:
-		# Simple parsing for basic templates
-		elements = []
-		
-		# Add basic elements based on template fields
-		if template.show_item_code:
-			elements.append({
-				'type': 'item_code',
-				'x': 10, 'y': 10, 'width': 80, 'height': 20,
-				'fontSize': 12, 'content': 'item_code'
-			})
-			
-		if template.show_item_name:
-			elements.append({
-				'type': 'item_name',
-				'x': 10, 'y': 35, 'width': 120, 'height': 20,
-				'fontSize': 10, 'content': 'item_name'
-			})
-			
-		if template.show_batch_no:
-			elements.append({
-				'type': 'batch_no',
-				'x': 10, 'y': 60, 'width': 80, 'height': 15,
-				'fontSize': 9, 'content': 'batch_no'
-			})
-			
-		# Add barcode
-		elements.append({
-			'type': 'barcode',
-			'x': 10, 'y': 80, 'width': 120, 'height': 40,
-			'fontSize': 12, 'content': 'barcode'
-		})
-		
-		return elements
-		
-	except Exception as e:
-		frappe.log_error(f"Template parsing error: {str(e)}")
-		return []
-
 def prepare_sample_data(sample_data):
 	"""Prepare sample data for printing"""
 	default_data = {
@@ -394,13 +409,16 @@ def prepare_sample_data(sample_data):
 		
 	return default_data
 
-def generate_barcode_base64(value):
+def generate_barcode_base64(value, module_size=None):
 	"""Generate base64 encoded barcode image"""
+	return get_cached_image("Code128", value, module_size, "png", lambda: _render_barcode_base64(value, module_size))
+
+def _render_barcode_base64(value, module_size=None):
 	try:
 		if Code128:
 			code = Code128(str(value), writer=ImageWriter())
 			buffer = io.BytesIO()
-			code.write(buffer)
+			code.write(buffer, options={'module_width': module_size} if module_size else None)
 			buffer.seek(0)
 			return base64.b64encode(buffer.getvalue()).decode()
 		else:
@@ -422,51 +440,20 @@ def generate_barcode_base64(value):
 		buffer.seek(0)
 		return base64.b64encode(buffer.getvalue()).decode()
 
-def generate_qr_base64(value):
+def generate_qr_base64(value, box_size=10):
 	"""Generate base64 encoded QR code image"""
+	return get_cached_image("QR Code", value, box_size, "png", lambda: _render_qr_base64(value, box_size))
+
+def _render_qr_base64(value, box_size=10):
+	from barcode.barcode.symbology import render_matrix_png
+
 	try:
-		if qrcode:
-			qr = qrcode.QRCode(version=1, box_size=10, border=5)
-			qr.add_data(str(value))
-			qr.make(fit=True)
-			img = qr.make_image(fill_color="black", back_color="white")
-			buffer = io.BytesIO()
-			img.save(buffer, format='PNG')
-			buffer.seek(0)
-			return base64.b64encode(buffer.getvalue()).decode()
-		else:
-			# Fallback: create simple text image
-			img = Image.new('RGB', (100, 100), color='white')
-			draw = ImageDraw.Draw(img)
-			draw.text((10, 40), f"QR:{str(value)[:10]}", fill='black')
-			buffer = io.BytesIO()
-			img.save(buffer, format='PNG')
-			buffer.seek(0)
-			return base64.b64encode(buffer.getvalue()).decode()
-	except Exception as e:
-		# Simple fallback image
-		img = Image.new('RGB', (100, 100), color='white')
+		return base64.b64encode(render_matrix_png("QR Code", value, box_size)).decode()
+	except ValueError:
+		# too long for a QR Code: a text placeholder keeps the label printable
+		img = Image.new('1', (100, 100), color=1)
 		draw = ImageDraw.Draw(img)
-		draw.text((10, 40), f"QR:{str(value)[:10]}", fill='black')
+		draw.text((10, 40), f"QR:{str(value)[:10]}", fill=0)
 		buffer = io.BytesIO()
 		img.save(buffer, format='PNG')
-		buffer.seek(0)
 		return base64.b64encode(buffer.getvalue()).decode()
-
-@frappe.whitelist()
-def download_pdf(file):
-	"""Download generated PDF file"""
-	try:
-		if os.path.exists(file):
-			with open(file, 'rb') as f:
-				content = f.read()
-			
-			# Clean up temp file
-			os.unlink(file)
-			
-			frappe.local.response.filename = "label_preview.pdf"
-			frappe.local.response.filecontent = content
-			frappe.local.response.type = "download"
-			
-	except Exception as e:
-		frappe.throw(f"File download error: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,224 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+import frappe
+from frappe.utils import cint, now
+
+from barcode.barcode.settings_cache import get_setting
+
+PRINT_LOG_DOCTYPE = "Barcode Print Log"
+PRINT_LOG_FIELDS = (
+	"name",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+	"docstatus",
+	"print_datetime",
+	"user",
+	"reference_doctype",
+	"reference_name",
+	"template_used",
+	"item_code",
+	"item_name",
+	"batch_no",
+	"serial_no",
+	"copies_printed",
+	"barcode_type",
+	"printer_type",
+	"printer_ip",
+	"print_status",
+	"error_message",
+)
+
+DEFAULT_FLUSH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 5
+# Rows that could not be written at process exit are spooled here (per site)
+# and replayed by the scheduler
+SPOOL_FOLDER = "barcode_print_log_spool"
+
+# Per worker buffers of pending rows, keyed by site
+_buffers = {}
+_first_queued = {}
+_sites_paths = {}
+_lock = threading.Lock()
+
+
+def build_print_log_row(
+	doctype,
+	source,
+	template_name,
+	copies,
+	barcode_type,
+	print_status="Success",
+	error_message=None,
+	printer_type=None,
+	printer_ip=None,
+):
+	"""Build a Barcode Print Log row for `queue_print_logs`"""
+	timestamp = now()
+	row = {
+		"name": frappe.generate_hash(length=10),
+		"creation": timestamp,
+		"modified": timestamp,
+		"owner": frappe.session.user,
+		"modified_by": frappe.session.user,
+		"docstatus": 0,
+		"print_datetime": timestamp,
+		"user": frappe.session.user,
+		"reference_doctype": doctype,
+		"reference_name": source.get("name"),
+		"template_used": template_name,
+		"item_code": None,
+		"item_name": None,
+		"batch_no": None,
+		"serial_no": None,
+		"copies_printed": copies,
+		"barcode_type": barcode_type,
+		"printer_type": printer_type,
+		"printer_ip": printer_ip,
+		"print_status": print_status,
+		"error_message": error_message,
+	}
+
+	if doctype == "Item":
+		row["item_code"] = source.get("item_code")
+		row["item_name"] = source.get("item_name")
+	elif doctype == "Batch":
+		row["item_code"] = source.get("item")
+		row["batch_no"] = source.get("name")
+	elif doctype == "Serial No":
+		row["item_code"] = source.get("item_code")
+		row["serial_no"] = source.get("name")
+
+	return row
+
+
+def queue_print_logs(rows):
+	"""Buffer Barcode Print Log rows for this worker's site.
+
+	The buffer is written with one multi-row insert once it holds
+	`print_log_flush_size` rows or its oldest row is `print_log_flush_interval`
+	seconds old, and at the end of every request and background job.
+	"""
+	if not rows:
+		return
+
+	site = get_site()
+	flush_size = max(1, cint(get_setting("print_log_flush_size", DEFAULT_FLUSH_SIZE)))
+	flush_interval = cint(get_setting("print_log_flush_interval", DEFAULT_FLUSH_INTERVAL))
+
+	with _lock:
+		buffer = _buffers.setdefault(site, [])
+		if not buffer:
+			_first_queued[site] = time.monotonic()
+			_sites_paths[site] = getattr(frappe.local, "sites_path", None)
+		buffer.extend(rows)
+		due = len(buffer) >= flush_size or time.monotonic() - _first_queued[site] >= flush_interval
+
+	if due:
+		flush_print_logs()
+
+
+def flush_print_logs():
+	"""Write this site's buffered rows (`after_request` / `after_job` hook)"""
+	site = get_site()
+	with _lock:
+		rows = _buffers.pop(site, None)
+		_first_queued.pop(site, None)
+
+	if not rows:
+		return
+
+	try:
+		insert_print_logs(rows)
+	except Exception as e:
+		# keep the rows for the next flush instead of dropping them
+		with _lock:
+			_buffers.setdefault(site, [])[:0] = rows
+			_first_queued.setdefault(site, time.monotonic())
+		frappe.log_error(f"Barcode print log flush failed: {e!s}")
+
+
+def insert_print_logs(rows, ignore_duplicates=False):
+	"""Write many Barcode Print Log rows with one multi-row insert and one commit"""
+	if not rows:
+		return
+
+	frappe.db.bulk_insert(
+		PRINT_LOG_DOCTYPE,
+		fields=PRINT_LOG_FIELDS,
+		values=[tuple(row.get(field) for field in PRINT_LOG_FIELDS) for row in rows],
+		ignore_duplicates=ignore_duplicates,
+	)
+	frappe.db.commit()
+
+
+def flush_all_print_logs():
+	"""Write the buffers of every site at process exit.
+
+	There is no request context any more, so each site is connected on its own;
+	rows that still cannot be written are spooled to disk for
+	`load_spooled_print_logs`.
+	"""
+	with _lock:
+		pending = dict(_buffers)
+		_buffers.clear()
+		_first_queued.clear()
+
+	for site, rows in pending.items():
+		if not rows or not site:
+			continue
+
+		if getattr(frappe.local, "site", None) == site and getattr(frappe.local, "db", None):
+			try:
+				insert_print_logs(rows)
+			except Exception:
+				spool_print_logs(site, rows)
+			continue
+
+		try:
+			frappe.init(site=site, sites_path=_sites_paths.get(site) or ".")
+			frappe.connect()
+			insert_print_logs(rows)
+		except Exception:
+			spool_print_logs(site, rows)
+		finally:
+			frappe.destroy()
+
+
+def spool_print_logs(site, rows):
+	spool_dir = get_spool_dir(site)
+	os.makedirs(spool_dir, exist_ok=True)
+	path = os.path.join(spool_dir, f"{time.time_ns()}-{os.getpid()}.json")
+	with open(path, "w") as f:
+		json.dump(rows, f)
+
+
+def load_spooled_print_logs():
+	"""Insert rows spooled by an earlier process exit (scheduled)"""
+	spool_dir = frappe.get_site_path("private", SPOOL_FOLDER)
+	if not os.path.isdir(spool_dir):
+		return
+
+	for filename in sorted(os.listdir(spool_dir)):
+		path = os.path.join(spool_dir, filename)
+		with open(path) as f:
+			rows = json.load(f)
+		# rows of a spool file committed just before a crash are skipped, not duplicated
+		insert_print_logs(rows, ignore_duplicates=True)
+		os.remove(path)
+
+
+def get_spool_dir(site):
+	return os.path.join(_sites_paths.get(site) or ".", site, "private", SPOOL_FOLDER)
+
+
+def get_site():
+	return getattr(frappe.local, "site", None)
+
+
+atexit.register(flush_all_print_logs)
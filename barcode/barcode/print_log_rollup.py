@@ -0,0 +1,117 @@
+import time
+
+import frappe
+from frappe.utils import add_days, cint, getdate, now, nowdate
+
+from barcode.barcode.print_log import PRINT_LOG_DOCTYPE
+from barcode.barcode.settings_cache import get_setting
+
+SUMMARY_DOCTYPE = "Barcode Print Summary"
+# Raw rows past the retention period are moved to this table (created like the
+# log table on first use, not a DocType)
+ARCHIVE_TABLE = "Barcode Print Log Archive"
+# Days before the last rolled up day that every run rolls up again, so rows
+# spooled at a process exit and written later are still counted. Raw rows of
+# these days are never archived.
+ROLLUP_LOOKBACK_DAYS = 2
+DEFAULT_ARCHIVE_BATCH_SIZE = 5000
+# An archival run stops after this long and continues on the next day
+MAX_ARCHIVE_SECONDS = 20 * 60
+
+
+def rollup_print_logs():
+	"""Scheduler: roll raw print logs up into daily Barcode Print Summary rows
+	per item, template and printer, up to yesterday"""
+	last_day = get_last_summary_date()
+	if last_day:
+		day = add_days(last_day, -ROLLUP_LOOKBACK_DAYS)
+	else:
+		first_print = frappe.db.sql(f"select min(print_datetime) from `tab{PRINT_LOG_DOCTYPE}`")[0][0]
+		if not first_print:
+			return
+		day = getdate(first_print)
+
+	yesterday = getdate(add_days(nowdate(), -1))
+	while getdate(day) <= yesterday:
+		rollup_print_log_day(getdate(day))
+		frappe.db.commit()
+		day = add_days(day, 1)
+
+
+def rollup_print_log_day(day):
+	"""Replace the summary rows of `day` with one set based aggregate of its raw rows"""
+	frappe.db.delete(SUMMARY_DOCTYPE, {"summary_date": day})
+	timestamp = now()
+	frappe.db.sql(
+		f"""
+		insert into `tab{SUMMARY_DOCTYPE}` (
+			name, creation, modified, owner, modified_by, docstatus,
+			summary_date, item_code, template_used, printer_ip, print_count, copies_printed, failed_count
+		)
+		select
+			sha1(concat_ws('|', %(day)s, coalesce(item_code, ''), coalesce(template_used, ''), coalesce(printer_ip, ''))),
+			%(timestamp)s, %(timestamp)s, 'Administrator', 'Administrator', 0,
+			%(day)s, item_code, template_used, printer_ip,
+			count(*),
+			sum(case when print_status = 'Success' then copies_printed else 0 end),
+			sum(case when print_status = 'Failed' then 1 else 0 end)
+		from `tab{PRINT_LOG_DOCTYPE}`
+		where print_datetime >= %(day)s and print_datetime < %(next_day)s
+		group by item_code, template_used, printer_ip
+	""",
+		{"day": day, "next_day": add_days(day, 1), "timestamp": timestamp},
+	)
+
+
+def archive_print_logs():
+	"""Scheduler: move raw print logs older than `print_log_retention_days` to the archive table
+
+	Only days that are already rolled up are archived. Rows are moved in
+	batches of `print_log_archive_batch_size`, each in its own short
+	transaction, so the log table is never locked for long.
+	"""
+	retention_days = cint(get_setting("print_log_retention_days"))
+	last_day = get_last_summary_date()
+	if retention_days <= 0 or not last_day:
+		return
+
+	cutoff = min(
+		getdate(add_days(nowdate(), -retention_days)), getdate(add_days(last_day, -ROLLUP_LOOKBACK_DAYS))
+	)
+	batch_size = cint(get_setting("print_log_archive_batch_size")) or DEFAULT_ARCHIVE_BATCH_SIZE
+	columns = ", ".join(f"`{column}`" for column in get_archive_columns())
+
+	started = time.monotonic()
+	while time.monotonic() - started < MAX_ARCHIVE_SECONDS:
+		names = frappe.db.sql_list(
+			f"""
+			select name from `tab{PRINT_LOG_DOCTYPE}`
+			where print_datetime < %s
+			order by print_datetime
+			limit %s
+		""",
+			(cutoff, batch_size),
+		)
+		if not names:
+			break
+
+		frappe.db.sql(
+			f"""
+			insert ignore into `tab{ARCHIVE_TABLE}` ({columns})
+			select {columns} from `tab{PRINT_LOG_DOCTYPE}` where name in %(names)s
+		""",
+			{"names": tuple(names)},
+		)
+		frappe.db.delete(PRINT_LOG_DOCTYPE, {"name": ["in", names]})
+		frappe.db.commit()
+
+
+def get_archive_columns():
+	"""Columns of the log table that the archive table has, creating the archive table if needed"""
+	frappe.db.sql_ddl(f"create table if not exists `tab{ARCHIVE_TABLE}` like `tab{PRINT_LOG_DOCTYPE}`")
+	archive_columns = set(frappe.db.get_table_columns(ARCHIVE_TABLE))
+	return [column for column in frappe.db.get_table_columns(PRINT_LOG_DOCTYPE) if column in archive_columns]
+
+
+def get_last_summary_date():
+	return frappe.db.sql(f"select max(summary_date) from `tab{SUMMARY_DOCTYPE}`")[0][0]
@@ -0,0 +1,192 @@
+import select
+import socket
+import threading
+import time
+
+import frappe
+from frappe.utils import cint, flt
+
+from barcode.barcode.settings_cache import get_setting
+
+DEFAULT_PRINTER_PORT = 9100
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_WRITE_TIMEOUT = 30
+# Many printers accept a single client on their raw port, so a connection
+# left idle this long is closed for the other workers to print
+IDLE_TIMEOUT = 15
+REAP_INTERVAL = 5
+WRITE_CHUNK_SIZE = 64 * 1024
+
+_pool = {}
+_pool_lock = threading.Lock()
+_reaper = {"thread": None}
+
+
+class PrinterConnection:
+	"""Persistent TCP connection to a raw (port 9100) label printer"""
+
+	def __init__(
+		self, host, port, connect_timeout=DEFAULT_CONNECT_TIMEOUT, write_timeout=DEFAULT_WRITE_TIMEOUT
+	):
+		self.host = host
+		self.port = port
+		self.connect_timeout = connect_timeout
+		self.write_timeout = write_timeout
+		self.lock = threading.Lock()
+		self.sock = None
+		self.last_used = 0
+		self.jobs_sent = 0
+		self.bytes_sent = 0
+		self.written = 0
+		self.connects = 0
+
+	def connect(self):
+		self.close()
+		sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+		sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+		sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		self.sock = sock
+		self.connects += 1
+
+	def close(self):
+		if self.sock:
+			try:
+				self.sock.close()
+			except OSError:
+				pass
+		self.sock = None
+
+	def close_if_idle(self):
+		"""Close the socket when it has not been used for IDLE_TIMEOUT (skipped while a job is being sent)"""
+		if not self.lock.acquire(blocking=False):
+			return
+		try:
+			if self.sock and time.monotonic() - self.last_used > IDLE_TIMEOUT:
+				self.close()
+		finally:
+			self.lock.release()
+
+	def is_alive(self):
+		"""Whether the pooled socket can be reused (not idle too long, not closed by the printer)"""
+		if not self.sock or time.monotonic() - self.last_used > IDLE_TIMEOUT:
+			return False
+
+		try:
+			readable, _writable, _errored = select.select([self.sock], [], [], 0)
+			if readable:
+				# printers may push status bytes; an empty read means the peer closed
+				if not self.sock.recv(4096, socket.MSG_DONTWAIT):
+					return False
+		except OSError:
+			return False
+
+		return True
+
+	def send_jobs(self, payloads):
+		"""Write print jobs to the connection in order
+
+		A pooled connection the printer dropped is reconnected once, and the job
+		resent, only when none of it was written; a job that failed part way
+		through is not sent again, as the printer may already print its start.
+		"""
+		with self.lock:
+			reconnected = not self.is_alive()
+			if reconnected:
+				self.connect()
+
+			for payload in payloads:
+				data = payload.encode() if isinstance(payload, str) else payload
+				try:
+					self.write(data)
+				except (BrokenPipeError, ConnectionResetError):
+					if reconnected or self.written:
+						raise
+					reconnected = True
+					self.connect()
+					self.write(data)
+
+				self.jobs_sent += 1
+				self.bytes_sent += len(data)
+
+			self.last_used = time.monotonic()
+
+	def write(self, data):
+		"""Write all of `data`; the write timeout applies per chunk so a slow printer
+		buffer only fails the job when it stops draining altogether. `written`
+		holds the bytes written before a failure."""
+		self.sock.settimeout(self.write_timeout)
+		self.written = 0
+		view = memoryview(data)
+		for start in range(0, len(view), WRITE_CHUNK_SIZE):
+			try:
+				self.sock.sendall(view[start : start + WRITE_CHUNK_SIZE])
+			except OSError:
+				# timed out or dropped: never reuse a half-written connection
+				self.close()
+				raise
+			self.written = min(start + WRITE_CHUNK_SIZE, len(view))
+
+
+def get_connection(host, port=None, connect_timeout=None, write_timeout=None):
+	"""Pooled connection for a printer, one per (host, port) per worker"""
+	port = cint(port) or DEFAULT_PRINTER_PORT
+	with _pool_lock:
+		connection = _pool.get((host, port))
+		if not connection:
+			connection = _pool[(host, port)] = PrinterConnection(host, port)
+		start_idle_reaper()
+
+	timeouts = get_timeouts()
+	connection.connect_timeout = flt(connect_timeout) or timeouts["connect"]
+	connection.write_timeout = flt(write_timeout) or timeouts["write"]
+	return connection
+
+
+def start_idle_reaper():
+	"""Start this process's thread closing idle printer connections (again after a fork); call under _pool_lock"""
+	thread = _reaper["thread"]
+	if thread is None or not thread.is_alive():
+		thread = threading.Thread(target=reap_idle_connections, name="barcode-printer-reaper", daemon=True)
+		thread.start()
+		_reaper["thread"] = thread
+
+
+def reap_idle_connections():
+	while True:
+		time.sleep(REAP_INTERVAL)
+		for connection in list(_pool.values()):
+			connection.close_if_idle()
+
+
+def get_timeouts():
+	return {
+		"connect": flt(get_setting("printer_connect_timeout")) or DEFAULT_CONNECT_TIMEOUT,
+		"write": flt(get_setting("printer_write_timeout")) or DEFAULT_WRITE_TIMEOUT,
+	}
+
+
+def send_to_printer(host, port, payload):
+	"""Send one raw print job (ZPL/EPL/TSPL) to a network printer"""
+	send_jobs_to_printer(host, port, [payload])
+
+
+def send_jobs_to_printer(host, port, payloads):
+	"""Send raw print jobs to one printer, in order, over its pooled connection"""
+	get_connection(host, port).send_jobs(payloads)
+
+
+@frappe.whitelist()
+def get_printer_pool_stats():
+	"""Connection pool counters of this worker"""
+	frappe.only_for("System Manager")
+
+	return [
+		{
+			"printer": f"{connection.host}:{connection.port}",
+			"connected": bool(connection.sock),
+			"connects": connection.connects,
+			"jobs_sent": connection.jobs_sent,
+			"bytes_sent": connection.bytes_sent,
+		}
+		for connection in list(_pool.values())
+	]
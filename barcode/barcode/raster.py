@@ -0,0 +1,294 @@
+import base64
+import binascii
+import hashlib
+import io
+import re
+import shutil
+import subprocess
+import zlib
+
+import frappe
+import numpy as np
+from frappe import _
+from frappe.utils import cint
+
+from barcode.barcode.label_cache import get_cached_output
+from barcode.barcode.label_program import get_label_program, render_program_html
+from barcode.barcode.lru_cache import BoundedLRUCache
+from barcode.barcode.zpl import DEFAULT_DPI, mm_to_dots
+
+COMPRESSIONS = ("Z64", "ACS")
+DEFAULT_COMPRESSION = "Z64"
+# Labels of a job are compared in chunks of this many; rows that are the same
+# on every label of a chunk are downloaded once
+CHUNK_LABELS = 256
+# Blank gaps up to this many rows do not split a graphic field
+MAX_BLANK_GAP = 16
+# Grey levels below this print as a dot
+THRESHOLD = 128
+RENDER_TIMEOUT = 60
+CSS_DPI = 96
+# Printer memory objects holding shared rows are named with this prefix
+# and removed at the end of the job
+GRAPHIC_PREFIX = "R"
+
+GRAPHIC_CACHE_BYTES = 8 * 1024 * 1024
+
+_graphic_cache = BoundedLRUCache(GRAPHIC_CACHE_BYTES, sizeof=lambda graphic: len(graphic[1]))
+
+_run_pattern = re.compile(r"(.)\1+")
+
+
+def compile_raster_zpl(
+	template_data, labels_data, copies=1, dpi=DEFAULT_DPI, compression=DEFAULT_COMPRESSION
+):
+	"""Compile a ZPL job printing each label of `labels_data` as a 1-bit graphic
+
+	Labels are rendered from their HTML at the printer resolution, so any
+	markup and CSS prints the way it previews. Rows that are the same on every
+	label (the static parts of the layout) are downloaded to printer memory
+	once with ~DG and recalled with ^XG; only the rows that change are sent
+	with each label as ^GFA fields, and blank rows are not sent at all.
+	Copies of a label are one format with ^PQ.
+	"""
+	return "".join(iter_raster_zpl(template_data, labels_data, copies, dpi, compression))
+
+
+def iter_raster_zpl(template_data, labels_data, copies=1, dpi=DEFAULT_DPI, compression=DEFAULT_COMPRESSION):
+	"""The commands of `compile_raster_zpl`, yielded as each chunk of labels is rendered"""
+	program = get_label_program(template_data)
+	labels_html = (render_program_html(program, live_data) for live_data in labels_data)
+	yield from iter_html_raster_zpl(
+		get_raster_document_head(template_data),
+		labels_html,
+		program["width"],
+		program["height"],
+		copies,
+		dpi,
+		compression,
+	)
+
+
+def iter_template_raster_zpl(
+	template_doc, label_bodies, copies=1, dpi=DEFAULT_DPI, compression=DEFAULT_COMPRESSION
+):
+	"""Raster ZPL commands of rendered label bodies of a Barcode Label Template, with its own markup and CSS"""
+	from barcode.barcode.label_program import get_template_size
+	from barcode.barcode.print_api import get_template_document_head
+
+	size = get_template_size(template_doc)
+	labels_html = (f'<div class="label">{body}</div>' for body in label_bodies)
+	yield from iter_html_raster_zpl(
+		hide_preview_border(get_template_document_head(template_doc)),
+		labels_html,
+		size["label_width"],
+		size["label_height"],
+		copies,
+		dpi,
+		compression,
+	)
+
+
+def iter_html_raster_zpl(
+	head, labels_html, width, height, copies=1, dpi=DEFAULT_DPI, compression=DEFAULT_COMPRESSION
+):
+	"""Raster ZPL commands of label HTML (after the document `head`) for labels of `width` x `height` mm"""
+	dpi = cint(dpi) or DEFAULT_DPI
+	compression = compression if compression in COMPRESSIONS else DEFAULT_COMPRESSION
+	width, height = mm_to_dots(width, dpi), mm_to_dots(height, dpi)
+	header = f"^XA^PW{width}^LL{height}^LH0,0"
+	footer = f"^PQ{max(1, cint(copies))}^XZ"
+
+	stored = set()
+	for chunk in iter_chunks(labels_html, CHUNK_LABELS):
+		bitmaps = [get_label_bitmap(head + label_html, width, height, dpi) for label_html in chunk]
+		shared = get_shared_rows(bitmaps)
+
+		static = []
+		for top, bottom in iter_fields(bitmaps[0], shared):
+			name, graphic = get_graphic(bitmaps[0][top:bottom], compression)
+			if name not in stored:
+				yield f"~DGR:{name}.GRF,{graphic}"
+				stored.add(name)
+			static.append(f"^FO0,{top}^XGR:{name}.GRF,1,1^FS")
+		static = "".join(static)
+
+		for bitmap in bitmaps:
+			label = [header, static]
+			for top, bottom in iter_fields(bitmap, ~shared):
+				_name, graphic = get_graphic(bitmap[top:bottom], compression)
+				total, graphic = graphic.split(",", 1)
+				label.append(f"^FO0,{top}^GFA,{total},{total},{graphic}^FS")
+			label.append(footer)
+			yield "".join(label)
+
+	if stored:
+		yield f"^XA^IDR:{GRAPHIC_PREFIX}*.GRF^FS^XZ"
+
+
+def get_shared_rows(bitmaps):
+	"""Rows that are the same on every bitmap (none for a single label, which gains nothing from storing)"""
+	first = bitmaps[0]
+	shared = np.full(len(first), len(bitmaps) > 1)
+	for bitmap in bitmaps[1:]:
+		shared &= np.all(bitmap == first, axis=1)
+	return shared
+
+
+def iter_chunks(iterable, size):
+	chunk = []
+	for item in iterable:
+		chunk.append(item)
+		if len(chunk) == size:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+
+def get_raster_document_head(template_data):
+	from barcode.barcode.print_api import get_label_document_head
+
+	return hide_preview_border(get_label_document_head(template_data))
+
+
+def hide_preview_border(head):
+	# the screen border of the preview is not part of the label
+	return head.replace("</style>", ".label { border: none; }</style>", 1)
+
+
+def get_label_bitmap(html, width, height, dpi):
+	"""Label HTML as a 1-bit bitmap: uint8 array of `height` rows of packed dots (1 = black)
+
+	Bitmaps are kept in the rendered label cache, shared between workers when
+	its Redis tier is enabled.
+	"""
+	key = ("raster", width, height, dpi, hashlib.sha1(html.encode()).hexdigest())
+	return get_cached_output(key, lambda: pack_bitmap(render_html_image(html, width, dpi), width, height))
+
+
+def render_html_image(html, width, dpi):
+	"""Render an HTML document with wkhtmltoimage, scaled to `width` dots"""
+	from PIL import Image
+
+	executable = shutil.which("wkhtmltoimage")
+	if not executable:
+		frappe.throw(_("wkhtmltoimage is required to print HTML labels as graphics"))
+
+	zoom = dpi / CSS_DPI
+	result = subprocess.run(
+		[
+			executable,
+			"--quiet",
+			"--format",
+			"png",
+			"--disable-smart-width",
+			"--zoom",
+			f"{zoom:.4f}",
+			"--width",
+			str(width),
+			"-",
+			"-",
+		],
+		input=html.encode(),
+		capture_output=True,
+		timeout=RENDER_TIMEOUT,
+	)
+	if result.returncode or not result.stdout:
+		frappe.throw(_("Could not render the label: {0}").format(result.stderr.decode(errors="replace")))
+
+	image = Image.open(io.BytesIO(result.stdout)).convert("L")
+	if image.width != width:
+		image = image.resize((width, max(1, round(image.height * width / image.width))))
+	return image
+
+
+def pack_bitmap(image, width, height):
+	"""Threshold a greyscale image into packed rows of exactly `width` x `height` dots"""
+	pixels = np.full((height, width), 255, dtype=np.uint8)
+	source = np.asarray(image, dtype=np.uint8)[:height, :width]
+	pixels[: source.shape[0], : source.shape[1]] = source
+	# ZPL graphics use 1 for a black dot; packbits pads the last byte of a row with white
+	return np.packbits(pixels < THRESHOLD, axis=1)
+
+
+def iter_fields(bitmap, rows):
+	"""(top, bottom) row ranges of `bitmap` covering its inked rows among `rows`
+
+	Ranges are split at blank gaps longer than MAX_BLANK_GAP and at rows not in `rows`.
+	"""
+	selected = rows & bitmap.any(axis=1)
+	indexes = np.flatnonzero(selected)
+	if not len(indexes):
+		return
+
+	# a new field starts where the gap to the previous selected row is too long
+	# or crosses a row that is not in `rows`
+	allowed = np.concatenate(([0], np.cumsum(~rows)))
+	breaks = (np.diff(indexes) > MAX_BLANK_GAP + 1) | (allowed[indexes[1:]] != allowed[indexes[:-1]])
+	starts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+	ends = np.concatenate((starts[1:], [len(indexes)])) - 1
+	for start, end in zip(starts, ends, strict=True):
+		yield int(indexes[start]), int(indexes[end]) + 1
+
+
+def get_graphic(rows, compression):
+	"""(printer object name, 'total bytes,bytes per row,data') of packed rows, as ~DG and ^GF take them"""
+	key = hashlib.sha1(b"%d:%s:" % (rows.shape[1], compression.encode()) + rows.tobytes()).hexdigest()
+	graphic = _graphic_cache.get(key)
+	if graphic is None:
+		data = encode_z64(rows.tobytes()) if compression == "Z64" else encode_acs(rows)
+		graphic = (f"{GRAPHIC_PREFIX}{key[:7].upper()}", f"{rows.size},{rows.shape[1]},{data}")
+		_graphic_cache.set(key, graphic)
+	return graphic
+
+
+def encode_z64(data):
+	"""Zebra Z64: base64 of the deflated data and a CRC-16 (CCITT) of the base64 text"""
+	encoded = base64.b64encode(zlib.compress(data))
+	return f":Z64:{encoded.decode()}:{binascii.crc_hqx(encoded, 0):04X}"
+
+
+def encode_acs(rows):
+	"""Zebra ASCII compression of packed rows.
+
+	Repeated hex digits become a count prefix (G-Y = 1-19, g-z = 20-400), a row
+	equal to the previous one is ':' and trailing zeros / ones of a row are
+	',' / '!'.
+	"""
+	if not len(rows):
+		return ""
+
+	repeats = np.concatenate(([False], np.all(rows[1:] == rows[:-1], axis=1)))
+	lines = []
+	for row, repeated in zip(rows, repeats, strict=True):
+		if repeated:
+			lines.append(":")
+			continue
+
+		line = row.tobytes().hex().upper()
+		stripped = line.rstrip("0")
+		if len(stripped) < len(line):
+			suffix = ","
+		else:
+			stripped = line.rstrip("F")
+			suffix = "!" if len(stripped) < len(line) else ""
+		lines.append(_run_pattern.sub(compress_run, stripped) + suffix)
+	return "".join(lines)
+
+
+def compress_run(match):
+	return get_acs_count(len(match.group(0))) + match.group(1)
+
+
+def get_acs_count(count):
+	prefix = ""
+	while count > 400:
+		prefix += "z"
+		count -= 400
+	if count >= 20:
+		prefix += chr(ord("f") + count // 20)
+		count %= 20
+	if count:
+		prefix += chr(ord("F") + count)
+	return prefix
@@ -0,0 +1,123 @@
+import frappe
+from frappe import _
+
+SETTINGS_DOCTYPE = "Barcode Label Settings"
+# Redis keys shared by every gunicorn/RQ worker. Bumping the generation makes
+# all workers drop their in-memory snapshots.
+CACHE_GENERATION_KEY = "barcode_settings_cache_generation"
+SETTINGS_CACHE_KEY = "barcode_settings_snapshot"
+TEMPLATE_MAP_CACHE_KEY = "barcode_default_template_map"
+
+# Source doctype -> type of the templates its labels are printed with
+TEMPLATE_TYPE_MAP = {
+	"Item": "Item",
+	"Batch": "Batch",
+	"Serial No": "Serial No",
+	"Delivery Note": "General",
+}
+
+# Per worker snapshots and the generation they were read at, keyed by site
+_local_cache = {}
+_cache_generations = {}
+
+
+def get_settings():
+	"""Read-only snapshot of Barcode Label Settings, including the supported barcode types.
+
+	Served from this worker's memory, then Redis; the database is only read when
+	both are cold. Settings that were never saved resolve to the doctype defaults
+	without creating the Single.
+	"""
+	return get_cached(SETTINGS_CACHE_KEY, build_settings_snapshot)
+
+
+def get_setting(fieldname, default=None):
+	"""A single Barcode Label Settings value from the snapshot, `default` when unset"""
+	value = get_settings().get(fieldname)
+	return default if value is None else value
+
+
+def build_settings_snapshot():
+	settings = frappe.get_single(SETTINGS_DOCTYPE).as_dict(no_default_fields=True)
+	settings["supported_barcode_types"] = [
+		frappe._dict(row) for row in settings.get("supported_barcode_types") or []
+	]
+	return frappe._dict(settings)
+
+
+def get_default_template_map():
+	"""Template type -> its default Barcode Label Template (else the oldest one of that type)"""
+	return get_cached(TEMPLATE_MAP_CACHE_KEY, build_default_template_map)
+
+
+def build_default_template_map():
+	template_map = {}
+	templates = frappe.get_all(
+		"Barcode Label Template",
+		fields=["name", "template_type"],
+		order_by="is_default desc, creation asc",
+	)
+	for template in templates:
+		template_map.setdefault(template.template_type, template.name)
+	return template_map
+
+
+def get_default_template_name(doctype):
+	"""Default template for labels printed from `doctype`"""
+	template_type = TEMPLATE_TYPE_MAP.get(doctype, "General")
+	template = get_default_template_map().get(template_type)
+	if not template:
+		frappe.throw(_("No template found for {0}").format(template_type))
+	return template
+
+
+def get_cached(key, builder):
+	sync_cache_generation()
+
+	site_cache = _local_cache.setdefault(get_site(), {})
+	value = site_cache.get(key)
+	if value is None:
+		value = frappe.cache().get_value(key)
+		if value is None:
+			value = builder()
+			frappe.cache().set_value(key, value)
+		site_cache[key] = value
+	return value
+
+
+def sync_cache_generation():
+	"""Drop local snapshots when another worker has invalidated them (checked once per request/job)"""
+	if getattr(frappe.local, "barcode_settings_cache_synced", False):
+		return
+
+	frappe.local.barcode_settings_cache_synced = True
+	site = get_site()
+	generation = frappe.cache().get_value(CACHE_GENERATION_KEY)
+	if site not in _cache_generations or generation != _cache_generations[site]:
+		_local_cache.pop(site, None)
+		_cache_generations[site] = generation
+
+
+def clear_settings_cache():
+	"""Invalidate the settings snapshot and default template map in every worker
+
+	The shared snapshot is dropped once the current transaction commits;
+	dropping it earlier would let another worker cache the old rows again in
+	the meantime.
+	"""
+	_local_cache.pop(get_site(), None)
+	frappe.db.after_commit.add(invalidate_shared_cache)
+
+
+def invalidate_shared_cache():
+	site = get_site()
+	_local_cache.pop(site, None)
+	frappe.cache().delete_value([SETTINGS_CACHE_KEY, TEMPLATE_MAP_CACHE_KEY])
+
+	generation = frappe.generate_hash(length=12)
+	frappe.cache().set_value(CACHE_GENERATION_KEY, generation)
+	_cache_generations[site] = generation
+
+
+def get_site():
+	return getattr(frappe.local, "site", None)
@@ -0,0 +1,107 @@
+"""Native barcode encoders rendering inline SVG (and PNG for 2D symbols), so labels need no /barcode requests."""
+
+from math import isqrt
+
+from frappe.utils import cint
+
+from barcode.barcode.lru_cache import BoundedLRUCache
+from barcode.barcode.symbology.datamatrix import encode_datamatrix
+from barcode.barcode.symbology.linear import (
+	encode_code39,
+	encode_code128,
+	encode_ean8,
+	encode_ean13,
+	encode_upca,
+	get_human_readable,
+)
+from barcode.barcode.symbology.png import matrix_png
+from barcode.barcode.symbology.qr import encode_qr
+from barcode.barcode.symbology.svg import DATAMATRIX_QUIET_ZONE, QR_QUIET_ZONE, linear_svg, matrix_svg
+
+# Barcode Type Option name -> encoder returning a module string
+LINEAR_ENCODERS = {
+	"Code128": encode_code128,
+	"Code39": encode_code39,
+	"EAN-13": encode_ean13,
+	"EAN-8": encode_ean8,
+	"UPC-A": encode_upca,
+}
+
+# Barcode Type Option name -> encoder returning rows of booleans
+MATRIX_ENCODERS = {
+	"QR Code": encode_qr,
+	"Data Matrix": encode_datamatrix,
+}
+
+MATRIX_QUIET_ZONES = {
+	"QR Code": QR_QUIET_ZONE,
+	"Data Matrix": DATAMATRIX_QUIET_ZONE,
+}
+
+# Encoded 2D symbols are shared by the SVG, PNG, PDF and ZPL backends
+MATRIX_CACHE_BYTES = 1024 * 1024
+# a symbol is cached as one module string (a byte per module), plus about 150 bytes for the entry
+_matrix_cache = BoundedLRUCache(MATRIX_CACHE_BYTES, sizeof=lambda modules: len(modules) + 150)
+
+DEFAULT_WIDTH = 200
+DEFAULT_HEIGHT = 100
+
+
+def is_supported(symbology):
+	return symbology in LINEAR_ENCODERS or symbology in MATRIX_ENCODERS
+
+
+def render_barcode_svg(symbology, value, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT, show_text=True):
+	"""Encode `value` and return an inline SVG; raises ValueError for unsupported symbologies or data"""
+	width, height = cint(width) or DEFAULT_WIDTH, cint(height) or DEFAULT_HEIGHT
+
+	if symbology in MATRIX_ENCODERS:
+		return matrix_svg(get_matrix(symbology, value), width, height, MATRIX_QUIET_ZONES[symbology])
+
+	if symbology in LINEAR_ENCODERS:
+		modules = LINEAR_ENCODERS[symbology](value)
+		text = get_human_readable(symbology, value) if show_text else None
+		return linear_svg(modules, width, height, text)
+
+	raise ValueError(f"No native encoder for {symbology}")
+
+
+def get_matrix(symbology, value):
+	"""Module matrix of a 2D symbol as a tuple of "0"/"1" row strings, encoded once per worker
+
+	Raises ValueError like the encoders.
+	"""
+	key = (symbology, str(value))
+	modules = _matrix_cache.get(key)
+	if modules is None:
+		modules = "".join(
+			"1" if dark else "0" for row in MATRIX_ENCODERS[symbology](str(value)) for dark in row
+		)
+		_matrix_cache.set(key, modules)
+
+	# every supported 2D symbol is square
+	size = isqrt(len(modules))
+	return tuple(modules[i : i + size] for i in range(0, len(modules), size))
+
+
+def render_matrix_png(symbology, value, box_size=10):
+	"""1-bit PNG bytes of a 2D symbol with its quiet zone; raises ValueError like the encoders"""
+	return matrix_png(get_matrix(symbology, value), box_size, MATRIX_QUIET_ZONES[symbology])
+
+
+def get_barcode_svg(symbology, value, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT, show_text=True):
+	"""Cached inline SVG for a barcode, or None when it cannot be encoded natively"""
+	from barcode.barcode.image_cache import get_cached_image
+
+	if not value or not is_supported(symbology):
+		return None
+
+	def generate():
+		try:
+			return render_barcode_svg(symbology, value, width, height, show_text)
+		except ValueError:
+			# cached too, so invalid values are not re-encoded for every label
+			return ""
+
+	svg = get_cached_image(symbology, value, (cint(width), cint(height), bool(show_text)), "svg", generate)
+	return svg or None
@@ -0,0 +1,350 @@
+"""Pure-Python Data Matrix (ECC 200) encoder.
+
+`encode_datamatrix` returns the symbol as a list of rows of booleans
+(True = dark), finder and timing patterns included, without the quiet zone.
+Data is ASCII encoded (digit pairs in one codeword), which suits the mostly
+numeric GS1 element strings; GS1 data is written with FNC1 as the standard
+requires.
+"""
+
+import re
+
+# Square symbols: (size, data region size, data codewords, ECC codewords, interleaved blocks)
+SYMBOL_SIZES = (
+	(10, 8, 3, 5, 1),
+	(12, 10, 5, 7, 1),
+	(14, 12, 8, 10, 1),
+	(16, 14, 12, 12, 1),
+	(18, 16, 18, 14, 1),
+	(20, 18, 22, 18, 1),
+	(22, 20, 30, 20, 1),
+	(24, 22, 36, 24, 1),
+	(26, 24, 44, 28, 1),
+	(32, 14, 62, 36, 1),
+	(36, 16, 86, 42, 1),
+	(40, 18, 114, 48, 1),
+	(44, 20, 144, 56, 1),
+	(48, 22, 174, 68, 1),
+	(52, 24, 204, 84, 2),
+	(64, 14, 280, 112, 2),
+	(72, 16, 368, 144, 4),
+	(80, 18, 456, 192, 4),
+	(88, 20, 576, 224, 4),
+	(96, 22, 696, 272, 4),
+	(104, 24, 816, 336, 6),
+	(120, 18, 1050, 408, 6),
+	(132, 20, 1304, 496, 8),
+	(144, 22, 1558, 620, 10),
+)
+
+FNC1 = 232
+UPPER_SHIFT = 235
+PAD = 129
+ECI = 241
+# ECI 26 (UTF-8), written as the value plus one
+UTF8_ECI = 27
+# Group separator: ends a variable length GS1 field in scanner output, FNC1 in the symbol
+GS = "\x1d"
+
+# GS1 application identifiers (by their first two digits) whose data has a
+# predefined length, so no FNC1 separator follows them
+GS1_PREDEFINED_LENGTHS = {
+	"00": 18,
+	"01": 14,
+	"02": 14,
+	"03": 14,
+	"04": 16,
+	"11": 6,
+	"12": 6,
+	"13": 6,
+	"14": 6,
+	"15": 6,
+	"16": 6,
+	"17": 6,
+	"18": 6,
+	"19": 6,
+	"20": 2,
+	"31": 6,
+	"32": 6,
+	"33": 6,
+	"34": 6,
+	"35": 6,
+	"36": 6,
+	"41": 12,
+}
+GS1_FIELD = re.compile(r"\((\d{2,4})\)([^(]+)")
+
+# GF(256) with the Data Matrix polynomial x^8 + x^5 + x^3 + x^2 + 1
+GF_EXP = [0] * 512
+GF_LOG = [0] * 256
+
+
+def _build_gf_tables():
+	value = 1
+	for i in range(255):
+		GF_EXP[i] = value
+		GF_LOG[value] = i
+		value <<= 1
+		if value & 0x100:
+			value ^= 0x12D
+	for i in range(255, 512):
+		GF_EXP[i] = GF_EXP[i - 255]
+
+
+_build_gf_tables()
+
+_generators = {}
+
+
+def encode_datamatrix(value):
+	"""Data Matrix matrix for `value` in the smallest square symbol that fits
+
+	Values written as GS1 element strings, e.g. "(01)09501101530003(17)261231(10)AB12",
+	or starting with a group separator are encoded as GS1 Data Matrix.
+	"""
+	codewords = get_data_codewords(str(value))
+	for symbol in SYMBOL_SIZES:
+		if len(codewords) <= symbol[2]:
+			break
+	else:
+		raise ValueError("Value is too long for a Data Matrix")
+
+	size, region_size, data_length, ecc_length, blocks = symbol
+
+	codewords = pad_codewords(codewords, data_length)
+	codewords = add_ecc(codewords, ecc_length, blocks)
+	return build_matrix(size, region_size, codewords)
+
+
+def get_data_codewords(text):
+	"""ASCII encodation of `text`, GS1 element strings with a leading FNC1
+
+	Text outside Latin-1 is written as UTF-8 behind an ECI, as readers take
+	bytes for ISO-8859-1 otherwise.
+	"""
+	text = get_gs1_data(text)
+	gs1 = text.startswith(GS)
+
+	if all(ord(char) < 256 for char in text):
+		data = text.encode("latin-1")
+		codewords = []
+	else:
+		data = text.encode("utf-8")
+		# FNC1 must stay the first codeword of GS1 data
+		codewords = [] if gs1 else [ECI, UTF8_ECI]
+	i = 0
+	while i < len(data):
+		byte = data[i]
+		if 48 <= byte <= 57 and i + 1 < len(data) and 48 <= data[i + 1] <= 57:
+			codewords.append(130 + (byte - 48) * 10 + data[i + 1] - 48)
+			i += 2
+			continue
+		if gs1 and byte == 0x1D:
+			codewords.append(FNC1)
+		elif byte < 128:
+			codewords.append(byte + 1)
+		else:
+			codewords.extend((UPPER_SHIFT, byte - 127))
+		i += 1
+	return codewords
+
+
+def get_gs1_data(text):
+	"""`text` with a GS1 element string in brackets written as GS (FNC1) separated data"""
+	fields = parse_gs1(text)
+	if fields is None:
+		return text
+	# predefined length fields are not followed by a separator
+	return GS + "".join(
+		ai + data + ("" if index == len(fields) - 1 or ai[:2] in GS1_PREDEFINED_LENGTHS else GS)
+		for index, (ai, data) in enumerate(fields)
+	)
+
+
+def parse_gs1(text):
+	"""[(application identifier, data)] of a GS1 element string in brackets, None for other values"""
+	if not text.startswith("("):
+		return None
+	fields = GS1_FIELD.findall(text)
+	if not fields or "".join(f"({ai}){data}" for ai, data in fields) != text:
+		return None
+	return fields
+
+
+def pad_codewords(codewords, data_length):
+	"""Fill the symbol's data capacity: one plain pad, then pseudo-randomised pads"""
+	codewords = list(codewords)
+	if len(codewords) < data_length:
+		codewords.append(PAD)
+	while len(codewords) < data_length:
+		pad = PAD + (149 * (len(codewords) + 1)) % 253 + 1
+		codewords.append(pad - 254 if pad > 254 else pad)
+	return codewords
+
+
+def add_ecc(data, ecc_length, blocks):
+	"""Data codewords followed by the Reed-Solomon codewords, both interleaved over `blocks`"""
+	block_ecc_length = ecc_length // blocks
+	generator = get_rs_generator(block_ecc_length)
+	result = data + [0] * ecc_length
+	for block in range(blocks):
+		remainder = get_rs_remainder(data[block::blocks], generator)
+		for i, codeword in enumerate(remainder):
+			result[len(data) + block + i * blocks] = codeword
+	return result
+
+
+def get_rs_generator(degree):
+	"""Coefficients of (x - a^1)...(x - a^degree), highest power first with the leading 1 dropped"""
+	generator = _generators.get(degree)
+	if generator is None:
+		poly = [1]
+		for i in range(1, degree + 1):
+			root = GF_EXP[i]
+			poly = [
+				(poly[j] if j < len(poly) else 0) ^ (gf_multiply(poly[j - 1], root) if j else 0)
+				for j in range(len(poly) + 1)
+			]
+		generator = _generators[degree] = poly[1:]
+	return generator
+
+
+def gf_multiply(a, b):
+	if not a or not b:
+		return 0
+	return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+def get_rs_remainder(data, generator):
+	result = [0] * len(generator)
+	for byte in data:
+		factor = byte ^ result.pop(0)
+		result.append(0)
+		if factor:
+			for i, coefficient in enumerate(generator):
+				result[i] ^= gf_multiply(coefficient, factor)
+	return result
+
+
+def build_matrix(size, region_size, codewords):
+	regions = size // (region_size + 2)
+	mapping = place_codewords(size - 2 * regions, codewords)
+
+	modules = [[False] * size for _ in range(size)]
+	for y in range(size):
+		region_y = y % (region_size + 2)
+		for x in range(size):
+			region_x = x % (region_size + 2)
+			if region_x == 0 or region_y == region_size + 1:
+				# solid "L" finder on the left and bottom of every region
+				modules[y][x] = True
+			elif region_y == 0:
+				modules[y][x] = region_x % 2 == 0
+			elif region_x == region_size + 1:
+				modules[y][x] = region_y % 2 == 1
+			else:
+				row = y // (region_size + 2) * region_size + region_y - 1
+				column = x // (region_size + 2) * region_size + region_x - 1
+				modules[y][x] = mapping[row][column]
+	return modules
+
+
+def place_codewords(size, codewords):
+	"""Module values of the data area: codewords placed in the ECC 200 diagonal "utah" pattern"""
+	placed = [[None] * size for _ in range(size)]
+
+	def module(row, column, codeword, bit):
+		if row < 0:
+			row += size
+			column += 4 - (size + 4) % 8
+		if column < 0:
+			column += size
+			row += 4 - (size + 4) % 8
+		placed[row][column] = bool(codewords[codeword] >> (7 - bit) & 1)
+
+	def utah(row, column, codeword):
+		for bit, (dy, dx) in enumerate(
+			((-2, -2), (-2, -1), (-1, -2), (-1, -1), (-1, 0), (0, -2), (0, -1), (0, 0))
+		):
+			module(row + dy, column + dx, codeword, bit)
+
+	def corner(positions, codeword):
+		for bit, (row, column) in enumerate(positions):
+			module(row, column, codeword, bit)
+
+	last = size - 1
+	corners = {
+		1: ((last, 0), (last, 1), (last, 2), (0, last - 1), (0, last), (1, last), (2, last), (3, last)),
+		2: (
+			(last - 2, 0),
+			(last - 1, 0),
+			(last, 0),
+			(0, last - 3),
+			(0, last - 2),
+			(0, last - 1),
+			(0, last),
+			(1, last),
+		),
+		3: (
+			(last - 2, 0),
+			(last - 1, 0),
+			(last, 0),
+			(0, last - 1),
+			(0, last),
+			(1, last),
+			(2, last),
+			(3, last),
+		),
+		4: (
+			(last, 0),
+			(last, last),
+			(0, last - 2),
+			(0, last - 1),
+			(0, last),
+			(1, last - 2),
+			(1, last - 1),
+			(1, last),
+		),
+	}
+
+	codeword = 0
+	row, column = 4, 0
+	while row < size or column < size:
+		if row == size and column == 0:
+			corner(corners[1], codeword)
+			codeword += 1
+		if row == size - 2 and column == 0 and size % 4:
+			corner(corners[2], codeword)
+			codeword += 1
+		if row == size - 2 and column == 0 and size % 8 == 4:
+			corner(corners[3], codeword)
+			codeword += 1
+		if row == size + 4 and column == 2 and size % 8 == 0:
+			corner(corners[4], codeword)
+			codeword += 1
+
+		# up and to the right
+		while True:
+			if row < size and column >= 0 and placed[row][column] is None:
+				utah(row, column, codeword)
+				codeword += 1
+			row, column = row - 2, column + 2
+			if row < 0 or column >= size:
+				break
+		row, column = row + 1, column + 3
+
+		# down and to the left
+		while True:
+			if row >= 0 and column < size and placed[row][column] is None:
+				utah(row, column, codeword)
+				codeword += 1
+			row, column = row + 2, column - 2
+			if row >= size or column < 0:
+				break
+		row, column = row + 3, column + 1
+
+	if placed[last][last] is None:
+		# the fixed pattern filling the unused corner of some sizes
+		placed[last][last] = placed[last - 1][last - 1] = True
+		placed[last][last - 1] = placed[last - 1][last] = False
+	return placed
@@ -0,0 +1,361 @@
+"""Pure-Python encoders for linear symbologies.
+
+Every encoder returns the symbol as a string of modules, "1" for a bar module
+and "0" for a space module, without quiet zones.
+"""
+
+# Bar/space widths of the 107 Code 128 symbols, indexed by symbol value
+CODE128_PATTERNS = (
+	"212222",
+	"222122",
+	"222221",
+	"121223",
+	"121322",
+	"131222",
+	"122213",
+	"122312",
+	"132212",
+	"221213",
+	"221312",
+	"231212",
+	"112232",
+	"122132",
+	"122231",
+	"113222",
+	"123122",
+	"123221",
+	"223211",
+	"221132",
+	"221231",
+	"213212",
+	"223112",
+	"312131",
+	"311222",
+	"321122",
+	"321221",
+	"312212",
+	"322112",
+	"322211",
+	"212123",
+	"212321",
+	"232121",
+	"111323",
+	"131123",
+	"131321",
+	"112313",
+	"132113",
+	"132311",
+	"211313",
+	"231113",
+	"231311",
+	"112133",
+	"112331",
+	"132131",
+	"113123",
+	"113321",
+	"133121",
+	"313121",
+	"211331",
+	"231131",
+	"213113",
+	"213311",
+	"213131",
+	"311123",
+	"311321",
+	"331121",
+	"312113",
+	"312311",
+	"332111",
+	"314111",
+	"221411",
+	"431111",
+	"111224",
+	"111422",
+	"121124",
+	"121421",
+	"141122",
+	"141221",
+	"112214",
+	"112412",
+	"122114",
+	"122411",
+	"142112",
+	"142211",
+	"241211",
+	"221114",
+	"413111",
+	"241112",
+	"134111",
+	"111242",
+	"121142",
+	"121241",
+	"114212",
+	"124112",
+	"124211",
+	"411212",
+	"421112",
+	"421211",
+	"212141",
+	"214121",
+	"412121",
+	"111143",
+	"111341",
+	"131141",
+	"114113",
+	"114311",
+	"411113",
+	"411311",
+	"113141",
+	"114131",
+	"311141",
+	"411131",
+	"211412",
+	"211214",
+	"211232",
+	"2331112",
+)
+
+CODE128_START = {"A": 103, "B": 104, "C": 105}
+CODE128_SWITCH = {"A": 101, "B": 100, "C": 99}
+CODE128_SHIFT = 98
+CODE128_STOP = 106
+
+# Code 39 narrow (n) / wide (w) elements per character, alternating bar and space
+CODE39_PATTERNS = {
+	"0": "nnnwwnwnn",
+	"1": "wnnwnnnnw",
+	"2": "nnwwnnnnw",
+	"3": "wnwwnnnnn",
+	"4": "nnnwwnnnw",
+	"5": "wnnwwnnnn",
+	"6": "nnwwwnnnn",
+	"7": "nnnwnnwnw",
+	"8": "wnnwnnwnn",
+	"9": "nnwwnnwnn",
+	"A": "wnnnnwnnw",
+	"B": "nnwnnwnnw",
+	"C": "wnwnnwnnn",
+	"D": "nnnnwwnnw",
+	"E": "wnnnwwnnn",
+	"F": "nnwnwwnnn",
+	"G": "nnnnnwwnw",
+	"H": "wnnnnwwnn",
+	"I": "nnwnnwwnn",
+	"J": "nnnnwwwnn",
+	"K": "wnnnnnnww",
+	"L": "nnwnnnnww",
+	"M": "wnwnnnnwn",
+	"N": "nnnnwnnww",
+	"O": "wnnnwnnwn",
+	"P": "nnwnwnnwn",
+	"Q": "nnnnnnwww",
+	"R": "wnnnnnwwn",
+	"S": "nnwnnnwwn",
+	"T": "nnnnwnwwn",
+	"U": "wwnnnnnnw",
+	"V": "nwwnnnnnw",
+	"W": "wwwnnnnnn",
+	"X": "nwnnwnnnw",
+	"Y": "wwnnwnnnn",
+	"Z": "nwwnwnnnn",
+	"-": "nwnnnnwnw",
+	".": "wwnnnnwnn",
+	" ": "nwwnnnwnn",
+	"$": "nwnwnwnnn",
+	"/": "nwnwnnnwn",
+	"+": "nwnnnwnwn",
+	"%": "nnnwnwnwn",
+	"*": "nwnnwnwnn",
+}
+CODE39_WIDE = 3
+
+EAN_L = (
+	"0001101",
+	"0011001",
+	"0010011",
+	"0111101",
+	"0100011",
+	"0110001",
+	"0101111",
+	"0111011",
+	"0110111",
+	"0001011",
+)
+EAN_R = tuple("".join("1" if bit == "0" else "0" for bit in code) for code in EAN_L)
+EAN_G = tuple(code[::-1] for code in EAN_R)
+EAN13_PARITY = (
+	"LLLLLL",
+	"LLGLGG",
+	"LLGGLG",
+	"LLGGGL",
+	"LGLLGG",
+	"LGGLLG",
+	"LGGGLL",
+	"LGLGLG",
+	"LGLGGL",
+	"LGGLGL",
+)
+
+
+def widths_to_modules(widths):
+	"""Expand alternating bar/space widths (starting with a bar) into modules"""
+	return "".join(("1" if i % 2 == 0 else "0") * int(width) for i, width in enumerate(widths))
+
+
+CODE128_MODULES = tuple(widths_to_modules(pattern) for pattern in CODE128_PATTERNS)
+
+
+def encode_code128(value):
+	"""Code 128 with automatic A/B/C code set selection (shortest symbol)"""
+	value = str(value)
+	if not value:
+		raise ValueError("Code 128 needs at least one character")
+	if any(ord(char) > 127 for char in value):
+		raise ValueError("Code 128 supports ASCII characters only")
+
+	codes = code128_codewords(value)
+	checksum = (codes[0] + sum(i * code for i, code in enumerate(codes[1:], 1))) % 103
+	return "".join(CODE128_MODULES[code] for code in [*codes, checksum, CODE128_STOP])
+
+
+def code128_codewords(value):
+	"""Symbol values (start code included, checksum excluded) using the fewest codewords"""
+	n = len(value)
+	sets = ("A", "B", "C")
+	infinity = float("inf")
+
+	def fits(code_set, char):
+		code = ord(char)
+		return code < 96 if code_set == "A" else 32 <= code < 128
+
+	def is_digit_pair(i):
+		return i + 1 < n and value[i].isdigit() and value[i + 1].isdigit()
+
+	# cost[i][set]: codewords needed to encode value[i:] when currently in `set`
+	cost = [dict.fromkeys(sets, infinity) for _ in range(n + 1)]
+	step = [dict.fromkeys(sets) for _ in range(n + 1)]
+	cost[n] = dict.fromkeys(sets, 0)
+
+	for i in range(n - 1, -1, -1):
+		stay = dict.fromkeys(sets, infinity)
+		stay_step = dict.fromkeys(sets)
+		for code_set in sets:
+			if code_set == "C":
+				if is_digit_pair(i):
+					stay["C"], stay_step["C"] = 1 + cost[i + 2]["C"], ("pair",)
+				continue
+
+			if fits(code_set, value[i]):
+				stay[code_set], stay_step[code_set] = 1 + cost[i + 1][code_set], ("char",)
+			else:
+				other = "B" if code_set == "A" else "A"
+				if fits(other, value[i]):
+					stay[code_set], stay_step[code_set] = 2 + cost[i + 1][code_set], ("shift",)
+
+		for code_set in sets:
+			cost[i][code_set], step[i][code_set] = stay[code_set], stay_step[code_set]
+			for target in sets:
+				if target != code_set and 1 + stay[target] < cost[i][code_set]:
+					cost[i][code_set], step[i][code_set] = 1 + stay[target], ("switch", target)
+
+	code_set = min(sets, key=lambda s: cost[0][s] if step[0][s] and step[0][s][0] != "switch" else infinity)
+	codes = [CODE128_START[code_set]]
+
+	i = 0
+	while i < n:
+		action = step[i][code_set]
+		if action[0] == "switch":
+			code_set = action[1]
+			codes.append(CODE128_SWITCH[code_set])
+			action = step[i][code_set]
+			if action[0] == "switch":
+				raise ValueError("Cannot encode value in Code 128")
+
+		if action[0] == "pair":
+			codes.append(int(value[i : i + 2]))
+			i += 2
+		elif action[0] == "shift":
+			codes.append(CODE128_SHIFT)
+			codes.append(code128_char_value("B" if code_set == "A" else "A", value[i]))
+			i += 1
+		else:
+			codes.append(code128_char_value(code_set, value[i]))
+			i += 1
+
+	return codes
+
+
+def code128_char_value(code_set, char):
+	code = ord(char)
+	if code_set == "A" and code < 32:
+		return code + 64
+	return code - 32
+
+
+def encode_code39(value):
+	"""Code 39 with * start/stop characters"""
+	value = str(value).upper()
+	if not value or any(char not in CODE39_PATTERNS or char == "*" for char in value):
+		raise ValueError("Code 39 supports 0-9, A-Z, space and - . $ / + %")
+
+	symbols = []
+	for char in f"*{value}*":
+		widths = [CODE39_WIDE if element == "w" else 1 for element in CODE39_PATTERNS[char]]
+		symbols.append(widths_to_modules(widths))
+
+	# characters are separated by a narrow space
+	return "0".join(symbols)
+
+
+def ean_checksum(digits):
+	"""Check digit for EAN/UPC data digits"""
+	total = sum(int(digit) * (3 if i % 2 == 0 else 1) for i, digit in enumerate(reversed(digits)))
+	return str((10 - total % 10) % 10)
+
+
+def normalize_ean(value, length):
+	value = str(value).strip()
+	if not value.isdigit() or len(value) not in (length - 1, length):
+		raise ValueError(f"Value must be {length - 1} or {length} digits")
+
+	if len(value) == length - 1:
+		return value + ean_checksum(value)
+	if ean_checksum(value[:-1]) != value[-1]:
+		raise ValueError("Invalid check digit")
+	return value
+
+
+def encode_ean13(value):
+	"""EAN-13 from 12 digits (check digit added) or 13 digits (check digit verified)"""
+	value = normalize_ean(value, 13)
+	parity = EAN13_PARITY[int(value[0])]
+	left = "".join((EAN_L if parity[i] == "L" else EAN_G)[int(digit)] for i, digit in enumerate(value[1:7]))
+	right = "".join(EAN_R[int(digit)] for digit in value[7:])
+	return f"101{left}01010{right}101"
+
+
+def encode_ean8(value):
+	"""EAN-8 from 7 or 8 digits"""
+	value = normalize_ean(value, 8)
+	left = "".join(EAN_L[int(digit)] for digit in value[:4])
+	right = "".join(EAN_R[int(digit)] for digit in value[4:])
+	return f"101{left}01010{right}101"
+
+
+def encode_upca(value):
+	"""UPC-A from 11 or 12 digits (an EAN-13 with a leading zero)"""
+	value = normalize_ean(value, 12)
+	return encode_ean13("0" + value)
+
+
+def get_human_readable(symbology, value):
+	"""Text printed under the bars"""
+	if symbology == "EAN-13":
+		return normalize_ean(value, 13)
+	if symbology == "EAN-8":
+		return normalize_ean(value, 8)
+	if symbology == "UPC-A":
+		return normalize_ean(value, 12)
+	if symbology == "Code39":
+		return str(value).upper()
+	return str(value)
@@ -0,0 +1,43 @@
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def matrix_png(matrix, box_size, quiet_zone):
+	"""1-bit grayscale PNG of a 2D symbol given as "0"/"1" row strings, `box_size` pixels per module
+
+	Written directly (no imaging library): one bit per pixel and identical
+	scanlines repeated per module row, so it deflates to a few hundred bytes.
+	"""
+	box_size = max(1, int(box_size))
+	modules = len(matrix) + 2 * quiet_zone
+	pixels = modules * box_size
+	row_bytes = (pixels + 7) // 8
+	padding = row_bytes * 8 - pixels
+
+	# a set bit is white in a grayscale image
+	light_row = b"\x00" + ((1 << row_bytes * 8) - 1).to_bytes(row_bytes, "big")
+	border = light_row * (quiet_zone * box_size)
+	# module "1" (dark) -> box_size black pixels, "0" -> white ones
+	pixels_of = str.maketrans({"1": "0" * box_size, "0": "1" * box_size})
+	margin = "1" * (quiet_zone * box_size)
+
+	scanlines = [border]
+	for row in matrix:
+		bits = margin + row.translate(pixels_of) + margin + "1" * padding
+		scanlines.append((b"\x00" + int(bits, 2).to_bytes(row_bytes, "big")) * box_size)
+	scanlines.append(border)
+
+	return b"".join(
+		(
+			PNG_SIGNATURE,
+			get_chunk(b"IHDR", struct.pack(">IIBBBBB", pixels, pixels, 1, 0, 0, 0, 0)),
+			get_chunk(b"IDAT", zlib.compress(b"".join(scanlines), 9)),
+			get_chunk(b"IEND", b""),
+		)
+	)
+
+
+def get_chunk(chunk_type, data):
+	return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
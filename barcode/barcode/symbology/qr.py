@@ -0,0 +1,770 @@
+"""Pure-Python QR Code (model 2) encoder.
+
+`encode_qr` returns the symbol as a list of rows of booleans (True = dark),
+without the quiet zone.
+"""
+
+import itertools
+import re
+
+# Error correction level -> format information bits
+ECC_FORMAT_BITS = {"L": 1, "M": 0, "Q": 3, "H": 2}
+
+# Error correction codewords per block, indexed by [level][version]
+ECC_CODEWORDS_PER_BLOCK = {
+	"L": (
+		-1,
+		7,
+		10,
+		15,
+		20,
+		26,
+		18,
+		20,
+		24,
+		30,
+		18,
+		20,
+		24,
+		26,
+		30,
+		22,
+		24,
+		28,
+		30,
+		28,
+		28,
+		28,
+		28,
+		30,
+		30,
+		26,
+		28,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+	),
+	"M": (
+		-1,
+		10,
+		16,
+		26,
+		18,
+		24,
+		16,
+		18,
+		22,
+		22,
+		26,
+		30,
+		22,
+		22,
+		24,
+		24,
+		28,
+		28,
+		26,
+		26,
+		26,
+		26,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+		28,
+	),
+	"Q": (
+		-1,
+		13,
+		22,
+		18,
+		26,
+		18,
+		24,
+		18,
+		22,
+		20,
+		24,
+		28,
+		26,
+		24,
+		20,
+		30,
+		24,
+		28,
+		28,
+		26,
+		30,
+		28,
+		30,
+		30,
+		30,
+		30,
+		28,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+	),
+	"H": (
+		-1,
+		17,
+		28,
+		22,
+		16,
+		22,
+		28,
+		26,
+		26,
+		24,
+		28,
+		24,
+		28,
+		22,
+		24,
+		24,
+		30,
+		28,
+		28,
+		26,
+		28,
+		30,
+		24,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+		30,
+	),
+}
+
+# Number of error correction blocks, indexed by [level][version]
+ECC_BLOCKS = {
+	"L": (
+		-1,
+		1,
+		1,
+		1,
+		1,
+		1,
+		2,
+		2,
+		2,
+		2,
+		4,
+		4,
+		4,
+		4,
+		4,
+		6,
+		6,
+		6,
+		6,
+		7,
+		8,
+		8,
+		9,
+		9,
+		10,
+		12,
+		12,
+		12,
+		13,
+		14,
+		15,
+		16,
+		17,
+		18,
+		19,
+		19,
+		20,
+		21,
+		22,
+		24,
+		25,
+	),
+	"M": (
+		-1,
+		1,
+		1,
+		1,
+		2,
+		2,
+		4,
+		4,
+		4,
+		5,
+		5,
+		5,
+		8,
+		9,
+		9,
+		10,
+		10,
+		11,
+		13,
+		14,
+		16,
+		17,
+		17,
+		18,
+		20,
+		21,
+		23,
+		25,
+		26,
+		28,
+		29,
+		31,
+		33,
+		35,
+		37,
+		38,
+		40,
+		43,
+		45,
+		47,
+		49,
+	),
+	"Q": (
+		-1,
+		1,
+		1,
+		2,
+		2,
+		4,
+		4,
+		6,
+		6,
+		8,
+		8,
+		8,
+		10,
+		12,
+		16,
+		12,
+		17,
+		16,
+		18,
+		21,
+		20,
+		23,
+		23,
+		25,
+		27,
+		29,
+		34,
+		34,
+		35,
+		38,
+		40,
+		43,
+		45,
+		48,
+		51,
+		53,
+		56,
+		59,
+		62,
+		65,
+		68,
+	),
+	"H": (
+		-1,
+		1,
+		1,
+		2,
+		4,
+		4,
+		4,
+		5,
+		6,
+		8,
+		8,
+		11,
+		11,
+		16,
+		16,
+		18,
+		16,
+		19,
+		21,
+		25,
+		25,
+		25,
+		34,
+		30,
+		32,
+		35,
+		37,
+		40,
+		42,
+		45,
+		48,
+		51,
+		54,
+		57,
+		60,
+		63,
+		66,
+		70,
+		74,
+		77,
+		81,
+	),
+}
+
+# Automatic level selection: the lowest level used, and the levels tried on top
+# of it when the data leaves room in the chosen version
+AUTO_MIN_ECC = "M"
+AUTO_BOOST_ECC = ("Q", "H")
+
+ALPHANUMERIC_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+ALPHANUMERIC_VALUES = {char: i for i, char in enumerate(ALPHANUMERIC_CHARSET)}
+ALPHANUMERIC_TEXT = re.compile(r"[0-9A-Z $%*+\-./:]+")
+
+# Mode -> (mode indicator, character count bits for versions 1-9, 10-26, 27-40)
+MODES = {
+	"numeric": (0x1, (10, 12, 14)),
+	"alphanumeric": (0x2, (9, 11, 13)),
+	"byte": (0x4, (8, 16, 16)),
+}
+# ECI designator for UTF-8, written before byte data outside ASCII: readers
+# assume ISO-8859-1 otherwise. It takes the ECI mode indicator and one byte.
+ECI_MODE = 0x7
+UTF8_ECI = 26
+ECI_BITS = 12
+
+MASKS = (
+	lambda x, y: (x + y) % 2 == 0,
+	lambda x, y: y % 2 == 0,
+	lambda x, y: x % 3 == 0,
+	lambda x, y: (x + y) % 3 == 0,
+	lambda x, y: (x // 3 + y // 2) % 2 == 0,
+	lambda x, y: x * y % 2 + x * y % 3 == 0,
+	lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+	lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+)
+
+PENALTY_N1, PENALTY_N2, PENALTY_N3, PENALTY_N4 = 3, 3, 40, 10
+SAME_COLOR_RUN = re.compile(r"0{5,}|1{5,}")
+# dark-light-dark-dark-dark-light-dark with four light modules on either side
+FINDER_LIKE = re.compile(r"(?=00001011101|10111010000)")
+
+# GF(256) with the QR polynomial x^8 + x^4 + x^3 + x^2 + 1
+GF_EXP = [0] * 512
+GF_LOG = [0] * 256
+
+
+def _build_gf_tables():
+	value = 1
+	for i in range(255):
+		GF_EXP[i] = value
+		GF_LOG[value] = i
+		value <<= 1
+		if value & 0x100:
+			value ^= 0x11D
+	for i in range(255, 512):
+		GF_EXP[i] = GF_EXP[i - 255]
+
+
+_build_gf_tables()
+
+_divisors = {}
+_mask_positions = {}
+
+
+def gf_multiply(a, b):
+	if not a or not b:
+		return 0
+	return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+def get_rs_divisor(degree):
+	"""Reed-Solomon generator polynomial coefficients (highest power first, leading 1 dropped)"""
+	divisor = _divisors.get(degree)
+	if divisor is None:
+		divisor = [0] * (degree - 1) + [1]
+		root = 1
+		for _i in range(degree):
+			for j in range(degree):
+				divisor[j] = gf_multiply(divisor[j], root)
+				if j + 1 < degree:
+					divisor[j] ^= divisor[j + 1]
+			root = gf_multiply(root, 0x02)
+		_divisors[degree] = divisor
+	return divisor
+
+
+def get_rs_remainder(data, divisor):
+	result = [0] * len(divisor)
+	for byte in data:
+		factor = byte ^ result.pop(0)
+		result.append(0)
+		if factor:
+			for i, coefficient in enumerate(divisor):
+				result[i] ^= gf_multiply(coefficient, factor)
+	return result
+
+
+def encode_qr(value, ecc=None, mask=None):
+	"""QR Code matrix for `value` in the smallest version that fits
+
+	Without `ecc` the level is chosen automatically: the smallest version
+	fitting at level M, then the highest level that still fits that version.
+	"""
+	text = str(value)
+	version, ecc = select_version(text, ecc)
+	bits = get_data_bits(*get_segment(text), version, needs_eci(text))
+	codewords = add_ecc_and_interleave(pad_data_bits(bits, get_data_codewords(version, ecc)), version, ecc)
+	return build_matrix(version, ecc, codewords, mask)
+
+
+def select_version(text, ecc=None):
+	"""(version, ECC level) of the smallest symbol holding `text`, from the length of its data alone"""
+	if ecc is not None and ecc not in ECC_FORMAT_BITS:
+		raise ValueError(f"Unknown QR error correction level {ecc}")
+
+	mode, char_count = get_mode(text)
+	payload_length = get_payload_length(mode, char_count)
+	for version in range(1, 41):
+		count_bits = get_count_bits(mode, version)
+		length = 4 + count_bits + payload_length + (ECI_BITS if needs_eci(text) else 0)
+		if char_count < 1 << count_bits and length <= get_data_codewords(version, ecc or AUTO_MIN_ECC) * 8:
+			break
+	else:
+		raise ValueError("Value is too long for a QR Code")
+
+	if ecc is None:
+		ecc = AUTO_MIN_ECC
+		for level in AUTO_BOOST_ECC:
+			if length <= get_data_codewords(version, level) * 8:
+				ecc = level
+	return version, ecc
+
+
+def get_mode(text):
+	"""The most compact single mode for `text` and its character count"""
+	if text.isdigit() and text.isascii():
+		return "numeric", len(text)
+	if ALPHANUMERIC_TEXT.fullmatch(text):
+		return "alphanumeric", len(text)
+	return "byte", len(text.encode("utf-8"))
+
+
+def needs_eci(text):
+	"""Whether `text` is byte mode data that needs the UTF-8 ECI"""
+	return not text.isascii()
+
+
+def get_payload_length(mode, char_count):
+	if mode == "numeric":
+		return char_count // 3 * 10 + (0, 4, 7)[char_count % 3]
+	if mode == "alphanumeric":
+		return char_count // 2 * 11 + char_count % 2 * 6
+	return char_count * 8
+
+
+def get_segment(text):
+	"""(mode, payload bits, character count) of `text` in its most compact single mode"""
+	mode, char_count = get_mode(text)
+	bits = []
+	if mode == "numeric":
+		for i in range(0, len(text), 3):
+			chunk = text[i : i + 3]
+			append_bits(bits, int(chunk), len(chunk) * 3 + 1)
+	elif mode == "alphanumeric":
+		for i in range(0, len(text) - 1, 2):
+			append_bits(bits, ALPHANUMERIC_VALUES[text[i]] * 45 + ALPHANUMERIC_VALUES[text[i + 1]], 11)
+		if len(text) % 2:
+			append_bits(bits, ALPHANUMERIC_VALUES[text[-1]], 6)
+	else:
+		for byte in text.encode("utf-8"):
+			append_bits(bits, byte, 8)
+	return mode, bits, char_count
+
+
+def get_count_bits(mode, version):
+	return MODES[mode][1][0 if version <= 9 else 1 if version <= 26 else 2]
+
+
+def get_data_bits(mode, payload, char_count, version, eci=False):
+	count_bits = get_count_bits(mode, version)
+	bits = []
+	if eci:
+		append_bits(bits, ECI_MODE, 4)
+		append_bits(bits, UTF8_ECI, 8)
+	append_bits(bits, MODES[mode][0], 4)
+	append_bits(bits, char_count, count_bits)
+	bits.extend(payload)
+	return bits
+
+
+def pad_data_bits(bits, data_codewords):
+	capacity = data_codewords * 8
+	bits = bits + [0] * min(4, capacity - len(bits))
+	bits += [0] * (-len(bits) % 8)
+
+	codewords = [int("".join(map(str, bits[i : i + 8])), 2) for i in range(0, len(bits), 8)]
+	pad = 0xEC
+	while len(codewords) < data_codewords:
+		codewords.append(pad)
+		pad ^= 0xEC ^ 0x11
+	return codewords
+
+
+def append_bits(bits, value, length):
+	bits.extend((value >> i) & 1 for i in range(length - 1, -1, -1))
+
+
+def get_raw_data_modules(version):
+	"""Modules available for data and ECC codewords once function patterns are placed"""
+	result = (16 * version + 128) * version + 64
+	if version >= 2:
+		alignments = version // 7 + 2
+		result -= (25 * alignments - 10) * alignments - 55
+		if version >= 7:
+			result -= 36
+	return result
+
+
+def get_data_codewords(version, ecc):
+	return (
+		get_raw_data_modules(version) // 8 - ECC_CODEWORDS_PER_BLOCK[ecc][version] * ECC_BLOCKS[ecc][version]
+	)
+
+
+def add_ecc_and_interleave(data, version, ecc):
+	block_count = ECC_BLOCKS[ecc][version]
+	block_ecc_length = ECC_CODEWORDS_PER_BLOCK[ecc][version]
+	raw_codewords = get_raw_data_modules(version) // 8
+	short_blocks = block_count - raw_codewords % block_count
+	short_block_length = raw_codewords // block_count
+	divisor = get_rs_divisor(block_ecc_length)
+
+	blocks = []
+	start = 0
+	for i in range(block_count):
+		length = short_block_length - block_ecc_length + (0 if i < short_blocks else 1)
+		block = data[start : start + length]
+		start += length
+		ecc_codewords = get_rs_remainder(block, divisor)
+		if i < short_blocks:
+			# placeholder so every block has the same length while interleaving
+			block.append(0)
+		blocks.append(block + ecc_codewords)
+
+	result = []
+	for i in range(len(blocks[0])):
+		for j, block in enumerate(blocks):
+			if i != short_block_length - block_ecc_length or j >= short_blocks:
+				result.append(block[i])
+	return result
+
+
+def get_alignment_positions(version):
+	if version == 1:
+		return []
+	count = version // 7 + 2
+	size = version * 4 + 17
+	step = (version * 8 + count * 3 + 5) // (count * 4 - 4) * 2
+	return [6] + [size - 7 - i * step for i in range(count - 2, -1, -1)]
+
+
+def build_matrix(version, ecc, codewords, mask=None):
+	size = version * 4 + 17
+	modules = [[False] * size for _ in range(size)]
+	is_function = [[False] * size for _ in range(size)]
+
+	def set_function(x, y, dark):
+		modules[y][x] = dark
+		is_function[y][x] = True
+
+	# Timing patterns
+	for i in range(size):
+		set_function(6, i, i % 2 == 0)
+		set_function(i, 6, i % 2 == 0)
+
+	# Finder patterns with their separators
+	for cx, cy in ((3, 3), (size - 4, 3), (3, size - 4)):
+		for dy in range(-4, 5):
+			for dx in range(-4, 5):
+				x, y = cx + dx, cy + dy
+				if 0 <= x < size and 0 <= y < size:
+					set_function(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+
+	positions = get_alignment_positions(version)
+	last = len(positions) - 1
+	for i, cx in enumerate(positions):
+		for j, cy in enumerate(positions):
+			if (i, j) in ((0, 0), (0, last), (last, 0)):
+				continue
+			for dy in range(-2, 3):
+				for dx in range(-2, 3):
+					set_function(cx + dx, cy + dy, max(abs(dx), abs(dy)) != 1)
+
+	# Reserve the format areas before placing data
+	draw_format_bits(set_function, size, ecc, 0)
+	if version >= 7:
+		draw_version_bits(set_function, size, version)
+
+	# Data codewords in the two-column zigzag, bottom-right first
+	bit_index = 0
+	total_bits = len(codewords) * 8
+	right = size - 1
+	while right >= 1:
+		if right == 6:
+			right = 5
+		upward = (right + 1) & 2 == 0
+		for vertical in range(size):
+			y = size - 1 - vertical if upward else vertical
+			for x in (right, right - 1):
+				if not is_function[y][x] and bit_index < total_bits:
+					modules[y][x] = bool((codewords[bit_index >> 3] >> (7 - (bit_index & 7))) & 1)
+					bit_index += 1
+		right -= 2
+
+	if mask is None:
+		best_penalty = None
+		for candidate in range(8):
+			apply_mask(modules, is_function, candidate)
+			draw_format_bits(set_function, size, ecc, candidate)
+			penalty = get_penalty_score(modules)
+			if best_penalty is None or penalty < best_penalty:
+				mask, best_penalty = candidate, penalty
+			# masks are XORs, so applying it again undoes it
+			apply_mask(modules, is_function, candidate)
+
+	apply_mask(modules, is_function, mask)
+	draw_format_bits(set_function, size, ecc, mask)
+	return modules
+
+
+def apply_mask(modules, is_function, mask):
+	# the masked data modules only depend on the version, so they are worked out once
+	key = (len(modules), mask)
+	positions = _mask_positions.get(key)
+	if positions is None:
+		condition = MASKS[mask]
+		positions = _mask_positions[key] = [
+			(y, [x for x, function in enumerate(function_row) if not function and condition(x, y)])
+			for y, function_row in enumerate(is_function)
+		]
+	for y, columns in positions:
+		row = modules[y]
+		for x in columns:
+			row[x] = not row[x]
+
+
+def draw_format_bits(set_function, size, ecc, mask):
+	data = ECC_FORMAT_BITS[ecc] << 3 | mask
+	remainder = data
+	for _i in range(10):
+		remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+	bits = (data << 10 | remainder) ^ 0x5412
+
+	def bit(i):
+		return bool((bits >> i) & 1)
+
+	for i in range(6):
+		set_function(8, i, bit(i))
+	set_function(8, 7, bit(6))
+	set_function(8, 8, bit(7))
+	set_function(7, 8, bit(8))
+	for i in range(9, 15):
+		set_function(14 - i, 8, bit(i))
+
+	for i in range(8):
+		set_function(size - 1 - i, 8, bit(i))
+	for i in range(8, 15):
+		set_function(8, size - 15 + i, bit(i))
+	set_function(8, size - 8, True)
+
+
+def draw_version_bits(set_function, size, version):
+	remainder = version
+	for _i in range(12):
+		remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+	bits = version << 12 | remainder
+
+	for i in range(18):
+		dark = bool((bits >> i) & 1)
+		a, b = size - 11 + i % 3, i // 3
+		set_function(a, b, dark)
+		set_function(b, a, dark)
+
+
+def get_penalty_score(modules):
+	"""Mask penalty, scored on "0"/"1" strings of the rows and columns"""
+	size = len(modules)
+	rows = ["".join("1" if dark else "0" for dark in row) for row in modules]
+	result = sum(get_line_penalty(line) for line in rows)
+	result += sum(get_line_penalty("".join(column)) for column in zip(*rows, strict=True))
+
+	# 2x2 blocks of one color: bit x is set where a row pair agrees in columns x and x + 1
+	pair_mask = (1 << (size - 1)) - 1
+	for upper, lower in itertools.pairwise(rows):
+		a = int(upper, 2)
+		same = ~(a ^ int(lower, 2))
+		blocks = same & (same >> 1) & ~(a ^ (a >> 1)) & pair_mask
+		result += bin(blocks).count("1") * PENALTY_N2
+
+	dark = sum(row.count("1") for row in rows)
+	total = size * size
+	k = (abs(dark * 20 - total * 10) + total - 1) // total - 1
+	return result + k * PENALTY_N4
+
+
+def get_line_penalty(line):
+	"""Penalty for runs of same-colored modules and finder-like patterns in one row/column"""
+	result = sum(len(run) - 5 + PENALTY_N1 for run in SAME_COLOR_RUN.findall(line))
+	# the light border outside the symbol counts as light modules
+	return result + len(FINDER_LIKE.findall(f"0000{line}0000")) * PENALTY_N3
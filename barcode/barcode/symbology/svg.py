@@ -0,0 +1,90 @@
+from html import escape
+
+LINEAR_QUIET_ZONE = 10
+QR_QUIET_ZONE = 4
+DATAMATRIX_QUIET_ZONE = 1
+TEXT_HEIGHT_RATIO = 0.2
+MAX_FONT_SIZE = 14
+
+
+def linear_svg(modules, width, height, text=None):
+	"""Inline SVG for a linear symbol, stretched to `width` x `height` pixels"""
+	width, height = max(float(width), 1), max(float(height), 1)
+	module_width = width / (len(modules) + 2 * LINEAR_QUIET_ZONE)
+	font_size = min(height * TEXT_HEIGHT_RATIO, MAX_FONT_SIZE) if text else 0
+	bar_height = height - font_size * 1.2
+
+	# one subpath per bar, adjacent dark modules merged
+	path = []
+	x = 0
+	for run_length, dark in iter_runs(modules):
+		if dark:
+			left = (LINEAR_QUIET_ZONE + x) * module_width
+			path.append(
+				f"M{left:.3f} 0h{run_length * module_width:.3f}v{bar_height:.2f}h-{run_length * module_width:.3f}z"
+			)
+		x += run_length
+
+	parts = [
+		f'<svg xmlns="http://www.w3.org/2000/svg" class="barcode-image" width="{width:g}" height="{height:g}" '
+		f'viewBox="0 0 {width:g} {height:g}" shape-rendering="crispEdges">',
+		f'<rect width="100%" height="100%" fill="#fff"/><path d="{"".join(path)}" fill="#000"/>',
+	]
+	if text:
+		parts.append(
+			f'<text x="{width / 2:g}" y="{height - font_size * 0.2:.2f}" font-family="monospace" '
+			f'font-size="{font_size:.2f}" text-anchor="middle">{escape(text)}</text>'
+		)
+	parts.append("</svg>")
+	return "".join(parts)
+
+
+def matrix_svg(matrix, width, height, quiet_zone=QR_QUIET_ZONE):
+	"""Inline SVG for a 2D symbol drawn in module units and scaled to fit `width` x `height`"""
+	size = len(matrix) + 2 * quiet_zone
+	return (
+		f'<svg xmlns="http://www.w3.org/2000/svg" class="barcode-image" width="{width}" height="{height}" '
+		f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+		f'<rect width="{size}" height="{size}" fill="#fff"/>'
+		f'<path d="{matrix_path(matrix, quiet_zone)}" fill="none" stroke="#000"/></svg>'
+	)
+
+
+def matrix_path(matrix, quiet_zone=QR_QUIET_ZONE):
+	"""SVG path data of the dark modules, stroked one module wide
+
+	Each row of the symbol is one subpath of horizontal strokes through the
+	module centres, with relative moves between runs: less than half the size
+	of a rectangle per run.
+	"""
+	path = []
+	for y, row in enumerate(matrix):
+		x = 0
+		gap = None
+		for run_length, dark in iter_runs(row):
+			if dark:
+				if gap is None:
+					path.append(f"M{x + quiet_zone} {y + quiet_zone}.5h{run_length}")
+				else:
+					path.append(f"m{gap} 0h{run_length}")
+				gap = 0
+			elif gap is not None:
+				gap = run_length
+			x += run_length
+	return "".join(path)
+
+
+def iter_runs(modules):
+	"""(run length, is dark) for consecutive equal modules; accepts "0"/"1" strings or booleans"""
+	run_length = 0
+	current = None
+	for module in modules:
+		dark = module is True or module == "1"
+		if dark == current:
+			run_length += 1
+			continue
+		if run_length:
+			yield run_length, current
+		current, run_length = dark, 1
+	if run_length:
+		yield run_length, current
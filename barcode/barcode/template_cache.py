@@ -0,0 +1,149 @@
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.utils.jinja import get_jenv
+
+from barcode.barcode.settings_cache import get_site
+
+# Redis key holding the cache generation shared by every gunicorn/RQ worker.
+# Bumping it makes all workers drop their local compiled templates.
+CACHE_GENERATION_KEY = "barcode_template_cache_generation"
+MAX_CACHED_TEMPLATES = 256
+
+# Keyed by site, template and template version
+_compiled_templates = {}
+_cached_css = {}
+# Cache generation each site's entries were built at
+_cache_generations = {}
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def get_template_version(template_doc, source=None):
+	"""Version token for a template: its modified timestamp, or a content hash for unsaved docs"""
+	if template_doc.get("modified") and not template_doc.get("__islocal"):
+		return str(template_doc.modified)
+
+	if source is None:
+		source = (template_doc.get("html_template") or "") + (template_doc.get("css_styles") or "")
+	return hashlib.sha1(source.encode()).hexdigest()
+
+
+def get_template_source(template_doc):
+	"""HTML/Jinja source used to render labels for a template"""
+	return template_doc.html_template or template_doc.get_default_html_template()
+
+
+def get_compiled_template(template_doc):
+	"""Return the compiled Jinja template for a template doc, compiling it at most once per version"""
+	sync_cache_generation()
+
+	source = None
+	if template_doc.get("modified") and not template_doc.get("__islocal"):
+		key = (get_site(), template_doc.name, get_template_version(template_doc))
+	else:
+		source = get_template_source(template_doc)
+		key = (get_site(), template_doc.name, get_template_version(template_doc, source))
+
+	compiled = _compiled_templates.get(key)
+	if compiled is not None:
+		_stats["hits"] += 1
+		return compiled
+
+	_stats["misses"] += 1
+	if source is None:
+		source = get_template_source(template_doc)
+	if ".__" in source:
+		frappe.throw(_("Illegal template"))
+
+	compiled = get_jenv().from_string(source)
+	_store(_compiled_templates, key, compiled)
+	return compiled
+
+
+def render_cached_template(template_doc, data):
+	"""Render label HTML for a template doc using the compiled template cache"""
+	return get_compiled_template(template_doc).render(data)
+
+
+def get_cached_css(template_doc):
+	"""Return the finished CSS for a template doc, building the default CSS at most once per version"""
+	sync_cache_generation()
+
+	if template_doc.css_styles:
+		return template_doc.css_styles
+
+	key = (
+		get_site(),
+		template_doc.name,
+		get_template_version(template_doc),
+		template_doc.label_width,
+		template_doc.label_height,
+	)
+	css = _cached_css.get(key)
+	if css is not None:
+		_stats["hits"] += 1
+		return css
+
+	_stats["misses"] += 1
+	from barcode.barcode.api import get_default_css
+
+	css = get_default_css(template_doc)
+	_store(_cached_css, key, css)
+	return css
+
+
+def _store(cache, key, value):
+	if len(cache) >= MAX_CACHED_TEMPLATES:
+		# dicts keep insertion order, so this drops the oldest entry
+		cache.pop(next(iter(cache)))
+	cache[key] = value
+
+
+def sync_cache_generation():
+	"""Drop local entries when another worker has invalidated the cache (checked once per request/job)"""
+	if getattr(frappe.local, "barcode_template_cache_synced", False):
+		return
+
+	frappe.local.barcode_template_cache_synced = True
+	site = get_site()
+	generation = frappe.cache().get_value(CACHE_GENERATION_KEY)
+	if site not in _cache_generations or generation != _cache_generations[site]:
+		clear_local_cache()
+		_cache_generations[site] = generation
+
+
+def clear_local_cache(template_name=None):
+	"""Clear the compiled templates and CSS of this site held by this process"""
+	site = get_site()
+	for cache in (_compiled_templates, _cached_css):
+		for key in [
+			key for key in cache if key[0] == site and (not template_name or key[1] == template_name)
+		]:
+			cache.pop(key, None)
+
+
+def clear_template_cache(template_name=None):
+	"""Invalidate cached templates in this process and broadcast the invalidation to all workers"""
+	clear_local_cache(template_name)
+	_stats["invalidations"] += 1
+
+	generation = frappe.generate_hash(length=12)
+	frappe.cache().set_value(CACHE_GENERATION_KEY, generation)
+	_cache_generations[get_site()] = generation
+
+
+@frappe.whitelist()
+def get_template_cache_stats():
+	"""Hit/miss counters for the compiled template cache of this worker"""
+	frappe.only_for("System Manager")
+
+	lookups = _stats["hits"] + _stats["misses"]
+	return {
+		"hits": _stats["hits"],
+		"misses": _stats["misses"],
+		"invalidations": _stats["invalidations"],
+		"hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else 0,
+		"compiled_templates": len(_compiled_templates),
+		"cached_css": len(_cached_css),
+	}
@@ -0,0 +1,360 @@
+import hashlib
+import json
+import os
+import re
+import zipfile
+from urllib.parse import unquote
+
+import frappe
+from frappe import _
+from frappe.model import no_value_fields
+from frappe.utils import now
+
+from barcode import __version__
+
+TEMPLATE_DOCTYPE = "Barcode Label Template"
+PACKAGE_FORMAT = "barcode-template-package"
+PACKAGE_VERSION = 2
+MANIFEST = "manifest.json"
+# Site specific or derived fields that are not part of a package
+EXCLUDED_FIELDS = ("is_default", "label_program_hash")
+INSERT_BATCH_SIZE = 200
+
+# Files referenced from template markup, styles and image elements
+_file_url = re.compile(r"/(?:private/)?files/[^\"'()\s?#<>]+")
+
+
+@frappe.whitelist()
+def export_template_package(template_names):
+	"""Write the templates into a package archive and return its download URL
+
+	The archive holds a manifest with the content hash of every template and
+	asset, one JSON file per template (including its compiled label program)
+	and the files its layout references. Templates are read with one query
+	and written to the archive one at a time. Private files the user cannot
+	read are left out.
+	"""
+	from barcode.barcode.artifact_store import ensure_artifact, get_artifact_key, get_artifact_url
+
+	frappe.has_permission(TEMPLATE_DOCTYPE, "export", throw=True)
+	template_names = json.loads(template_names) if isinstance(template_names, str) else template_names
+
+	fields = get_package_fields()
+	templates = frappe.get_all(
+		TEMPLATE_DOCTYPE,
+		filters={"name": ["in", template_names]},
+		fields=["name", *fields, "label_program"],
+		order_by="name asc",
+	)
+	for template in templates:
+		template["hash"] = get_template_hash(template, fields)
+
+	assets = {}
+	for template in templates:
+		for url in get_asset_urls(template):
+			if url not in assets:
+				assets[url] = get_asset_hash(url) if can_export_asset(url) else None
+	assets = {url: asset_hash for url, asset_hash in assets.items() if asset_hash}
+
+	manifest = {
+		"format": PACKAGE_FORMAT,
+		"version": PACKAGE_VERSION,
+		"app_version": __version__,
+		"created": now(),
+		"templates": [{"name": template.name, "hash": template.hash} for template in templates],
+		"assets": [{"url": url, "hash": asset_hash} for url, asset_hash in assets.items()],
+	}
+
+	def write(output):
+		with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+			archive.writestr(MANIFEST, json.dumps(manifest, indent=1))
+			for template in templates:
+				archive.writestr(
+					f"templates/{template.hash}.json", json.dumps(template, indent=1, default=str)
+				)
+			for url, asset_hash in assets.items():
+				archive.write(get_asset_path(url), f"assets/{asset_hash}")
+
+	key = get_artifact_key("template-package", manifest["templates"], manifest["assets"])
+	name = ensure_artifact(key, "zip", write)
+	return {
+		"success": True,
+		"url": get_artifact_url(name, "barcode-templates.zip"),
+		"templates": len(templates),
+		"assets": len(assets),
+	}
+
+
+@frappe.whitelist()
+def import_template_package(package_data=None, file_url=None):
+	"""Import a package archive (uploaded as `file_url`) or a version 1 JSON package
+
+	Templates whose content hash matches the existing template are skipped;
+	new ones are inserted in bulk and changed ones updated in place, all in
+	one transaction. Referenced files are restored at their original URL
+	unless an identical file is already there; where a different file is,
+	they are restored under a name with their content hash and the imported
+	templates point at that instead.
+	"""
+	frappe.only_for("System Manager")
+
+	if file_url:
+		with zipfile.ZipFile(get_uploaded_file_path(file_url)) as archive:
+			manifest = json.loads(archive.read(MANIFEST))
+			if manifest.get("format") != PACKAGE_FORMAT:
+				frappe.throw(_("Not a barcode template package"))
+
+			assets, renamed = restore_assets(archive, manifest.get("assets") or [])
+			result = upsert_templates(
+				manifest["templates"],
+				lambda entry: rewrite_asset_urls(
+					json.loads(archive.read(f"templates/{entry['hash']}.json")), renamed
+				),
+			)
+	else:
+		package = json.loads(package_data) if isinstance(package_data, str) else package_data
+		templates = [get_v1_template(template) for template in package["templates"]]
+		assets = 0
+		result = upsert_templates(templates, lambda template: template)
+
+	result.update({"success": True, "assets": assets})
+	return result
+
+
+def upsert_templates(entries, load):
+	"""Insert or update the templates of `entries`, skipping unchanged ones
+
+	`entries` carry the template `name` and, for archives, its `hash`;
+	`load(entry)` returns the template fields, read only when the template
+	has to be written.
+	"""
+	from barcode.barcode.settings_cache import clear_settings_cache
+	from barcode.barcode.template_cache import clear_template_cache
+
+	fields = get_package_fields()
+	# a template listed twice is imported once, from its last entry
+	entries = list({entry["name"]: entry for entry in entries}.values())
+	names = [entry["name"] for entry in entries]
+	existing = {
+		row.name: row
+		for row in frappe.get_all(
+			TEMPLATE_DOCTYPE, filters={"name": ["in", names]}, fields=["name", *fields, "label_program"]
+		)
+	}
+
+	inserted, updated, unchanged = [], [], []
+	new_rows = []
+	for entry in entries:
+		current = existing.get(entry["name"])
+		if current and entry.get("hash") == get_template_hash(current, fields):
+			unchanged.append(entry["name"])
+			continue
+
+		doc = build_template_doc(load(entry), fields)
+		if current:
+			if get_template_hash(doc, fields) == get_template_hash(current, fields):
+				unchanged.append(doc.name)
+				continue
+			frappe.db.set_value(
+				TEMPLATE_DOCTYPE,
+				doc.name,
+				{field: doc.get(field) for field in (*fields, "label_program", "label_program_hash")},
+			)
+			updated.append(doc.name)
+		else:
+			new_rows.append(doc.get_valid_dict(convert_dates_to_str=True))
+			inserted.append(doc.name)
+
+		if len(new_rows) >= INSERT_BATCH_SIZE:
+			insert_templates(new_rows)
+			new_rows = []
+
+	insert_templates(new_rows)
+
+	if inserted or updated:
+		frappe.db.commit()
+		clear_template_cache()
+		clear_settings_cache()
+
+	return {"imported": inserted, "updated": updated, "unchanged": unchanged}
+
+
+def build_template_doc(template, fields):
+	"""Unsaved template doc with the package fields and a recompiled label program
+
+	`is_default` is site specific: it is left as is on update and off on insert.
+	"""
+	doc = frappe.new_doc(TEMPLATE_DOCTYPE)
+	doc.update({field: template.get(field) for field in fields if field in template})
+	doc.label_program = template.get("label_program")
+	doc.name = template.get("name") or doc.template_name
+	doc.is_default = 0
+	doc.update_label_program()
+	return doc
+
+
+def insert_templates(rows):
+	if not rows:
+		return
+
+	timestamp = now()
+	for row in rows:
+		row.update(
+			{
+				"creation": timestamp,
+				"modified": timestamp,
+				"owner": frappe.session.user,
+				"modified_by": frappe.session.user,
+				"docstatus": 0,
+			}
+		)
+	columns = list(rows[0])
+	frappe.db.bulk_insert(
+		TEMPLATE_DOCTYPE, fields=columns, values=[tuple(row.get(c) for c in columns) for row in rows]
+	)
+
+
+def get_package_fields():
+	"""Template fields carried by a package"""
+	return [
+		df.fieldname
+		for df in frappe.get_meta(TEMPLATE_DOCTYPE).fields
+		if df.fieldtype not in no_value_fields
+		and df.fieldname not in EXCLUDED_FIELDS
+		and df.fieldname != "label_program"
+	]
+
+
+def get_template_hash(template, fields):
+	"""Content hash of a template: its package fields and the hash of its label program"""
+	program = template.get("label_program")
+	program_hash = json.loads(program).get("hash") if program else None
+	payload = json.dumps(
+		[template.get("name"), {field: template.get(field) for field in fields}, program_hash],
+		sort_keys=True,
+		separators=(",", ":"),
+		default=str,
+	)
+	return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_v1_template(template):
+	"""Template fields of a version 1 (JSON) package entry"""
+	return {
+		"name": template["name"],
+		"template_name": template["name"],
+		"template_type": template.get("type"),
+		"label_width": template.get("width"),
+		"label_height": template.get("height"),
+		"html_template": template.get("html"),
+		"css_styles": template.get("css"),
+	}
+
+
+def get_asset_urls(template):
+	"""Local file URLs referenced by a template's markup, styles and image elements"""
+	sources = [
+		template.get("html_template") or "",
+		template.get("css_styles") or "",
+		template.get("label_program") or "",
+	]
+	return {unquote(url) for source in sources for url in _file_url.findall(source)}
+
+
+def can_export_asset(url):
+	"""Whether the user may export the file at `url`: public files, and private files they can read"""
+	if not url.startswith("/private/"):
+		return True
+	file_name = frappe.db.get_value("File", {"file_url": url})
+	return bool(file_name) and frappe.has_permission("File", "read", file_name)
+
+
+def get_asset_path(url):
+	"""Path on disk of a /files or /private/files URL, None for anything else"""
+	match = re.fullmatch(r"/(private/)?files/([^/]+)", url)
+	if not match or match.group(2) in (".", ".."):
+		return None
+	return frappe.get_site_path("private" if match.group(1) else "public", "files", match.group(2))
+
+
+def get_asset_hash(url):
+	path = get_asset_path(url)
+	if not path or not os.path.isfile(path):
+		return None
+
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		for block in iter(lambda: f.read(1024 * 1024), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+def restore_assets(archive, assets):
+	"""Write the package files that are missing on this site
+
+	A different file already at an asset's URL is left alone; the asset is
+	written next to it under a name carrying its content hash instead.
+	Returns (files written, {package URL: URL the asset was restored at}) with
+	the URLs of such renamed assets.
+	"""
+	written = 0
+	renamed = {}
+	for asset in assets:
+		url = get_restore_url(asset)
+		if not url:
+			continue
+		if url != asset["url"]:
+			renamed[asset["url"]] = url
+		if get_asset_hash(url) == asset["hash"]:
+			continue
+
+		path = get_asset_path(url)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with archive.open(f"assets/{asset['hash']}") as source, open(path, "wb") as target:
+			for block in iter(lambda: source.read(1024 * 1024), b""):
+				target.write(block)
+		written += 1
+
+		if not frappe.db.exists("File", {"file_url": url}):
+			frappe.get_doc(
+				{
+					"doctype": "File",
+					"file_url": url,
+					"file_name": os.path.basename(path),
+					"is_private": url.startswith("/private/"),
+				}
+			).insert(ignore_permissions=True)
+	return written, renamed
+
+
+def get_restore_url(asset):
+	"""URL to restore a package asset at: its own URL when free or identical, else one named by its hash"""
+	url = asset["url"]
+	if not get_asset_path(url):
+		return None
+
+	base, extension = os.path.splitext(url)
+	for candidate in (url, f"{base}-{asset['hash'][:12]}{extension}", f"{base}-{asset['hash']}{extension}"):
+		current_hash = get_asset_hash(candidate)
+		if current_hash in (None, asset["hash"]) and get_asset_path(candidate):
+			return candidate
+	return None
+
+
+def rewrite_asset_urls(template, renamed):
+	"""Template fields with the URLs of assets restored under another name replaced"""
+	if not renamed:
+		return template
+
+	def replace(match):
+		return renamed.get(unquote(match.group(0)), match.group(0))
+
+	for field in ("html_template", "css_styles", "label_program"):
+		if template.get(field):
+			template[field] = _file_url.sub(replace, template[field])
+	return template
+
+
+def get_uploaded_file_path(file_url):
+	file_doc = frappe.get_doc("File", {"file_url": file_url})
+	return file_doc.get_full_path()
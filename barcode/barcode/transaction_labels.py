@@ -0,0 +1,391 @@
+import json
+import math
+import re
+from itertools import repeat
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+from barcode.barcode.print_log import build_print_log_row, queue_print_logs
+
+# Item table and stock quantity column of the transaction doctypes labels can be printed for
+TRANSACTION_ITEM_TABLES = {
+	"Delivery Note": ("Delivery Note Item", "stock_qty"),
+	"Purchase Receipt": ("Purchase Receipt Item", "stock_qty"),
+	"Stock Entry": ("Stock Entry Detail", "transfer_qty"),
+}
+
+OUTPUTS = ("html", "pdf", "zpl")
+
+
+@frappe.whitelist()
+def print_transaction_labels(doctype, docname, template=None, per_qty=0, output="html", print_settings=None):
+	"""Print labels for the item rows of a Delivery Note, Purchase Receipt or Stock Entry
+
+	Rows are expanded server side into one label per serial number, batch
+	or plain item row; with `per_qty` batches and plain rows get one label
+	per unit of stock quantity. The labels are rendered by the `output`
+	backend: an HTML document (queued as a label job when large), a PDF, or a
+	ZPL job sent to the printer in `print_settings`.
+	"""
+	print_settings = json.loads(print_settings) if isinstance(print_settings, str) else (print_settings or {})
+	if output not in OUTPUTS:
+		frappe.throw(_("Unknown label output {0}").format(output))
+
+	frappe.has_permission(doctype, "print", docname, throw=True)
+	if not template:
+		from barcode.barcode.settings_cache import get_default_template_name
+
+		template = get_default_template_name(doctype)
+
+	entries = get_transaction_label_entries(doctype, docname, cint(per_qty))
+	if not entries:
+		return {"success": False, "error": _("No items found in {0} {1}").format(_(doctype), docname)}
+
+	label_count = sum(entry["copies"] for entry in entries)
+	template_doc = frappe.get_doc("Barcode Label Template", template)
+
+	if output == "pdf":
+		return write_transaction_pdf(template_doc, entries, label_count, print_settings.get("sheetProfile"))
+
+	if output == "zpl":
+		return send_transaction_zpl(template_doc, entries, label_count, print_settings)
+
+	from barcode.barcode.label_jobs import enqueue_label_job, should_run_in_background
+
+	if should_run_in_background(label_count):
+		return enqueue_label_job("transaction_labels", template_doc.name, entries)
+
+	label_bodies, results = render_transaction_labels_chunk(template_doc, entries, {})
+
+	from barcode.barcode.api import wrap_label_document
+
+	return {
+		"success": any(result["success"] for result in results),
+		"html": wrap_label_document(template_doc, label_bodies) if label_bodies else "",
+		"template": template_doc.name,
+		"labels": len(label_bodies),
+		"results": results,
+	}
+
+
+def get_transaction_label_entries(doctype, docname, per_qty=False):
+	"""Label entries of a transaction, in item row order
+
+	Each entry is `{'doctype', 'source', 'item_name', 'copies'}`, with `source`
+	shaped like the rows of `label_fetch.fetch_label_sources` for that doctype. Item rows, their
+	Serial and Batch Bundle entries and the batches are read with three
+	queries whatever the number of rows.
+	"""
+	if doctype not in TRANSACTION_ITEM_TABLES:
+		frappe.throw(_("Labels cannot be printed for {0}").format(_(doctype)))
+
+	rows = get_item_rows(doctype, docname)
+	bundle_entries = get_bundle_entries(doctype, docname)
+
+	batch_nos = {row.batch_no for row in rows if row.batch_no}
+	batch_nos.update(
+		entry.batch_no for entries in bundle_entries.values() for entry in entries if entry.batch_no
+	)
+	batches = get_batches(batch_nos)
+
+	entries = []
+	for row in rows:
+		row_entries = bundle_entries.get(row.serial_and_batch_bundle) or get_legacy_entries(row)
+		if not row_entries:
+			entries.append(get_item_entry(row, row.qty, per_qty))
+			continue
+
+		for entry in row_entries:
+			if entry.serial_no:
+				entries.append(
+					{
+						"doctype": "Serial No",
+						"source": {"name": entry.serial_no, "item_code": row.item_code},
+						"item_name": row.item_name,
+						"copies": 1,
+					}
+				)
+			elif entry.batch_no in batches:
+				entries.append(
+					{
+						"doctype": "Batch",
+						"source": batches[entry.batch_no],
+						"item_name": row.item_name,
+						"copies": get_label_copies(entry.qty, per_qty),
+					}
+				)
+			else:
+				entries.append(get_item_entry(row, entry.qty, per_qty))
+
+	return entries
+
+
+def get_item_rows(doctype, docname):
+	child_doctype, qty_field = TRANSACTION_ITEM_TABLES[doctype]
+	return frappe.db.sql(
+		f"""
+		select
+			child.item_code, coalesce(item.item_name, child.item_name) as item_name,
+			child.`{qty_field}` as qty, child.batch_no, child.serial_no, child.serial_and_batch_bundle
+		from `tab{child_doctype}` child
+		left join `tabItem` item on item.name = child.item_code
+		where child.parenttype = %s and child.parent = %s
+		order by child.idx
+	""",
+		(doctype, docname),
+		as_dict=True,
+	)
+
+
+def get_bundle_entries(doctype, docname):
+	"""Serial and Batch Bundle entries of the transaction, grouped by bundle"""
+	bundle_entries = {}
+	for entry in frappe.db.sql(
+		"""
+		select entry.parent as bundle, entry.serial_no, entry.batch_no, abs(entry.qty) as qty
+		from `tabSerial and Batch Entry` entry
+		inner join `tabSerial and Batch Bundle` bundle on bundle.name = entry.parent
+		where bundle.voucher_type = %s and bundle.voucher_no = %s
+			and bundle.is_cancelled = 0 and bundle.docstatus < 2
+		order by entry.parent, entry.idx
+	""",
+		(doctype, docname),
+		as_dict=True,
+	):
+		bundle_entries.setdefault(entry.bundle, []).append(entry)
+	return bundle_entries
+
+
+def get_batches(batch_nos):
+	if not batch_nos:
+		return {}
+
+	return {
+		batch.name: batch
+		for batch in frappe.get_all(
+			"Batch",
+			filters={"name": ["in", list(batch_nos)]},
+			fields=["name", "item", "manufacturing_date", "expiry_date"],
+		)
+	}
+
+
+def get_legacy_entries(row):
+	"""Entries from the serial_no / batch_no fields of rows without a bundle"""
+	serial_nos = [serial_no for serial_no in re.split(r"[\n,]", row.serial_no or "") if serial_no.strip()]
+	if serial_nos:
+		return [
+			frappe._dict(serial_no=serial_no.strip(), batch_no=row.batch_no, qty=1)
+			for serial_no in serial_nos
+		]
+	if row.batch_no:
+		return [frappe._dict(serial_no=None, batch_no=row.batch_no, qty=row.qty)]
+	return []
+
+
+def get_item_entry(row, qty, per_qty):
+	return {
+		"doctype": "Item",
+		"source": {"name": row.item_code, "item_code": row.item_code, "item_name": row.item_name},
+		"item_name": row.item_name,
+		"copies": get_label_copies(qty, per_qty),
+	}
+
+
+def get_label_copies(qty, per_qty):
+	"""One label per started unit with `per_qty`, else one label"""
+	return max(1, math.ceil(abs(flt(qty)))) if per_qty else 1
+
+
+def render_transaction_labels_chunk(template_doc, entries, options):
+	"""Label job runner for `print_transaction_labels`: render one chunk of entries and log it"""
+	from barcode.barcode.api import render_source_label
+	from barcode.barcode.label_fetch import get_label_company
+
+	company = get_label_company(template_doc)
+	barcode_type = template_doc.barcode_type
+	label_bodies = []
+	results = []
+	log_rows = []
+
+	for entry in entries:
+		doctype, source, copies = entry["doctype"], frappe._dict(entry["source"]), entry["copies"]
+		try:
+			body = render_source_label(template_doc, doctype, source, company, entry["item_name"])
+			label_bodies.extend([body] * copies)
+			log_rows.append(build_print_log_row(doctype, source, template_doc.name, copies, barcode_type))
+			results.append({"docname": source.name, "success": True, "error": None})
+		except Exception as e:
+			frappe.log_error(f"Barcode printing error: {e!s}")
+			log_rows.append(
+				build_print_log_row(
+					doctype, source, template_doc.name, copies, barcode_type, "Failed", str(e)
+				)
+			)
+			results.append({"docname": source.name, "success": False, "error": str(e)})
+
+	queue_print_logs(log_rows)
+	return label_bodies, results
+
+
+def iter_live_data(template_doc, entries):
+	"""Live data of every label (repeated per copy) for the label program backends"""
+	for live_data, copies in iter_entry_data(template_doc, entries):
+		yield from repeat(live_data, copies)
+
+
+def iter_label_bodies(template_doc, entries):
+	"""Rendered label body of every label (repeated per copy) for the HTML to PDF fallback"""
+	from barcode.barcode.api import render_source_label
+	from barcode.barcode.label_fetch import get_label_company
+
+	company = get_label_company(template_doc)
+	for entry in entries:
+		body = render_source_label(
+			template_doc, entry["doctype"], frappe._dict(entry["source"]), company, entry["item_name"]
+		)
+		yield from repeat(body, entry["copies"])
+
+
+def iter_entry_data(template_doc, entries):
+	"""(live data, copies) of every entry"""
+	from barcode.barcode.api import prepare_label_data
+	from barcode.barcode.label_fetch import get_label_company
+
+	company = get_label_company(template_doc)
+	for entry in entries:
+		live_data = prepare_label_data(
+			frappe._dict(entry["source"]),
+			entry["doctype"],
+			template_doc,
+			company=company,
+			item_name=entry["item_name"],
+		)
+		yield live_data, entry["copies"]
+
+
+def log_transaction_labels(template_doc, entries, printer_ip=None):
+	queue_print_logs(
+		[
+			build_print_log_row(
+				entry["doctype"],
+				entry["source"],
+				template_doc.name,
+				entry["copies"],
+				template_doc.barcode_type,
+				printer_type="Thermal" if printer_ip else None,
+				printer_ip=printer_ip,
+			)
+			for entry in entries
+		]
+	)
+
+
+def write_transaction_pdf(template_doc, entries, label_count, sheet_profile=None):
+	"""Write the labels into a PDF drawn from the template's label program
+
+	The PDF is stored under the hash of the template version, the bound label
+	data and the sheet layout, so printing the same transaction again reuses it.
+	Templates with their own markup, and labels the PDF writer cannot draw, are
+	rendered through wkhtmltopdf instead, the same way the HTML output shows them.
+	"""
+	from barcode.barcode.artifact_store import ensure_artifact, get_artifact_key, get_artifact_url
+	from barcode.barcode.imposition import get_sheet_layout
+	from barcode.barcode.label_program import get_template_program, uses_label_program
+	from barcode.barcode.pdf_writer import can_write_natively, write_program_pdf
+	from barcode.barcode.print_api import write_label_bodies_pdf
+
+	program = get_template_program(template_doc)
+	layout = get_sheet_layout(template_doc.label_width, template_doc.label_height, sheet_profile)
+	labels = list(iter_entry_data(template_doc, entries))
+	native = uses_label_program(template_doc) and all(
+		can_write_natively(program, live_data) for live_data, _copies in labels
+	)
+	key = get_artifact_key("transaction-pdf", template_doc.name, template_doc.modified, layout, labels)
+
+	def write(output):
+		if native:
+			labels_data = (live_data for live_data, copies in labels for _copy in range(copies))
+			write_program_pdf(program, labels_data, output, layout)
+		else:
+			# custom markup or e.g. item names outside Latin-1: the rendered labels go through wkhtmltopdf
+			write_label_bodies_pdf(template_doc, iter_label_bodies(template_doc, entries), output, layout)
+
+	name = ensure_artifact(key, "pdf", write)
+	log_transaction_labels(template_doc, entries)
+	return {
+		"success": True,
+		"pdf_url": get_artifact_url(name, "labels.pdf"),
+		"labels": label_count,
+		"message": _("PDF generated with {0} labels").format(label_count),
+	}
+
+
+def send_transaction_zpl(template_doc, entries, label_count, print_settings):
+	"""Compile the labels into one ZPL job and send it to the printer (or return it without a printer IP)"""
+	from barcode.barcode.label_program import get_template_program, uses_label_program
+	from barcode.barcode.zpl import DEFAULT_DPI, compile_zpl_format, get_zpl_program, needs_raster
+
+	program = get_template_program(template_doc)
+	dpi = cint(print_settings.get("dpi")) or DEFAULT_DPI
+
+	if not uses_label_program(template_doc):
+		# the template's own markup is printed as rendered graphics
+		from barcode.barcode.raster import iter_template_raster_zpl
+
+		zpl = "".join(
+			iter_template_raster_zpl(
+				template_doc,
+				iter_label_bodies(template_doc, entries),
+				1,
+				dpi,
+				print_settings.get("compression"),
+			)
+		)
+	elif print_settings.get("raster") or needs_raster(program):
+		from barcode.barcode.raster import compile_raster_zpl
+
+		template_data = {
+			"program": program,
+			"width": template_doc.label_width,
+			"height": template_doc.label_height,
+		}
+		zpl = compile_raster_zpl(
+			template_data, iter_live_data(template_doc, entries), 1, dpi, print_settings.get("compression")
+		)
+	else:
+		from barcode.barcode.api import prepare_label_data
+		from barcode.barcode.label_fetch import get_label_company
+
+		graphic_commands, parts = get_zpl_program(program, dpi)
+		company = get_label_company(template_doc)
+		job = list(graphic_commands)
+		for entry in entries:
+			live_data = prepare_label_data(
+				frappe._dict(entry["source"]),
+				entry["doctype"],
+				template_doc,
+				company=company,
+				item_name=entry["item_name"],
+			)
+			job.append(compile_zpl_format(parts, live_data, entry["copies"]))
+		zpl = "".join(job)
+
+	printer_ip = print_settings.get("printerIP")
+	if not printer_ip:
+		log_transaction_labels(template_doc, entries)
+		return {"success": True, "zpl": zpl, "labels": label_count}
+
+	from barcode.barcode.printer_transport import send_to_printer
+	from barcode.barcode.settings_cache import get_setting
+
+	send_to_printer(printer_ip, print_settings.get("printerPort") or get_setting("printer_port"), zpl)
+
+	log_transaction_labels(template_doc, entries, printer_ip)
+	return {
+		"success": True,
+		"labels": label_count,
+		"message": _("Sent {0} labels to thermal printer at {1}").format(label_count, printer_ip),
+	}
@@ -0,0 +1,314 @@
+import base64
+import hashlib
+import io
+import os
+
+import frappe
+from frappe.utils import cint, flt
+
+from barcode.barcode.label_program import (
+	DESIGNER_PX_PER_MM,
+	get_bound_value,
+	get_label_program,
+	get_program_artifact,
+)
+from barcode.barcode.lru_cache import BoundedLRUCache
+
+DEFAULT_DPI = 203
+GRAPHIC_CACHE_BYTES = 8 * 1024 * 1024
+
+LINEAR_SYMBOLOGIES = {
+	"Code128": "^BCN,{height},{text},N,N",
+	"Code39": "^B3N,N,{height},{text},N",
+	"EAN-13": "^BEN,{height},{text},N",
+	"EAN-8": "^B8N,{height},{text},N",
+	"UPC-A": "^BUN,{height},{text},N,Y",
+	"UPC-E": "^B9N,{height},{text},N,Y",
+	"ITF": "^B2N,{height},{text},N,N",
+	"Codabar": "^BKN,N,{height},{text},N,A,A",
+}
+
+TEXT_ALIGNMENT = {"left": "L", "center": "C", "right": "R", "justify": "J"}
+
+_graphic_cache = BoundedLRUCache(GRAPHIC_CACHE_BYTES, sizeof=lambda graphic: len(graphic[2]))
+
+
+def compile_zpl(template_data, copies=1, dpi=DEFAULT_DPI):
+	"""Compile designer template data (elements + liveData) into a ZPL job"""
+	return compile_zpl_labels(template_data, [template_data.get("liveData")], copies, dpi)
+
+
+def compile_zpl_labels(template_data, labels_data, copies=1, dpi=DEFAULT_DPI):
+	"""Compile one ZPL label format per entry of `labels_data`
+
+	The label program is translated to ZPL once per program and dpi; per label
+	only the data bound elements are formatted. Logos and images are downloaded
+	to printer memory once with ~DG at the start of the job and recalled with
+	^XG by every label.
+	"""
+	dpi = cint(dpi) or DEFAULT_DPI
+	graphic_commands, parts = get_zpl_program(get_label_program(template_data), dpi)
+
+	job = list(graphic_commands)
+	for live_data in labels_data:
+		job.append(compile_zpl_format(parts, live_data, copies))
+
+	return "".join(job)
+
+
+def compile_zpl_format(parts, live_data=None, copies=1):
+	"""Compile a single ^XA...^XZ label format from the parts of `get_zpl_program`"""
+	live_data = live_data or {}
+	label = [part if isinstance(part, str) else compile_bound_element(part, live_data) for part in parts]
+	label.append(f"^PQ{max(1, cint(copies))}^XZ")
+	return "".join(label)
+
+
+def needs_raster(program):
+	"""Whether the program has elements only a rendered graphic can reproduce"""
+	return any(element["kind"] == "html" for element in program["elements"])
+
+
+def get_zpl_program(program, dpi=DEFAULT_DPI):
+	"""(graphic download commands, format parts) of a label program at `dpi`
+
+	Parts are finished commands for static elements and (element, origin,
+	width, height, dpi, symbology) tuples for data bound ones.
+	"""
+	built = []
+
+	def build():
+		graphic_commands, parts, complete = build_zpl_program(program, dpi)
+		built.append((graphic_commands, parts))
+		# graphics that could not be built are retried by the next job
+		return built[0] if complete else None
+
+	return get_program_artifact(program, ("zpl", dpi), build) or built[0]
+
+
+def build_zpl_program(program, dpi):
+	graphic_commands, graphic_names, complete = get_zpl_graphics(program["elements"], dpi)
+	width = mm_to_dots(program["width"], dpi)
+	height = mm_to_dots(program["height"], dpi)
+
+	parts = [f"^XA^CI28^PW{width}^LL{height}^LH0,0"]
+	for index, element in enumerate(program["elements"]):
+		part = compile_element(element, index, dpi, program["barcode_type"], graphic_names)
+		if part:
+			parts.append(part)
+
+	return graphic_commands, parts, complete
+
+
+def compile_element(element, index, dpi, default_symbology, graphic_names):
+	"""Finished command of a static element, or the tuple `compile_bound_element` formats per label"""
+	kind = element["kind"]
+	x, y = mm_to_dots(element["x"], dpi), mm_to_dots(element["y"], dpi)
+	width, height = mm_to_dots(element["width"], dpi), mm_to_dots(element["height"], dpi)
+	origin = f"^FO{x},{y}"
+
+	if kind == "line":
+		thickness = max(height, 2)
+		return f"{origin}^GB{max(width, thickness)},{thickness},{thickness},B,0^FS"
+
+	if kind == "box":
+		border = max(mm_to_dots(element["border"], dpi), 1)
+		return f"{origin}^GB{max(width, border)},{max(height, border)},{border},B,0^FS"
+
+	if kind == "image":
+		name = graphic_names.get(index)
+		return f"{origin}^XGR:{name}.GRF,1,1^FS" if name else ""
+
+	if kind == "html":
+		# markup has no ZPL equivalent
+		return ""
+
+	symbology = element.get("symbology") or default_symbology
+	bound = (element, origin, width, height, dpi, symbology)
+	return bound if element["field"] else compile_bound_element(bound, {})
+
+
+def compile_bound_element(part, live_data):
+	element, origin, width, height, dpi, symbology = part
+	value = get_bound_value(element, live_data)
+
+	if element["kind"] in ("barcode", "qr"):
+		return origin + compile_symbology(
+			symbology, value, width, height, dpi, element.get("show_text", True)
+		)
+
+	text = compile_text(value, element, width, height, dpi)
+	return origin + text if text else ""
+
+
+def compile_text(value, element, width, height, dpi):
+	"""Wrapped text block using the scalable font and ^FB"""
+	if value in (None, ""):
+		return ""
+
+	font_height = max(round(element["font_size"] / 72 * dpi), 10)
+	max_lines = max(1, height // font_height) if height else 1
+	alignment = TEXT_ALIGNMENT.get(element["align"], "L")
+	text = escape_field_data(str(value)).replace("\n", "\\&")
+
+	return (
+		f"^A0N,{font_height},{font_height}"
+		f"^FB{max(width, font_height)},{max_lines},0,{alignment},0"
+		f"^FH^FD{text}^FS"
+	)
+
+
+def compile_symbology(symbology, value, width, height, dpi, show_text=True):
+	"""Native ZPL barcode command for a symbology name as used in Barcode Type Option"""
+	data = escape_field_data(str(value or ""))
+	module = max(1, round(2 * dpi / DEFAULT_DPI))
+	text = "Y" if show_text else "N"
+
+	if symbology in LINEAR_SYMBOLOGIES:
+		# leave room for the interpretation line below the bars
+		bar_height = max(height - (px_to_dots(14, dpi) if show_text else 0), 10)
+		command = LINEAR_SYMBOLOGIES[symbology].format(height=bar_height, text=text)
+		return f"^BY{module},2,{bar_height}{command}^FH^FD{data}^FS"
+
+	size = min(width, height) or px_to_dots(40, dpi)
+	if symbology == "QR Code":
+		return compile_qr(str(value or ""), data, size)
+
+	if symbology == "Data Matrix":
+		return compile_datamatrix(str(value or ""), data, size)
+
+	if symbology == "PDF417":
+		row_height = max(2, height // 20)
+		return f"^BY{module}^B7N,{row_height},2,,,N^FH^FD{data}^FS"
+
+	if symbology == "Aztec Code":
+		magnification = min(10, max(1, size // 30))
+		return f"^B0N,{magnification},N^FH^FD{data}^FS"
+
+	# unknown symbology: fall back to Code128
+	return compile_symbology("Code128", value, width, height, dpi, show_text)
+
+
+def compile_qr(value, data, size):
+	"""^BQ with the version and ECC level of the native encoder, magnified to fill `size` dots"""
+	from barcode.barcode.symbology import MATRIX_QUIET_ZONES
+	from barcode.barcode.symbology.qr import select_version
+
+	try:
+		version, ecc = select_version(value)
+	except ValueError:
+		return f"^BQN,2,{min(10, max(1, size // 30))}^FH^FDMA,{data}^FS"
+
+	modules = version * 4 + 17 + 2 * MATRIX_QUIET_ZONES["QR Code"]
+	return f"^BQN,2,{min(10, max(1, size // modules))}^FH^FD{ecc}A,{data}^FS"
+
+
+def compile_datamatrix(value, data, size):
+	"""^BX (ECC 200) in the symbol size of the native encoder, GS1 fields separated by FNC1"""
+	from barcode.barcode.symbology import MATRIX_QUIET_ZONES, get_matrix
+	from barcode.barcode.symbology.datamatrix import GS, get_gs1_data
+
+	try:
+		symbol_size = len(get_matrix("Data Matrix", value))
+	except ValueError:
+		return f"^BXN,{max(1, size // 24)},200^FH^FD{data}^FS"
+
+	command = f"^BXN,{max(1, size // (symbol_size + 2 * MATRIX_QUIET_ZONES['Data Matrix']))},200,{symbol_size},{symbol_size}"
+	gs1_data = get_gs1_data(value)
+	if gs1_data.startswith(GS):
+		# "~1" is FNC1 with "~" as the escape character, hex escaped for ^FH
+		data = "_7E1" + "_7E1".join(escape_field_data(part) for part in gs1_data[1:].split(GS))
+		command += ",,~"
+	return f"{command}^FH^FD{data}^FS"
+
+
+def escape_field_data(value):
+	"""Escape ZPL control characters for use with ^FH (underscore hex escapes)"""
+	return value.replace("_", "_5F").replace("^", "_5E").replace("~", "_7E")
+
+
+def px_to_dots(value, dpi):
+	return mm_to_dots(flt(value) / DESIGNER_PX_PER_MM, dpi)
+
+
+def mm_to_dots(value, dpi):
+	return round(flt(value) * dpi / 25.4)
+
+
+def get_zpl_graphics(elements, dpi):
+	"""~DG download commands for image elements, their printer object names and
+	whether every graphic could be built"""
+	commands = []
+	names = {}
+	downloaded = {}
+	complete = True
+
+	for index, element in enumerate(elements):
+		if element["kind"] != "image" or not element["image_url"]:
+			continue
+
+		width, height = mm_to_dots(element["width"], dpi), mm_to_dots(element["height"], dpi)
+		key = (hashlib.sha1(element["image_url"].encode()).hexdigest(), width, height)
+		if key in downloaded:
+			names[index] = downloaded[key]
+			continue
+
+		graphic = _graphic_cache.get(key)
+		if graphic is None:
+			graphic = build_graphic(element["image_url"], width, height)
+			if graphic is None:
+				complete = False
+				continue
+			_graphic_cache.set(key, graphic)
+
+		name = "L" + hashlib.sha1(repr(key).encode()).hexdigest()[:7].upper()
+		total_bytes, bytes_per_row, hex_data = graphic
+		commands.append(f"~DGR:{name}.GRF,{total_bytes},{bytes_per_row},{hex_data}")
+		downloaded[key] = names[index] = name
+
+	return commands, names, complete
+
+
+def build_graphic(image_url, width, height):
+	"""Convert an image to a 1-bit ZPL graphic: (total bytes, bytes per row, hex data)"""
+	from PIL import Image
+
+	try:
+		content = read_image(image_url)
+		if not content:
+			return None
+
+		image = Image.open(io.BytesIO(content)).convert("L")
+		image.thumbnail((max(width, 1), max(height, 1)))
+		# ZPL graphics use 1 for black dots; PIL '1' mode uses 1 for white
+		image = image.point(lambda value: 255 if value < 128 else 0).convert("1")
+	except Exception as e:
+		frappe.log_error(f"ZPL graphic conversion error: {e!s}")
+		return None
+
+	bytes_per_row = (image.width + 7) // 8
+	data = image.tobytes()
+	return len(data), bytes_per_row, data.hex().upper()
+
+
+def read_image(image_url):
+	"""Read image bytes from a data URL or a site file URL"""
+	if image_url.startswith("data:"):
+		return base64.b64decode(image_url.split(",", 1)[1])
+
+	path = image_url.split("?", 1)[0]
+	if path.startswith("/private/files/"):
+		base_dir = frappe.get_site_path("private", "files")
+	elif path.startswith("/files/"):
+		base_dir = frappe.get_site_path("public", "files")
+	else:
+		# remote images are not fetched while printing
+		return None
+
+	base_dir = os.path.realpath(base_dir)
+	path = os.path.realpath(os.path.join(base_dir, path.rsplit("/files/", 1)[1]))
+	if not path.startswith(base_dir + os.sep) or not os.path.exists(path):
+		return None
+
+	with open(path, "rb") as f:
+		return f.read()
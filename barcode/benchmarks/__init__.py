@@ -0,0 +1 @@
+"""Offline benchmarks for the label rendering hot paths (see run.py)."""
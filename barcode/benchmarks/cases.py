@@ -0,0 +1,208 @@
+"""Benchmark workloads.
+
+Each case builds the arguments for `n` labels up front (not timed) and names
+the function that renders one label from them. Every label gets distinct data,
+so caches only help where real runs would hit them too.
+"""
+
+import datetime
+import json
+import os
+
+FIXTURES_PATH = os.path.join(
+	os.path.dirname(os.path.dirname(__file__)), "fixtures", "barcode_label_template.json"
+)
+BATCH_TEMPLATE = "Default Batch Label"
+DESIGNER_TEMPLATE = "Outer Box Label"
+# Distinct documents of the reprint case; every label after the first
+# REPRINT_DOCS prints one of them again
+REPRINT_DOCS = 100
+
+DESIGNER_ELEMENTS = [
+	{"type": "item_code", "x": 8, "y": 6, "width": 150, "height": 18, "fontSize": 12, "fontWeight": "bold"},
+	{"type": "item_name", "x": 8, "y": 26, "width": 170, "height": 16, "fontSize": 10},
+	{"type": "batch_no", "x": 8, "y": 44, "width": 120, "height": 14, "fontSize": 9},
+	{"type": "barcode", "x": 8, "y": 60, "width": 160, "height": 40},
+	{"type": "qr", "x": 150, "y": 6, "width": 40, "height": 40, "qrContent": ""},
+	{"type": "line", "x": 8, "y": 104, "width": 170, "height": 2},
+	{
+		"type": "custom_text",
+		"x": 8,
+		"y": 108,
+		"width": 170,
+		"height": 10,
+		"fontSize": 8,
+		"content": "Made in BD",
+	},
+]
+
+VISUAL_ELEMENTS = [
+	{
+		"field": "item_code",
+		"x": 10,
+		"y": 5,
+		"width": 150,
+		"height": 20,
+		"fontSize": "12px",
+		"fontWeight": "bold",
+		"textAlign": "left",
+	},
+	{
+		"field": "item_name",
+		"x": 10,
+		"y": 28,
+		"width": 150,
+		"height": 16,
+		"fontSize": "10px",
+		"fontWeight": "normal",
+		"textAlign": "left",
+	},
+	{
+		"field": "barcode",
+		"x": 10,
+		"y": 48,
+		"width": 160,
+		"height": 50,
+		"fontSize": "8px",
+		"fontWeight": "normal",
+		"textAlign": "center",
+	},
+	{
+		"field": "company",
+		"x": 10,
+		"y": 100,
+		"width": 150,
+		"height": 12,
+		"fontSize": "8px",
+		"fontWeight": "normal",
+		"textAlign": "right",
+	},
+]
+
+
+def load_fixture_templates(frappe):
+	"""Register the shipped label templates in the stub database"""
+	with open(FIXTURES_PATH) as f:
+		templates = json.load(f)
+
+	table = frappe.db.tables.setdefault("Barcode Label Template", {})
+	for template in templates:
+		doc = frappe.get_doc(dict(template, modified="2024-01-01 00:00:00.000000"))
+		table[doc.name] = doc
+	return table
+
+
+def get_batch_doc(frappe, i):
+	return frappe._dict(
+		doctype="Batch",
+		name=f"BATCH-{i:06d}",
+		item=f"ITEM-{i % 500:05d}",
+		manufacturing_date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 365),
+		expiry_date=datetime.date(2025, 1, 1) + datetime.timedelta(days=i % 365),
+		custom_field_1=f"Lot {i % 40}",
+	)
+
+
+def get_designer_data(i):
+	return {
+		"name": "Bench Label",
+		"width": 50,
+		"height": 30,
+		"barcode_type": "Code128",
+		"elements": DESIGNER_ELEMENTS,
+		"liveData": {
+			"item_code": f"ITEM-{i:06d}",
+			"item_name": f"Bench Item {i}",
+			"batch_no": f"BATCH-{i:06d}",
+		},
+	}
+
+
+def setup_prepare_label_data(frappe, n):
+	from barcode.barcode.api import prepare_label_data
+
+	template = frappe.get_doc("Barcode Label Template", DESIGNER_TEMPLATE)
+	args = [
+		(get_batch_doc(frappe, i), "Batch", template, "Bench Company", f"Bench Item {i % 500}")
+		for i in range(n)
+	]
+	return prepare_label_data, args
+
+
+def setup_render_label_html(frappe, n):
+	from barcode.barcode.api import generate_barcode, prepare_label_data, render_label_html
+
+	template = frappe.get_doc("Barcode Label Template", BATCH_TEMPLATE)
+	args = []
+	for i in range(n):
+		data = prepare_label_data(
+			get_batch_doc(frappe, i), "Batch", template, "Bench Company", f"Bench Item {i % 500}"
+		)
+		data["barcode_html"] = generate_barcode(data["barcode_value"], "Code128")
+		args.append((template, data))
+	return render_label_html, args
+
+
+def setup_reprint_barcode_label(frappe, n):
+	from barcode.barcode.api import print_barcode_label
+
+	batches = frappe.db.tables.setdefault("Batch", {})
+	for i in range(min(n, REPRINT_DOCS)):
+		doc = get_batch_doc(frappe, i)
+		batches[doc.name] = doc
+	return print_barcode_label, [("Batch", f"BATCH-{i % REPRINT_DOCS:06d}", BATCH_TEMPLATE) for i in range(n)]
+
+
+def setup_generate_label_html(frappe, n):
+	from barcode.barcode.print_api import generate_label_html
+
+	return generate_label_html, [(get_designer_data(i), 1) for i in range(n)]
+
+
+def setup_generate_zpl_commands(frappe, n):
+	from barcode.barcode.print_api import generate_zpl_commands
+
+	return generate_zpl_commands, [(get_designer_data(i), 1) for i in range(n)]
+
+
+def setup_write_label_pdf(frappe, n):
+	from barcode.barcode.print_api import write_label_pdf
+
+	# the PDFs are discarded so the peak memory is the writer's, not the output's
+	output = open(os.devnull, "wb")
+	return write_label_pdf, [(get_designer_data(i), 1, output) for i in range(n)]
+
+
+def setup_generate_barcode_base64(frappe, n):
+	from barcode.barcode.print_api import generate_barcode_base64
+
+	return generate_barcode_base64, [(f"ITEM-{i:06d}",) for i in range(n)]
+
+
+def setup_generate_qr_base64(frappe, n):
+	from barcode.barcode.print_api import generate_qr_base64
+
+	return generate_qr_base64, [(f"https://example.com/i/ITEM-{i:06d}",) for i in range(n)]
+
+
+def setup_generate_template_from_elements(frappe, n):
+	from barcode.barcode.api import generate_template_from_elements
+
+	args = []
+	for i in range(n):
+		elements = [dict(element, x=element["x"] + i % 7) for element in VISUAL_ELEMENTS]
+		args.append((elements,))
+	return generate_template_from_elements, args
+
+
+CASES = {
+	"prepare_label_data": setup_prepare_label_data,
+	"render_label_html": setup_render_label_html,
+	"reprint_barcode_label": setup_reprint_barcode_label,
+	"generate_label_html": setup_generate_label_html,
+	"generate_zpl_commands": setup_generate_zpl_commands,
+	"write_label_pdf": setup_write_label_pdf,
+	"generate_barcode_base64": setup_generate_barcode_base64,
+	"generate_qr_base64": setup_generate_qr_base64,
+	"generate_template_from_elements": setup_generate_template_from_elements,
+}
@@ -0,0 +1,258 @@
+"""Minimal in-memory stand-in for the `frappe` module.
+
+Installed into `sys.modules` before the app is imported so the label rendering
+code can be benchmarked offline, without a site, database or Redis. Only the
+parts of the frappe API used by the rendering paths are provided.
+"""
+
+import datetime
+import os
+import re
+import sys
+import tempfile
+import threading
+import types
+import uuid
+from html import escape
+
+# Barcode Label Settings values; fields not listed read as None like unset fields
+SETTINGS = {
+	"default_barcode_type": "Code128",
+	"image_cache_size": 32,
+	"enable_shared_image_cache": 0,
+	"sheet_profile": "A4 (Auto Fit)",
+}
+
+# Source reads of `label_fetch`: columns of `tab<doctype>` aliased src, the
+# linked item's name joined in
+_LABEL_FETCH_QUERY = re.compile(r"select (?P<fields>.*?)\s+from `tab(?P<doctype>[^`]+)` src", re.S)
+_ITEM_JOIN = re.compile(r"on item\.name = src\.`(\w+)`")
+
+
+class _dict(dict):
+	def __getattr__(self, key):
+		return self.get(key)
+
+	def __setattr__(self, key, value):
+		self[key] = value
+
+
+class Document(_dict):
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+
+	def as_dict(self, **kwargs):
+		return _dict(self)
+
+
+class Cache:
+	"""Dict backed replacement for frappe's Redis wrapper"""
+
+	def __init__(self):
+		self.data = {}
+
+	def get_value(self, key, generator=None, **kwargs):
+		if key not in self.data and generator:
+			self.data[key] = generator()
+		return self.data.get(key)
+
+	def set_value(self, key, value, **kwargs):
+		self.data[key] = value
+
+	def delete_value(self, keys):
+		for key in keys if isinstance(keys, (list, tuple)) else [keys]:
+			self.data.pop(key, None)
+
+	def hget(self, name, key, **kwargs):
+		return self.data.get(name, {}).get(key)
+
+	def hset(self, name, key, value, **kwargs):
+		self.data.setdefault(name, {})[key] = value
+
+	def hdel(self, name, key):
+		self.data.get(name, {}).pop(key, None)
+
+	def hgetall(self, name):
+		return self.data.get(name, {})
+
+
+class Database:
+	"""In-memory tables keyed by doctype and name"""
+
+	def __init__(self):
+		self.tables = {}
+		self.inserted = 0
+
+	def get_single_value(self, doctype, fieldname, cache=False):
+		return SETTINGS.get(fieldname)
+
+	def get_value(self, doctype, name, fieldname="name", **kwargs):
+		doc = self.tables.get(doctype, {}).get(name) if isinstance(name, str) else None
+		if not doc:
+			return None
+		if isinstance(fieldname, (list, tuple)):
+			return tuple(doc.get(field) for field in fieldname)
+		return doc.get(fieldname)
+
+	def exists(self, doctype, name=None, **kwargs):
+		return name in self.tables.get(doctype, {})
+
+	def bulk_insert(self, doctype, fields, values, **kwargs):
+		self.inserted += len(values)
+
+	def commit(self):
+		pass
+
+	def sql(self, query, values=None, as_dict=False, **kwargs):
+		match = _LABEL_FETCH_QUERY.search(query)
+		if not match or not isinstance(values, dict) or "names" not in values:
+			return []
+
+		columns = re.findall(r"src\.`(\w+)`", match.group("fields"))
+		join = _ITEM_JOIN.search(query)
+		rows = []
+		for name in values["names"]:
+			doc = self.tables.get(match.group("doctype"), {}).get(name)
+			if doc is None:
+				continue
+			row = _dict({column: doc.get(column) for column in columns})
+			if join:
+				item = self.tables.get("Item", {}).get(doc.get(join.group(1)))
+				row["item_name"] = item.get("item_name") if item else None
+			rows.append(row)
+		return rows
+
+
+class ValidationError(Exception):
+	pass
+
+
+class DoesNotExistError(ValidationError):
+	pass
+
+
+class PermissionError(Exception):
+	pass
+
+
+def install():
+	"""Register the stub as `frappe` (and its used submodules) and return it"""
+	frappe = types.ModuleType("frappe")
+	frappe.__path__ = []
+	site_path = tempfile.mkdtemp(prefix="barcode-bench-")
+
+	frappe._dict = _dict
+	frappe._ = lambda message, *args: message
+	frappe.local = threading.local()
+	frappe.local.response = _dict()
+	frappe.session = _dict(user="Administrator")
+	frappe.flags = _dict()
+	frappe.conf = _dict()
+	frappe.db = Database()
+	frappe.defaults = types.SimpleNamespace(get_user_default=lambda key: "Bench Company")
+	frappe.ValidationError = ValidationError
+	frappe.DoesNotExistError = DoesNotExistError
+	frappe.PermissionError = PermissionError
+
+	cache = Cache()
+	frappe.cache = lambda: cache
+	frappe.whitelist = lambda *args, **kwargs: args[0] if args and callable(args[0]) else (lambda fn: fn)
+	frappe.only_for = lambda *args, **kwargs: None
+	frappe.log_error = lambda *args, **kwargs: None
+	frappe.publish_realtime = lambda *args, **kwargs: None
+	frappe.enqueue = lambda *args, **kwargs: None
+	frappe.get_roles = lambda user=None: ["System Manager"]
+	frappe.generate_hash = lambda txt=None, length=10: uuid.uuid4().hex[:length]
+	frappe.get_site_path = lambda *path: os.path.join(site_path, *path)
+	frappe.safe_decode = lambda value: value.decode() if isinstance(value, bytes) else value
+
+	def throw(message, exc=ValidationError, *args, **kwargs):
+		raise exc(message)
+
+	def get_doc(doctype, name=None):
+		if isinstance(doctype, dict):
+			return Document(doctype)
+		doc = frappe.db.tables.get(doctype, {}).get(name)
+		if doc is None:
+			raise DoesNotExistError(f"{doctype} {name} not found")
+		return doc
+
+	def get_all(doctype, filters=None, fields=None, **kwargs):
+		rows = list(frappe.db.tables.get(doctype, {}).values())
+		if isinstance(filters, dict) and "name" in filters:
+			names = set(filters["name"][1])
+			rows = [row for row in rows if row.name in names]
+		if fields and fields != ["*"]:
+			rows = [_dict({field: row.get(field) for field in fields}) for row in rows]
+		return rows
+
+	def render_template(template, context):
+		return get_jenv().from_string(template).render(context)
+
+	frappe.throw = throw
+	frappe.get_doc = get_doc
+	frappe.get_cached_doc = get_doc
+	frappe.get_single = lambda doctype: Document(SETTINGS, name=doctype)
+	frappe.get_all = get_all
+	frappe.get_list = get_all
+	frappe.render_template = render_template
+
+	utils = types.ModuleType("frappe.utils")
+	utils.__path__ = []
+	utils.now = lambda: str(datetime.datetime.now())
+	utils.now_datetime = datetime.datetime.now
+	utils.get_datetime = lambda value=None: value or datetime.datetime.now()
+	utils.get_url = lambda path="": "http://localhost" + path
+	utils.get_site_path = frappe.get_site_path
+	utils.escape_html = escape
+	utils.cint = cint
+	utils.flt = flt
+	utils.cstr = lambda value: "" if value is None else str(value)
+
+	jinja = types.ModuleType("frappe.utils.jinja")
+	environment = {}
+
+	def get_jenv():
+		if "env" not in environment:
+			import jinja2
+
+			environment["env"] = jinja2.Environment()
+		return environment["env"]
+
+	jinja.get_jenv = get_jenv
+
+	model = types.ModuleType("frappe.model")
+	model.__path__ = []
+	document = types.ModuleType("frappe.model.document")
+	document.Document = Document
+
+	frappe.utils = utils
+	utils.jinja = jinja
+	frappe.model = model
+	model.document = document
+
+	sys.modules.update(
+		{
+			"frappe": frappe,
+			"frappe.utils": utils,
+			"frappe.utils.jinja": jinja,
+			"frappe.model": model,
+			"frappe.model.document": document,
+		}
+	)
+	return frappe
+
+
+def cint(value, default=0):
+	try:
+		return int(float(value))
+	except (TypeError, ValueError):
+		return default
+
+
+def flt(value, precision=None):
+	try:
+		value = float(value)
+	except (TypeError, ValueError):
+		return 0.0
+	return round(value, precision) if precision is not None else value
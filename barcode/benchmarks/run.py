@@ -0,0 +1,218 @@
+"""Run the label rendering benchmarks.
+
+	python -m barcode.benchmarks.run [--sizes 1,100,10000,100000] [--cases a,b] [--repeat 3]
+	                                 [--tolerance 0.3] [--update-baseline]
+
+Each case and size runs in a fresh interpreter against the stubbed frappe
+module, so caches and peak memory of one run do not leak into the next. Small
+sizes are run several times and the best run is kept. The exit status is 1
+when a run regresses past the stored baseline.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from array import array
+
+DEFAULT_SIZES = (1, 100, 10_000, 100_000)
+DEFAULT_TOLERANCE = 0.3
+DEFAULT_REPEAT = 3
+# Runs are repeated (best one kept) only while a repeat stays under this many labels
+REPEAT_LABEL_BUDGET = 100_000
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Runs this small are dominated by timer noise and interpreter warm-up
+MIN_COMPARED_SIZE = 100
+# Absolute slack added to relative limits so tiny numbers do not flap
+LATENCY_SLACK_MS = 0.05
+MEMORY_SLACK_KB = 2048
+
+
+def run_case(case, size):
+	"""Run one case in this process and return its measurements"""
+	from barcode.benchmarks.frappe_stub import install
+
+	frappe = install()
+
+	from barcode.benchmarks.cases import CASES, load_fixture_templates
+
+	load_fixture_templates(frappe)
+	func, args = CASES[case](frappe, size)
+
+	timings = array("d")
+	rss_before = get_current_rss_kb()
+	started = time.perf_counter()
+	for call_args in args:
+		call_started = time.perf_counter()
+		func(*call_args)
+		timings.append(time.perf_counter() - call_started)
+	elapsed = time.perf_counter() - started
+
+	timings = sorted(timings)
+	return {
+		"labels": size,
+		"seconds": round(elapsed, 4),
+		"throughput": round(size / elapsed, 1) if elapsed else 0,
+		"p50_ms": round(percentile(timings, 0.50) * 1000, 4),
+		"p99_ms": round(percentile(timings, 0.99) * 1000, 4),
+		"peak_kb": max(0, get_peak_rss_kb() - rss_before),
+	}
+
+
+def percentile(sorted_values, fraction):
+	if not sorted_values:
+		return 0
+	return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+def get_current_rss_kb():
+	try:
+		with open("/proc/self/statm") as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+	except OSError:
+		# no procfs: fall back to the high-water mark so far
+		return get_peak_rss_kb()
+
+
+def get_peak_rss_kb():
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# macOS reports bytes, Linux kilobytes
+	return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_best_of(case, size, repeat):
+	"""Best (highest throughput) of up to `repeat` isolated runs, to damp scheduler noise"""
+	repeat = max(1, min(repeat, REPEAT_LABEL_BUDGET // max(size, 1)))
+	return max((run_isolated(case, size) for _i in range(repeat)), key=lambda result: result["throughput"])
+
+
+def run_isolated(case, size):
+	"""Run one case in a child interpreter"""
+	env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [APP_ROOT, os.environ.get("PYTHONPATH")])))
+	result = subprocess.run(
+		[sys.executable, "-m", "barcode.benchmarks.run", "--worker", case, str(size)],
+		capture_output=True,
+		text=True,
+		env=env,
+		cwd=APP_ROOT,
+	)
+	if result.returncode:
+		raise RuntimeError(f"{case} at {size} labels failed:\n{result.stderr}")
+	return json.loads(result.stdout.splitlines()[-1])
+
+
+def find_regressions(case, result, baseline, tolerance):
+	"""Human readable regressions of `result` against its baseline entry"""
+	if not baseline or result["labels"] < MIN_COMPARED_SIZE:
+		return []
+
+	regressions = []
+	if result["throughput"] < baseline["throughput"] * (1 - tolerance):
+		regressions.append(f"throughput {result['throughput']}/s < baseline {baseline['throughput']}/s")
+	if result["p99_ms"] > baseline["p99_ms"] * (1 + tolerance) + LATENCY_SLACK_MS:
+		regressions.append(f"p99 {result['p99_ms']}ms > baseline {baseline['p99_ms']}ms")
+	if result["peak_kb"] > baseline["peak_kb"] * (1 + tolerance) + MEMORY_SLACK_KB:
+		regressions.append(f"peak memory {result['peak_kb']}KB > baseline {baseline['peak_kb']}KB")
+
+	return [f"{case} @ {result['labels']}: {message}" for message in regressions]
+
+
+def load_baseline(path):
+	if not os.path.exists(path):
+		return {}
+	with open(path) as f:
+		return json.load(f)
+
+
+def save_baseline(path, results):
+	baseline = {
+		"_meta": {
+			"python": platform.python_version(),
+			"machine": platform.machine(),
+			"recorded": time.strftime("%Y-%m-%d"),
+		},
+	}
+	baseline.update(results)
+	with open(path, "w") as f:
+		json.dump(baseline, f, indent=1, sort_keys=True)
+		f.write("\n")
+
+
+def print_row(columns):
+	print("{:<32} {:>8} {:>12} {:>10} {:>10} {:>10}".format(*columns))
+
+
+def main(argv=None):
+	from barcode.benchmarks.cases import CASES
+
+	parser = argparse.ArgumentParser(description="Benchmark the label rendering hot paths")
+	parser.add_argument(
+		"--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma separated label counts"
+	)
+	parser.add_argument("--cases", default=",".join(CASES), help="comma separated case names")
+	parser.add_argument("--baseline", default=BASELINE_PATH)
+	parser.add_argument(
+		"--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative regression"
+	)
+	parser.add_argument(
+		"--repeat", type=int, default=DEFAULT_REPEAT, help="runs per case and size, best one kept"
+	)
+	parser.add_argument(
+		"--update-baseline", action="store_true", help="store these results as the new baseline"
+	)
+	parser.add_argument("--worker", nargs=2, metavar=("CASE", "SIZE"), help=argparse.SUPPRESS)
+	args = parser.parse_args(argv)
+
+	if args.worker:
+		print(json.dumps(run_case(args.worker[0], int(args.worker[1]))))
+		return 0
+
+	sizes = [int(size) for size in args.sizes.split(",")]
+	cases = [case.strip() for case in args.cases.split(",")]
+	unknown = set(cases) - set(CASES)
+	if unknown:
+		parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+	baseline = load_baseline(args.baseline)
+	results = {}
+	regressions = []
+
+	print_row(("case", "labels", "labels/s", "p50 ms", "p99 ms", "peak KB"))
+	for case in cases:
+		for size in sizes:
+			result = run_best_of(case, size, args.repeat)
+			results.setdefault(case, {})[str(size)] = result
+			print_row(
+				(case, size, result["throughput"], result["p50_ms"], result["p99_ms"], result["peak_kb"])
+			)
+			regressions += find_regressions(
+				case, result, baseline.get(case, {}).get(str(size)), args.tolerance
+			)
+
+	if args.update_baseline:
+		# keep entries of cases/sizes that were not part of this run
+		for case, case_results in results.items():
+			baseline.setdefault(case, {}).update(case_results)
+		baseline.pop("_meta", None)
+		save_baseline(args.baseline, baseline)
+		print(f"Baseline written to {args.baseline}")
+		return 0
+
+	if regressions:
+		print("\nRegressions:")
+		for regression in regressions:
+			print(f"  {regression}")
+		return 1
+
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
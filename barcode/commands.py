@@ -0,0 +1,73 @@
+import os
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("render-labels")
+@click.argument("file_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--template", required=True, help="Barcode Label Template to print with")
+@click.option(
+	"--format", "output", type=click.Choice(("pdf", "zpl", "html")), default="pdf", show_default=True
+)
+@click.option(
+	"--output",
+	"output_path",
+	required=True,
+	type=click.Path(dir_okay=False),
+	help="File to write the labels to",
+)
+@click.option(
+	"--map",
+	"mappings",
+	multiple=True,
+	metavar="FIELD=COLUMN",
+	help="Read a label field from a column, e.g. item_code=SKU",
+)
+@click.option("--dpi", type=int, help="Printer resolution for ZPL output")
+@click.option("--raster", is_flag=True, help="Print ZPL labels as rendered graphics")
+@click.option("--sheet-profile", help="Sheet profile for PDF output")
+@pass_context
+def render_labels(context, file_path, template, output, output_path, mappings, dpi, raster, sheet_profile):
+	"""Print one label per row of a CSV or XLSX file
+
+	Rows are streamed from FILE_PATH and the labels to the output file, so
+	files of any size can be printed with bounded memory.
+	"""
+	import frappe
+
+	from barcode.barcode.file_labels import FILE_EXTENSIONS, write_file_labels
+
+	if not file_path.lower().endswith(FILE_EXTENSIONS):
+		raise click.BadParameter("must be a .csv or .xlsx file", param_hint="FILE_PATH")
+
+	mapping = {}
+	for value in mappings:
+		field, separator, column = value.partition("=")
+		if not separator:
+			raise click.BadParameter(f"{value} is not FIELD=COLUMN", param_hint="--map")
+		mapping[field.strip()] = column.strip()
+
+	options = {"dpi": dpi, "raster": raster, "sheet_profile": sheet_profile}
+
+	def progress(stats):
+		click.echo(f"{stats['rows']} rows, {stats['labels']} labels", err=True)
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		template_doc = frappe.get_doc("Barcode Label Template", template)
+		with open(output_path, "wb") as f:
+			stats = write_file_labels(
+				os.path.abspath(file_path), template_doc, output, f, mapping, options, progress
+			)
+	finally:
+		frappe.destroy()
+
+	click.echo(
+		f"Wrote {stats['labels']} labels from {stats['rows']} rows to {output_path} "
+		f"in {stats['seconds']}s ({stats['labels_per_second']} labels/s)"
+	)
+
+
+commands = [render_labels]
@@ -48,6 +48,8 @@ doctype_js = {
 	"Batch": "public/js/batch.js",
 	"Serial No": "public/js/serial_no.js",
 	"Delivery Note": "public/js/delivery_note.js",
+	"Purchase Receipt": "public/js/purchase_receipt.js",
+	"Stock Entry": "public/js/stock_entry.js",
 	"Barcode Label Template": "public/js/barcode_label_template.js"
 }
 # doctype_list_js = {"doctype" : "public/js/doctype_list.js"}
@@ -155,9 +157,32 @@ fixtures = ["Barcode Label Template"]
 # 	}
 # }
 
+doc_events = {
+	doctype: {
+		"on_update": "barcode.barcode.label_cache.invalidate_label_cache",
+		"on_trash": "barcode.barcode.label_cache.invalidate_label_cache",
+		"after_rename": "barcode.barcode.label_cache.invalidate_label_cache"
+	}
+	for doctype in ("Item", "Batch", "Serial No")
+}
+
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+	"all": [
+		"barcode.barcode.label_jobs.resume_stale_label_jobs",
+		"barcode.barcode.print_log.load_spooled_print_logs"
+	],
+	"hourly": [
+		"barcode.barcode.artifact_store.prune_artifacts"
+	],
+	"daily_long": [
+		"barcode.barcode.print_log_rollup.rollup_print_logs",
+		"barcode.barcode.print_log_rollup.archive_print_logs"
+	]
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"barcode.tasks.all"
@@ -207,12 +232,12 @@ fixtures = ["Barcode Label Template"]
 # Request Events
 # ----------------
 # before_request = ["barcode.utils.before_request"]
-# after_request = ["barcode.utils.after_request"]
+after_request = ["barcode.barcode.print_log.flush_print_logs"]
 
 # Job Events
 # ----------
 # before_job = ["barcode.utils.before_job"]
-# after_job = ["barcode.utils.after_job"]
+after_job = ["barcode.barcode.print_log.flush_print_logs"]
 
 # User Data Protection
 # --------------------
@@ -0,0 +1,6 @@
+from barcode.barcode.doctype.barcode_print_log.barcode_print_log import on_doctype_update
+
+
+def execute():
+	"""Add the report and archival indexes of Barcode Print Log on existing sites"""
+	on_doctype_update()
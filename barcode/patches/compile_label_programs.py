@@ -0,0 +1,15 @@
+import frappe
+
+
+def execute():
+	"""Store the compiled label program of every existing Barcode Label Template"""
+	for name in frappe.get_all("Barcode Label Template", pluck="name"):
+		template = frappe.get_doc("Barcode Label Template", name)
+		template.update_label_program()
+		template.db_set(
+			{
+				"label_program": template.label_program,
+				"label_program_hash": template.label_program_hash,
+			},
+			update_modified=False,
+		)
@@ -62,7 +62,9 @@ function get_template_type(doctype) {
         'Item': 'Item',
         'Batch': 'Batch',
         'Serial No': 'Serial No',
-        'Delivery Note': 'General'
+        'Delivery Note': 'General',
+        'Purchase Receipt': 'General',
+        'Stock Entry': 'General'
     };
     return type_map[doctype] || 'General';
 }
@@ -80,29 +82,7 @@ function print_barcode_label(doctype, docname, values) {
         callback: function(r) {
             if (r.message && r.message.success) {
                 // Open print preview
-                let print_window = window.open('', '_blank');
-                print_window.document.write(`
-                    <html>
-                    <head>
-                        <title>Barcode Label</title>
-                        <style>
-                            body { margin: 0; padding: 10px; }
-                            @media print {
-                                body { margin: 0; padding: 0; }
-                            }
-                        </style>
-                    </head>
-                    <body>
-                        ${r.message.html.repeat(values.copies)}
-                        <script>
-                            window.onload = function() {
-                                window.print();
-                            };
-                        </script>
-                    </body>
-                    </html>
-                `);
-                print_window.document.close();
+                barcode.open_label_print_window(r.message.html.repeat(values.copies));
                 
                 frappe.show_alert({
                     message: __('Label printed successfully'),
@@ -119,6 +99,139 @@ function print_barcode_label(doctype, docname, values) {
     });
 }
 
+barcode.open_label_print_window = function(labels_html) {
+    let print_window = window.open('', '_blank');
+    print_window.document.write(`
+        <html>
+        <head>
+            <title>Barcode Label</title>
+            <style>
+                body { margin: 0; padding: 10px; }
+                @media print {
+                    body { margin: 0; padding: 0; }
+                }
+            </style>
+        </head>
+        <body>
+            ${labels_html}
+            <script>
+                window.onload = function() {
+                    window.print();
+                };
+            </script>
+        </body>
+        </html>
+    `);
+    print_window.document.close();
+};
+
+// Labels for the item rows of a Delivery Note, Purchase Receipt or Stock Entry,
+// expanded per batch / serial number (and quantity) on the server
+barcode.print_transaction_labels = function(frm) {
+    if (!(frm.doc.items || []).length) {
+        frappe.msgprint(__('No items found in this {0}', [__(frm.doctype)]));
+        return;
+    }
+
+    let dialog = new frappe.ui.Dialog({
+        title: __('Print Item Labels'),
+        fields: [
+            {
+                fieldtype: 'HTML',
+                fieldname: 'items_info',
+                options: `<p>${__('Item rows')}: ${frm.doc.items.length}</p>`
+            },
+            {
+                fieldtype: 'Link',
+                fieldname: 'template',
+                label: __('Template'),
+                options: 'Barcode Label Template',
+                reqd: 1,
+                get_query: function() {
+                    return {
+                        filters: {
+                            template_type: ['in', ['Item', 'Batch', 'Serial No', 'General']]
+                        }
+                    };
+                }
+            },
+            {
+                fieldtype: 'Check',
+                fieldname: 'per_qty',
+                label: __('One Label per Unit'),
+                description: __('Print one label for every unit of stock quantity instead of one per row or batch')
+            },
+            {
+                fieldtype: 'Select',
+                fieldname: 'output',
+                label: __('Output'),
+                options: [
+                    {value: 'html', label: __('Browser Print')},
+                    {value: 'pdf', label: __('PDF')},
+                    {value: 'zpl', label: __('Thermal Printer')}
+                ],
+                default: 'html'
+            },
+            {
+                fieldtype: 'Data',
+                fieldname: 'printer_ip',
+                label: __('Printer IP'),
+                depends_on: "eval:doc.output === 'zpl'",
+                mandatory_depends_on: "eval:doc.output === 'zpl'"
+            }
+        ],
+        primary_action_label: __('Print Labels'),
+        primary_action: function(values) {
+            print_transaction_labels(frm, values);
+            dialog.hide();
+        }
+    });
+
+    dialog.show();
+};
+
+function print_transaction_labels(frm, values) {
+    frappe.call({
+        method: 'barcode.barcode.transaction_labels.print_transaction_labels',
+        args: {
+            doctype: frm.doctype,
+            docname: frm.doc.name,
+            template: values.template,
+            per_qty: values.per_qty,
+            output: values.output,
+            print_settings: {printerIP: values.printer_ip}
+        },
+        freeze: true,
+        callback: function(r) {
+            if (!r.message) {
+                return;
+            }
+            if (r.message.queued) {
+                barcode.track_label_job(r.message.job_id);
+                return;
+            }
+            if (!r.message.success) {
+                frappe.msgprint({
+                    title: __('Print Error'),
+                    message: r.message.error || __('Failed to print labels'),
+                    indicator: 'red'
+                });
+                return;
+            }
+
+            if (r.message.html) {
+                barcode.open_label_print_window(r.message.html);
+            } else if (r.message.pdf_url) {
+                window.open(r.message.pdf_url);
+            }
+            frappe.show_alert({
+                message: r.message.message || __('Printed {0} labels', [r.message.labels]),
+                indicator: 'green'
+            });
+        }
+    });
+}
+
 // Bulk print function
 barcode.bulk_print = function(doctype, selected_docs) {
     if (!selected_docs || selected_docs.length === 0) {
@@ -176,9 +289,16 @@ function bulk_print_labels(doctype, docnames, values) {
             copies: values.copies
         },
         callback: function(r) {
-            if (r.message) {
-                let success_count = r.message.filter(result => result.success).length;
-                let total_count = r.message.length;
+            if (r.message && r.message.queued) {
+                barcode.track_label_job(r.message.job_id);
+            } else if (r.message) {
+                let results = r.message.results || [];
+                let success_count = results.filter(result => result.success).length;
+                let total_count = results.length;
+                
+                if (r.message.html) {
+                    barcode.open_label_print_window(r.message.html);
+                }
                 
                 frappe.show_alert({
                     message: __('Printed {0} of {1} labels successfully', [success_count, total_count]),
@@ -187,4 +307,49 @@ function bulk_print_labels(doctype, docnames, values) {
             }
         }
     });
-}
\ No newline at end of file
+}
+
+// Follow a background label job through realtime progress events
+barcode.track_label_job = function(job_id) {
+    const title = __('Printing Labels');
+    frappe.show_alert({
+        message: __('Large label run queued, you will be notified when it is ready'),
+        indicator: 'blue'
+    });
+
+    const on_progress = function(data) {
+        if (data.job_id !== job_id) return;
+
+        frappe.show_progress(title, data.processed, data.total, __('{0} labels rendered', [data.labels]));
+
+        if (data.status === 'Completed') {
+            frappe.realtime.off('barcode_label_job_progress', on_progress);
+            frappe.hide_progress();
+            window.open(`/api/method/barcode.barcode.label_jobs.download_label_job_output?job_id=${encodeURIComponent(job_id)}`);
+            frappe.show_alert({
+                message: __('Rendered {0} labels, {1} failed', [data.labels, data.failed_count]),
+                indicator: data.failed_count ? 'orange' : 'green'
+            });
+        } else if (data.status === 'Failed') {
+            frappe.realtime.off('barcode_label_job_progress', on_progress);
+            frappe.hide_progress();
+            frappe.msgprint({
+                title: __('Label Job Failed'),
+                message: data.error || __('Label job failed'),
+                indicator: 'red',
+                primary_action: {
+                    label: __('Resume'),
+                    action: function() {
+                        frappe.call({
+                            method: 'barcode.barcode.label_jobs.resume_label_job',
+                            args: { job_id: job_id },
+                            callback: () => barcode.track_label_job(job_id)
+                        });
+                    }
+                }
+            });
+        }
+    };
+
+    frappe.realtime.on('barcode_label_job_progress', on_progress);
+};
@@ -0,0 +1,155 @@
+// Incremental label preview for the visual designer
+//
+// The server keeps the compiled label of a preview session; every designer
+// change is sent as a diff of the elements that changed and only the
+// fragments the server returns are patched into the preview window.
+frappe.provide('barcode');
+
+barcode.LabelPreviewSession = class LabelPreviewSession {
+	constructor(get_template_data) {
+		this.get_template_data = get_template_data;
+		this.session_id = null;
+		this.window = null;
+		this.sent = null;
+		this.busy = false;
+		this.pending = false;
+		this.compress = typeof DecompressionStream !== 'undefined' ? 1 : 0;
+	}
+
+	open() {
+		// open the window right away, popup blockers only allow it inside the click
+		this.window = window.open('', 'barcode_label_preview', 'width=800,height=600');
+		const data = this.get_template_data();
+		this.sent = this.snapshot(data);
+		this.busy = true;
+		return this.call('barcode.barcode.preview_session.start_preview_session', {
+			template_data: data
+		}).then(message => {
+			this.session_id = message.session_id;
+			this.window.document.open();
+			this.window.document.write(message.head + '<div class="label"></div></body></html>');
+			this.window.document.close();
+			this.apply(message);
+		}).finally(() => this.done());
+	}
+
+	is_open() {
+		return this.session_id && this.window && !this.window.closed;
+	}
+
+	// Called after every designer change; requests never overlap and changes
+	// made while one is in flight are sent together once it returns
+	sync() {
+		if (!this.is_open()) return;
+		if (this.busy) {
+			this.pending = true;
+			return;
+		}
+
+		const data = this.get_template_data();
+		const current = this.snapshot(data);
+		const changes = this.diff(this.sent, current, data);
+		if (!changes) return;
+
+		this.sent = current;
+		this.busy = true;
+		this.call('barcode.barcode.preview_session.update_preview_session', {
+			session_id: this.session_id,
+			changes: changes
+		}).then(message => this.apply(message), () => {
+			// the session expired: start over with the whole label
+			this.window.close();
+			this.session_id = null;
+		}).finally(() => this.done());
+	}
+
+	done() {
+		this.busy = false;
+		if (this.pending) {
+			this.pending = false;
+			this.sync();
+		}
+	}
+
+	snapshot(data) {
+		const elements = {};
+		(data.elements || []).forEach(element => {
+			elements[element.id] = JSON.stringify(element);
+		});
+		return {
+			label: JSON.stringify([data.width, data.height, data.barcode_type]),
+			data: JSON.stringify(data.liveData || null),
+			order: (data.elements || []).map(element => element.id),
+			elements: elements
+		};
+	}
+
+	diff(previous, current, data) {
+		const changes = {};
+		const upsert = {};
+		Object.keys(current.elements).forEach(id => {
+			if (current.elements[id] !== previous.elements[id]) {
+				upsert[id] = JSON.parse(current.elements[id]);
+			}
+		});
+		const remove = Object.keys(previous.elements).filter(id => !(id in current.elements));
+
+		if (Object.keys(upsert).length) changes.upsert = upsert;
+		if (remove.length) changes.remove = remove;
+		if (current.order.join() !== previous.order.join()) changes.order = current.order;
+		if (current.label !== previous.label) changes.label = data;
+		if (current.data !== previous.data) changes.data = data.liveData || null;
+		return Object.keys(changes).length ? changes : null;
+	}
+
+	apply(message) {
+		const doc = this.window.document;
+		const label = doc.querySelector('.label');
+
+		if (message.label) {
+			label.style.width = message.label.width + 'mm';
+			label.style.height = message.label.height + 'mm';
+		}
+
+		(message.removed || []).forEach(id => {
+			const node = label.querySelector(`[data-id="${id}"]`);
+			node && node.remove();
+		});
+
+		Object.entries(message.elements || {}).forEach(([id, fragment]) => {
+			let node = label.querySelector(`[data-id="${id}"]`);
+			if (!node) {
+				node = doc.createElement('div');
+				node.className = 'element';
+				node.dataset.id = id;
+				label.appendChild(node);
+			}
+			if (fragment.style !== undefined) node.setAttribute('style', fragment.style);
+			if (fragment.html !== undefined) node.innerHTML = fragment.html;
+		});
+
+		// later elements stack above earlier ones
+		(message.order || []).forEach(id => {
+			const node = label.querySelector(`[data-id="${id}"]`);
+			node && label.appendChild(node);
+		});
+	}
+
+	call(method, args) {
+		args.compress = this.compress;
+		return new Promise((resolve, reject) => {
+			frappe.call({ method: method, args: args, error: reject }).then(r => {
+				r && r.message ? this.decode(r.message).then(resolve, reject) : reject(r);
+			}, reject);
+		});
+	}
+
+	// Large responses arrive deflated and base64 encoded
+	decode(message) {
+		if (message.encoding !== 'deflate') return Promise.resolve(message);
+
+		const bytes = Uint8Array.from(atob(message.data), c => c.charCodeAt(0));
+		const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+		return new Response(stream).text().then(text => JSON.parse(text));
+	}
+};
@@ -0,0 +1,9 @@
+frappe.ui.form.on('Stock Entry', {
+    refresh: function(frm) {
+        if (!frm.doc.__islocal && frm.doc.docstatus === 1) {
+            frm.add_custom_button(__('Print Item Labels'), function() {
+                barcode.print_transaction_labels(frm);
+            }, __('Actions'));
+        }
+    }
+});
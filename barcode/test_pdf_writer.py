@@ -0,0 +1,105 @@
+"""Tests of the native label PDF writer.
+
+	python -m unittest barcode.test_pdf_writer
+
+Without a frappe installation the benchmark stub stands in for it. The written
+PDFs are read back with pypdf; those tests are skipped without it.
+"""
+
+import io
+import unittest
+
+try:
+	import frappe
+except ImportError:
+	from barcode.benchmarks.frappe_stub import install
+
+	frappe = install()
+
+try:
+	import pypdf
+except ImportError:
+	pypdf = None
+
+from barcode.barcode.imposition import get_sheet_layout
+from barcode.barcode.label_program import compile_label_program
+from barcode.barcode.pdf_writer import UnsupportedLabelError, can_write_natively, write_program_pdf
+from barcode.benchmarks.cases import get_designer_data
+
+PT_PER_MM = 72 / 25.4
+
+needs_reader = unittest.skipUnless(pypdf, "pypdf is needed to read the written PDFs")
+
+
+def write_pdf(program, labels_data, layout=None, copies=1):
+	output = io.BytesIO()
+	page_count = write_program_pdf(program, labels_data, output, layout, copies)
+	return page_count, pypdf.PdfReader(io.BytesIO(output.getvalue()))
+
+
+@needs_reader
+class TestPdfWriter(unittest.TestCase):
+	def setUp(self):
+		self.data = get_designer_data(1)
+		self.program = compile_label_program(self.data)
+
+	def test_label_pages(self):
+		labels_data = [get_designer_data(i)["liveData"] for i in range(3)]
+		page_count, reader = write_pdf(self.program, labels_data, copies=2)
+
+		self.assertEqual(page_count, 6)
+		self.assertEqual(len(reader.pages), 6)
+		page = reader.pages[0]
+		self.assertAlmostEqual(float(page.mediabox.width), self.program["width"] * PT_PER_MM, places=2)
+		self.assertAlmostEqual(float(page.mediabox.height), self.program["height"] * PT_PER_MM, places=2)
+
+		# copies follow each other, static text is on every label
+		for index, page in enumerate(reader.pages):
+			text = page.extract_text()
+			self.assertIn(labels_data[index // 2]["item_code"], text)
+			self.assertIn("Made in BD", text)
+
+	def test_imposed_sheets(self):
+		layout = get_sheet_layout(self.program["width"], self.program["height"])
+		page_count, reader = write_pdf(self.program, [self.data["liveData"]], layout, layout.per_page + 1)
+
+		self.assertEqual(page_count, 2)
+		self.assertEqual(len(reader.pages), 2)
+		self.assertAlmostEqual(float(reader.pages[0].mediabox.width), layout.page_width * PT_PER_MM, places=2)
+		self.assertEqual(reader.pages[0].extract_text().count("Made in BD"), layout.per_page)
+		self.assertEqual(reader.pages[1].extract_text().count("Made in BD"), 1)
+
+	def test_latin1_text(self):
+		live_data = dict(self.data["liveData"], item_name="Crème brûlée")
+		self.assertTrue(can_write_natively(self.program, live_data))
+		_page_count, reader = write_pdf(self.program, [live_data])
+		self.assertIn("Crème brûlée", reader.pages[0].extract_text())
+
+
+class TestUnsupportedLabels(unittest.TestCase):
+	def test_text_outside_latin1(self):
+		program = compile_label_program(get_designer_data(1))
+		self.assertFalse(can_write_natively(program, {"item_name": "মূল্য"}))
+
+	def test_html_elements(self):
+		data = get_designer_data(1)
+		program = compile_label_program(data)
+		# tables of the advanced designer compile to markup only the HTML renderer draws
+		program["elements"].append(dict(program["elements"][-1], kind="html", content="<table></table>"))
+		self.assertUnsupported(program, data["liveData"])
+
+	def test_symbology_without_native_encoder(self):
+		data = get_designer_data(1)
+		data["elements"] = [
+			{"type": "barcode", "x": 0, "y": 0, "width": 100, "height": 40, "barcodeType": "PDF417"}
+		]
+		self.assertUnsupported(compile_label_program(data), data["liveData"])
+
+	def assertUnsupported(self, program, live_data):
+		self.assertFalse(can_write_natively(program, live_data))
+		with self.assertRaises(UnsupportedLabelError):
+			write_program_pdf(program, [live_data], io.BytesIO())
+
+
+if __name__ == "__main__":
+	unittest.main()
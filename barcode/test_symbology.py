@@ -0,0 +1,196 @@
+"""Decode round-trip tests of the native barcode encoders.
+
+	python -m unittest barcode.test_symbology
+
+Without a frappe installation the benchmark stub stands in for it. Symbols are
+decoded with zxing-cpp (and Pillow); those tests are skipped when either is
+missing.
+"""
+
+import io
+import unittest
+
+try:
+	import frappe
+except ImportError:
+	from barcode.benchmarks.frappe_stub import install
+
+	frappe = install()
+
+try:
+	import zxingcpp
+	from PIL import Image
+except ImportError:
+	zxingcpp = None
+
+from barcode.barcode.symbology import (
+	LINEAR_ENCODERS,
+	MATRIX_QUIET_ZONES,
+	datamatrix,
+	get_matrix,
+	qr,
+	render_matrix_png,
+)
+from barcode.barcode.symbology.png import matrix_png
+
+LINEAR_QUIET_ZONE = 10
+LINEAR_SCALE = 3
+LINEAR_HEIGHT = 60
+
+needs_decoder = unittest.skipUnless(zxingcpp, "zxing-cpp and Pillow are needed to decode symbols")
+
+
+def decode_matrix(symbology, value, barcode_format):
+	"""Render a 2D symbol as PNG like the labels do and decode it"""
+	image = Image.open(io.BytesIO(render_matrix_png(symbology, value, box_size=4)))
+	return zxingcpp.read_barcode(image, formats=barcode_format)
+
+
+def decode_linear(symbology, value, barcode_format):
+	"""Draw the modules of a linear symbol with quiet zones and decode it"""
+	modules = "0" * LINEAR_QUIET_ZONE + LINEAR_ENCODERS[symbology](value) + "0" * LINEAR_QUIET_ZONE
+	row = bytes(0 if module == "1" else 255 for module in modules for _pixel in range(LINEAR_SCALE))
+	image = Image.frombytes("L", (len(row), LINEAR_HEIGHT), row * LINEAR_HEIGHT)
+	return zxingcpp.read_barcode(image, formats=barcode_format)
+
+
+@needs_decoder
+class TestQRCode(unittest.TestCase):
+	def assertRoundTrip(self, value):
+		result = decode_matrix("QR Code", value, zxingcpp.BarcodeFormat.QRCode)
+		self.assertIsNotNone(result, value)
+		self.assertEqual(result.text, value)
+
+	def test_modes(self):
+		for value in ("0123456789012", "HELLO WORLD $%*+-./:", "Item-001 batch/lot?", "x"):
+			self.assertRoundTrip(value)
+
+	def test_long_value(self):
+		# spans versions with two- and three-block interleaving and version information
+		self.assertRoundTrip("https://example.com/label?item=" + "ABC123" * 60)
+
+	def test_error_correction_levels(self):
+		for ecc in ("L", "M", "Q", "H"):
+			for mask in range(8):
+				matrix = qr.encode_qr("ECC TEST", ecc, mask)
+				modules = tuple("".join("1" if dark else "0" for dark in row) for row in matrix)
+				image = Image.open(io.BytesIO(matrix_png(modules, 4, MATRIX_QUIET_ZONES["QR Code"])))
+				result = zxingcpp.read_barcode(image, formats=zxingcpp.BarcodeFormat.QRCode)
+				self.assertEqual(result.text, "ECC TEST", (ecc, mask))
+				self.assertEqual(result.ec_level, ecc, (ecc, mask))
+
+	def test_utf8_eci(self):
+		for value in ("মূল্য ৳ ১২০", "バーコード", "Café"):
+			self.assertRoundTrip(value)
+
+		mode, payload, char_count = qr.get_segment("Café")
+		bits = qr.get_data_bits(mode, payload, char_count, 1, qr.needs_eci("Café"))
+		# ECI mode indicator, then the UTF-8 designator 26
+		self.assertEqual("".join(map(str, bits[: qr.ECI_BITS])), "011100011010")
+
+	def test_ascii_has_no_eci(self):
+		self.assertFalse(qr.needs_eci("Item-001"))
+
+
+@needs_decoder
+class TestDataMatrix(unittest.TestCase):
+	def assertRoundTrip(self, value):
+		result = decode_matrix("Data Matrix", value, zxingcpp.BarcodeFormat.DataMatrix)
+		self.assertIsNotNone(result, value)
+		self.assertEqual(result.text, value)
+		return result
+
+	def test_ascii(self):
+		for value in ("A", "ITEM-000123", "12345678901234567890", "lower case text with spaces"):
+			self.assertRoundTrip(value)
+
+	def test_long_value(self):
+		# multi-region symbols
+		self.assertRoundTrip("DATAMATRIX" * 30)
+
+	def test_latin1(self):
+		self.assertRoundTrip("Crème brûlée")
+		self.assertNotEqual(datamatrix.get_data_codewords("é")[0], datamatrix.ECI)
+
+	def test_utf8_eci(self):
+		for value in ("মূল্য ৳ ১২০", "バーコード"):
+			self.assertRoundTrip(value)
+		self.assertEqual(datamatrix.get_data_codewords("バ")[:2], [datamatrix.ECI, datamatrix.UTF8_ECI])
+
+	def test_gs1(self):
+		value = "(01)09501101530003(17)261231(10)AB12"
+		result = decode_matrix("Data Matrix", value, zxingcpp.BarcodeFormat.DataMatrix)
+		self.assertEqual(result.content_type, zxingcpp.ContentType.GS1)
+		self.assertEqual(result.text, value)
+		self.assertEqual(datamatrix.get_data_codewords(value)[0], datamatrix.FNC1)
+
+	def test_gs1_variable_length_separator(self):
+		# a variable length field in the middle is terminated by FNC1
+		value = "(10)AB12(01)09501101530003"
+		result = decode_matrix("Data Matrix", value, zxingcpp.BarcodeFormat.DataMatrix)
+		self.assertEqual(result.content_type, zxingcpp.ContentType.GS1)
+		self.assertEqual(result.text, value)
+
+	def test_not_gs1(self):
+		self.assertIsNone(datamatrix.parse_gs1("(not gs1)"))
+		self.assertNotEqual(self.assertRoundTrip("(not gs1)").content_type, zxingcpp.ContentType.GS1)
+
+
+@needs_decoder
+class TestLinear(unittest.TestCase):
+	def assertRoundTrip(self, symbology, value, barcode_format, expected=None):
+		result = decode_linear(symbology, value, barcode_format)
+		self.assertIsNotNone(result, (symbology, value))
+		self.assertEqual(result.text, expected or value)
+
+	def test_code128(self):
+		# set B, set C, B/C switches and set A control characters
+		for value in ("Item-001", "1234567890", "AB123456cd7", "x"):
+			self.assertRoundTrip("Code128", value, zxingcpp.BarcodeFormat.Code128)
+
+		result = decode_linear("Code128", "LOT\t42", zxingcpp.BarcodeFormat.Code128)
+		self.assertEqual(result.bytes, b"LOT\t42")
+
+	def test_code39(self):
+		self.assertRoundTrip("Code39", "CODE-39 $/+%", zxingcpp.BarcodeFormat.Code39)
+		self.assertRoundTrip("Code39", "lower", zxingcpp.BarcodeFormat.Code39, "LOWER")
+
+	def test_ean13(self):
+		self.assertRoundTrip("EAN-13", "590123412345", zxingcpp.BarcodeFormat.EAN13, "5901234123457")
+		self.assertRoundTrip("EAN-13", "4006381333931", zxingcpp.BarcodeFormat.EAN13)
+
+	def test_ean8(self):
+		self.assertRoundTrip("EAN-8", "9638507", zxingcpp.BarcodeFormat.EAN8, "96385074")
+
+	def test_upca(self):
+		# read back as the EAN-13 it is, with a leading zero
+		self.assertRoundTrip("UPC-A", "03600029145", zxingcpp.BarcodeFormat.UPCA, "0036000291452")
+
+	def test_invalid_check_digit(self):
+		with self.assertRaises(ValueError):
+			LINEAR_ENCODERS["EAN-13"]("4006381333932")
+
+
+class TestZPL(unittest.TestCase):
+	def test_qr_size(self):
+		from barcode.barcode.zpl import compile_qr
+
+		version, ecc = qr.select_version("HELLO")
+		self.assertEqual(
+			compile_qr("HELLO", "HELLO", 200), f"^BQN,2,{200 // (version * 4 + 25)}^FH^FD{ecc}A,HELLO^FS"
+		)
+
+	def test_datamatrix_gs1(self):
+		from barcode.barcode.zpl import compile_datamatrix
+
+		value = "(10)AB12(01)09501101530003"
+		size = len(get_matrix("Data Matrix", value))
+		# FNC1 first and after the variable length lot number, "~" as the escape character
+		self.assertEqual(
+			compile_datamatrix(value, "", 200),
+			f"^BXN,{200 // (size + 2)},200,{size},{size},,~^FH^FD_7E110AB12_7E10109501101530003^FS",
+		)
+
+
+if __name__ == "__main__":
+	unittest.main()